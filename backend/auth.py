@@ -1,33 +1,123 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_async_db
+import hashing
 import models
 import os
+import threading
+import time
 
 # Secret key for JWT
 SECRET_KEY = os.environ.get("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Bearer token scheme
 security = HTTPBearer()
 
+# Verified-principal cache
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_CACHE_TTL_SECONDS", "60"))
+
+class Principal:
+    """Detached snapshot of the authenticated user, safe to share across requests."""
+
+    __slots__ = ("id", "email", "name", "phone", "role", "created_at")
+
+    def __init__(self, user: models.User):
+        self.id = user.id
+        self.email = user.email
+        self.name = user.name
+        self.phone = user.phone
+        self.role = user.role
+        self.created_at = user.created_at
+
+class PrincipalCache:
+    """Bounded LRU of token -> (claims, principal), with a per-entry TTL."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tokens_by_user = {}
+
+    def get(self, token: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._drop(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, token: str, claims: dict, principal: Principal):
+        if self.maxsize <= 0:
+            return
+        # Never outlive the token itself
+        expires_at = time.monotonic() + self.ttl
+        if claims.get("exp"):
+            expires_at = min(expires_at, time.monotonic() + claims["exp"] - time.time())
+        with self._lock:
+            if token in self._entries:
+                self._drop(token)
+            self._entries[token] = (expires_at, claims, principal)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, token: str):
+        _, _, principal = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(principal.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[principal.id]
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._drop(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+principal_cache = PrincipalCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
+
+# Password hashing runs in a bounded process pool (see hashing.py)
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    import hashlib
-    return hashlib.sha256(plain_password.encode()).hexdigest() == hashed_password
+    return hashing.verify_password(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    # Simple password hashing without bcrypt for now
-    import hashlib
-    return hashlib.sha256(password.encode()).hexdigest()
+    return hashing.hash_password(password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    return hashing.needs_rehash(hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -36,10 +126,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    # python-jose (and its crypto backends) load on first use, not at startup
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str):
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -49,18 +142,33 @@ def verify_token(token: str):
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials"
             )
-        return {"user_id": user_id, "role": role}
+        return {"user_id": user_id, "role": role, "exp": payload.get("exp")}
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
 
+def token_role(token: str) -> Optional[str]:
+    """Role of a bearer token without a database lookup: the cached
+    principal's, else the signed claim; None when the token does not verify."""
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached[1].role
+    try:
+        return verify_token(token)["role"]
+    except HTTPException:
+        return None
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
     token = credentials.credentials
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached[1]
+    
     token_data = verify_token(token)
     user = db.query(models.User).filter(models.User.id == token_data["user_id"]).first()
     if user is None:
@@ -68,10 +176,37 @@ def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    return user
+    principal = Principal(user)
+    principal_cache.put(token, token_data, principal)
+    return principal
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Same as get_current_user, for async routes: a cache miss awaits the
+    # lookup instead of tying up a threadpool worker. Reads the primary, so
+    # a user who has just registered is found even if a replica lags
+    token = credentials.credentials
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached[1]
+
+    token_data = verify_token(token)
+    user = (await db.execute(select(models.User).where(models.User.id == token_data["user_id"]))).scalar_one_or_none()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    principal = Principal(user)
+    principal_cache.put(token, token_data, principal)
+    return principal
 
 def require_role(allowed_roles: list):
-    def role_checker(current_user: models.User = Depends(get_current_user)):
+    def role_checker(current_user: Principal = Depends(get_current_user)):
+        # The principal's role, cached or just loaded; the token's role claim
+        # can be older than a role change
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -79,3 +214,23 @@ def require_role(allowed_roles: list):
             )
         return current_user
     return role_checker
+
+# ==================== Cache invalidation ====================
+
+_PENDING_KEY = "principal_cache_pending"
+
+@event.listens_for(Session, "after_flush")
+def _collect_user_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for instance in list(session.dirty) + list(session.deleted):
+        if isinstance(instance, models.User):
+            pending.add(instance.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_principals(session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        principal_cache.invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,159 @@
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import os
+import uuid
+import models
+from reservations import claim_slot
+from slots import covers, load_templates, slot_index, slot_engine
+
+# Upper bound on one POST /api/appointments/batch request
+MAX_BATCH_APPOINTMENTS = int(os.environ.get("MAX_BATCH_APPOINTMENTS", "5000"))
+# Passes of a batch that loses a slot to a concurrent booking
+BATCH_CONFLICT_RETRIES = 2
+# Keys per IN (...) list, well under every backend's bound-parameter limit
+_IN_CHUNK = 500
+
+def _chunks(values: list):
+    for start in range(0, len(values), _IN_CHUNK):
+        yield values[start:start + _IN_CHUNK]
+
+def _doctor_fees(db: Session, doctor_ids: Set[str]) -> Dict[str, object]:
+    fees = {}
+    for chunk in _chunks(sorted(doctor_ids)):
+        fees.update(db.execute(
+            select(models.Doctor.user_id, models.Doctor.fee).where(models.Doctor.user_id.in_(chunk))
+        ).all())
+    return fees
+
+def _templates(db: Session, doctor_ids: Set[str]) -> Dict[str, List[int]]:
+    # Read with the batch's other lookups rather than through slot_engine,
+    # which would load each doctor on its own under the engine's lock
+    templates = {}
+    for chunk in _chunks(sorted(doctor_ids)):
+        templates.update(load_templates(db, chunk))
+    return templates
+
+def _patient_ids(db: Session, user_ids: Set[str]) -> Set[str]:
+    found = set()
+    for chunk in _chunks(sorted(user_ids)):
+        found.update(db.execute(
+            select(models.User.id).where(models.User.id.in_(chunk), models.User.role == "patient")
+        ).scalars())
+    return found
+
+def _booked_slots(db: Session, doctor_ids: Set[str], dates) -> Set[Tuple[str, object, int]]:
+    # One range scan per doctor chunk (ix_appointments_doctor_date); stored
+    # times vary in format, so they are compared as slot indexes
+    booked = set()
+    first, last = min(dates), max(dates)
+    for chunk in _chunks(sorted(doctor_ids)):
+        rows = db.execute(select(
+            models.Appointment.doctor_id, models.Appointment.date, models.Appointment.time
+        ).where(
+            models.Appointment.doctor_id.in_(chunk),
+            models.Appointment.date >= first,
+            models.Appointment.date <= last,
+            models.Appointment.status != "cancelled"
+        ))
+        for doctor_id, booking_date, booking_time in rows:
+            index = slot_index(booking_time)
+            if index is not None:
+                booked.add((doctor_id, booking_date, index))
+    return booked
+
+class BatchBooking:
+    """Books many appointments with one round of lookups and one transaction.
+
+    Every item is checked the way POST /api/appointments checks a single
+    booking: the doctor must exist, the time must fall in the doctor's
+    hours, and the slot must be free, both against existing appointments
+    and against earlier items of the same batch.
+    Items that fail are reported and skipped; the rest are inserted
+    together.
+    """
+
+    def __init__(self, db: Session, current_user):
+        self.db = db
+        self.current_user = current_user
+        self.results: List[dict] = []
+        self.created: List[models.Appointment] = []
+        # Kept apart from the objects, which the commit expires
+        self._slots: List[tuple] = []
+
+    def _fail(self, index: int, status: int, detail: str):
+        self.results.append({"index": index, "status": status, "appointment": None, "detail": detail})
+
+    def run(self, items) -> List[models.Appointment]:
+        if not items:
+            return []
+        if self.current_user.role == "admin":
+            patients = _patient_ids(self.db, {item.patient_id for item in items if item.patient_id})
+        else:
+            patients = {self.current_user.id}
+        doctor_ids = {item.doctor_id for item in items}
+        fees = _doctor_fees(self.db, doctor_ids)
+        templates = _templates(self.db, set(fees))
+        booked = _booked_slots(self.db, set(fees), [item.date for item in items])
+        claimed: Dict[Tuple[str, object, int], int] = {}
+
+        for index, item in enumerate(items):
+            patient_id = self._patient_for(item)
+            if patient_id is None:
+                self._fail(index, 400, "patient_id is required for admin bookings")
+                continue
+            if patient_id not in patients:
+                self._fail(index, 404 if self.current_user.role == "admin" else 403,
+                           "Patient not found" if self.current_user.role == "admin" else "Not authorized")
+                continue
+            if item.doctor_id not in fees:
+                self._fail(index, 404, "Doctor not found")
+                continue
+            slot = slot_index(item.time)
+            if slot is None:
+                self._fail(index, 400, "Invalid appointment time")
+                continue
+            if not covers(templates[item.doctor_id], item.date, slot):
+                self._fail(index, 409, "Doctor is not available at that time")
+                continue
+            key = (item.doctor_id, item.date, slot)
+            if key in booked:
+                self._fail(index, 409, "Time slot already booked")
+                continue
+            if key in claimed:
+                self._fail(index, 409, f"Time slot already taken by item {claimed[key]} of this batch")
+                continue
+            claimed[key] = index
+            appointment = models.Appointment(
+                id=str(uuid.uuid4()),
+                patient_id=patient_id,
+                doctor_id=item.doctor_id,
+                date=item.date,
+                time=str(item.time),
+                type=item.type,
+                symptoms=item.symptoms,
+                fee=fees[item.doctor_id],
+                status="confirmed"
+            )
+            claim_slot(self.db, appointment)
+            self.created.append(appointment)
+            self._slots.append((item.doctor_id, item.date, str(item.time)))
+            # 200, as POST /api/appointments answers a booking
+            self.results.append({"index": index, "status": 200, "appointment": appointment, "detail": None})
+
+        # One flush: the ORM batches the INSERTs, and the stat counter hooks
+        # see every new appointment. A slot reserved concurrently since the
+        # lookup fails it with IntegrityError
+        self.db.add_all(self.created)
+        self.db.flush()
+        return self.created
+
+    def _patient_for(self, item) -> Optional[str]:
+        if self.current_user.role == "admin":
+            return item.patient_id
+        return item.patient_id or self.current_user.id
+
+    def occupy_slots(self):
+        # After commit, like the single-booking route
+        for doctor_id, booking_date, booking_time in self._slots:
+            slot_engine.occupy(doctor_id, booking_date, booking_time)
@@ -1,22 +1,119 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Use SQLite for MVP (easy, no setup required)
 DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///./medicare.db')
+# Read-only replica for read-heavy routes; reads use the primary when unset.
+# Locally, a read-only handle on the same file works as a stand-in:
+#   DATABASE_REPLICA_URL=sqlite:///file:medicare.db?mode=ro&uri=true
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+
+# Connection pool sizing (QueuePool; ignored for in-memory SQLite)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'false').lower() == 'true'
+
+# SQLite pragmas, applied to every new connection. WAL lets readers run
+# alongside a writer; NORMAL sync is durable across app crashes under WAL
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', str(64 * 1024)))
+
+def _sqlite_pragmas(read_only: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            # journal_mode is persistent and needs write access to change
+            cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+    return on_connect
+
+# Async drivers for the AsyncSession stack, by backend
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def _pool_options(database_url) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    in_memory = database_url.get_backend_name() == "sqlite" and database_url.database in (None, "", ":memory:")
+    if not in_memory:
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                       pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE)
+    return options
+
+def make_engine(url: str, read_only: bool = False):
+    database_url = make_url(url)
+    connect_args = {}
+    if database_url.get_backend_name() == "sqlite":
+        connect_args["check_same_thread"] = False
+    elif read_only and database_url.get_backend_name() == "postgresql":
+        # Guard against writes reaching the replica by mistake
+        connect_args["options"] = "-c default_transaction_read_only=on"
+
+    new_engine = create_engine(url, connect_args=connect_args, **_pool_options(database_url))
+    if database_url.get_backend_name() == "sqlite":
+        event.listen(new_engine, "connect", _sqlite_pragmas(read_only))
+    return new_engine
+
+def make_async_engine(url: str, read_only: bool = False):
+    """Async twin of make_engine: same database, pool and pragma settings.
+
+    None for a backend without an entry in ASYNC_DRIVERS.
+    """
+    database_url = make_url(url)
+    backend = database_url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return None
+    connect_args = {}
+    if read_only and backend == "postgresql":
+        connect_args["server_settings"] = {"default_transaction_read_only": "on"}
+
+    new_engine = create_async_engine(database_url.set(drivername=ASYNC_DRIVERS[backend]),
+                                     connect_args=connect_args, **_pool_options(database_url))
+    if backend == "sqlite":
+        event.listen(new_engine.sync_engine, "connect", _sqlite_pragmas(read_only))
+    return new_engine
+
+# Create SQLAlchemy engines; writes always go to the primary
+engine = make_engine(DATABASE_URL)
+read_engine = make_engine(DATABASE_REPLICA_URL, read_only=True) if DATABASE_REPLICA_URL else engine
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+# Async engines for the hot read routes; connections open on first use.
+# Without an async driver the app still starts, and only the async routes fail
+async_engine = make_async_engine(DATABASE_URL)
+async_read_engine = make_async_engine(DATABASE_REPLICA_URL, read_only=True) if DATABASE_REPLICA_URL else async_engine
+ASYNC_UNAVAILABLE = (
+    f"No async driver for the {make_url(DATABASE_URL).get_backend_name()} backend; "
+    "add one to ASYNC_DRIVERS in database.py to serve the async routes"
 )
+if async_engine is None or async_read_engine is None:
+    logger.warning(ASYNC_UNAVAILABLE)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False) if async_engine else None
+AsyncReadSessionLocal = (
+    async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False) if async_read_engine else None
+)
 
 # Create Base class
 Base = declarative_base()
@@ -27,4 +124,35 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency for read-only routes; may lag the primary when a replica is set
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _async_sessions(factory):
+    if factory is None:
+        raise RuntimeError(ASYNC_UNAVAILABLE)
+    return factory
+
+# Async dependencies, for routes that should not hold a threadpool worker
+async def get_async_db():
+    async with _async_sessions(AsyncSessionLocal)() as db:
+        yield db
+
+async def get_async_read_db():
+    async with _async_sessions(AsyncReadSessionLocal)() as db:
+        yield db
+
+# Async routes hand blocking work to the threadpool with a session from this
+async def get_session_factory():
+    return SessionLocal
+
+# A streaming response body outlives the request's yield dependencies, so
+# it opens its own session from this
+async def get_async_read_session_factory():
+    return _async_sessions(AsyncReadSessionLocal)
@@ -0,0 +1,355 @@
+"""Bulk synthetic data for load testing.
+
+Generates patients, doctors, appointments and medical records with skewed,
+realistic distributions and writes them with executemany inserts in large
+batched transactions. Output is fully determined by --seed and --anchor.
+
+Usage (from backend/):
+    python datagen.py --patients 1000000 --doctors 20000 --appointments 10000000 --records 2000000
+"""
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+import argparse
+import math
+import random
+import sys
+
+SPECIALTIES = [
+    # name, description, icon, relative popularity
+    ("General Medicine", "General healthcare", "🏥", 30),
+    ("Dermatology", "Skin, hair & nails", "🧴", 14),
+    ("Pediatrics", "Children healthcare", "👶", 12),
+    ("Dentistry", "Dental care", "🦷", 10),
+    ("Orthopedics", "Bones & joints", "🦴", 8),
+    ("Cardiology", "Heart & cardiovascular system", "❤️", 7),
+    ("ENT", "Ear, Nose & Throat", "👂", 6),
+    ("Ophthalmology", "Eye care", "👁️", 5),
+    ("Psychiatry", "Mental health", "🧘", 5),
+    ("Neurology", "Brain & nervous system", "🧠", 3),
+]
+FIRST_NAMES = ["Aarav", "Priya", "Rahul", "Sneha", "Vikram", "Ananya", "Rohan", "Kavya", "Arjun", "Meera",
+               "Sarah", "Rajesh", "Amit", "Neha", "Karan", "Divya", "Sanjay", "Pooja", "Nikhil", "Isha",
+               "Aditya", "Lakshmi", "Farhan", "Zoya", "Manoj", "Shreya", "Gaurav", "Tanvi", "Harsh", "Ritu"]
+LAST_NAMES = ["Sharma", "Kumar", "Patel", "Reddy", "Singh", "Johnson", "Iyer", "Gupta", "Nair", "Das",
+              "Mehta", "Rao", "Joshi", "Menon", "Bose", "Kapoor", "Chopra", "Verma", "Pillai", "Khan"]
+CITIES = ["Mumbai", "Delhi", "Bangalore", "Pune", "Hyderabad", "Chennai", "Kolkata", "Jaipur", "Lucknow", "Kochi"]
+HOSPITAL_KINDS = ["City Hospital", "Care Clinic", "Medical Centre", "Health Institute", "General Hospital"]
+LANGUAGES = ["English", "Hindi", "Marathi", "Tamil", "Telugu", "Kannada", "Bengali", "Gujarati"]
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+SYMPTOMS = ["Fever and cough", "Skin rash", "Back pain", "Headache", "Routine check-up", "Chest discomfort",
+            "Follow-up visit", "Joint pain", "Anxiety", "Blurred vision", "Toothache", "Ear pain"]
+RECORD_TYPES = [("prescription", 45), ("lab_report", 30), ("xray", 10), ("scan", 8), ("other", 7)]
+
+BCRYPT_SALT_CHARS = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+# Consultation hours used for every synthetic doctor
+DAY_START = time(9, 0)
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 32
+
+def zipf_cum_weights(n: int, exponent: float) -> list:
+    # A few doctors (and repeat patients) get most of the bookings
+    return list(accumulate(1.0 / (rank + 1) ** exponent for rank in range(n)))
+
+def make_uuid(rng: random.Random) -> str:
+    # Version-4 layout from the seeded generator, without building UUID objects
+    value = (rng.getrandbits(128) & ~(0xF000 << 64) & ~(0xC << 60)) | (0x4000 << 64) | (0x8 << 60)
+    text = f"{value:032x}"
+    return f"{text[:8]}-{text[8:12]}-{text[12:16]}-{text[16:20]}-{text[20:]}"
+
+class Generator:
+    def __init__(self, connection, seed: int, anchor: date, batch_size: int, history_days: int, future_days: int):
+        self.connection = connection
+        self.rng = random.Random(seed)
+        self.anchor = anchor
+        self.batch_size = batch_size
+        self.first_day = anchor - timedelta(days=history_days)
+        self.total_days = history_days + future_days
+        self.patient_ids = []
+        self.doctor_fees = []  # (user_id, fee)
+
+    def _insert(self, table, rows):
+        if rows:
+            # One transaction per batch keeps memory and lock time bounded
+            self.connection.execute(table.insert(), rows)
+            self.connection.commit()
+
+    def _batched(self, table, count: int, make_row, label: str):
+        rows = []
+        for i in range(count):
+            rows.append(make_row(i))
+            if len(rows) >= self.batch_size:
+                self._insert(table, rows)
+                rows = []
+                print(f"  {label}: {i + 1:,}/{count:,}", end="\r", file=sys.stderr)
+        self._insert(table, rows)
+        print(f"  {label}: {count:,}/{count:,}", file=sys.stderr)
+
+    def specialties(self):
+        import models
+
+        table = models.Specialty.__table__
+        existing = dict(self.connection.execute(table.select().with_only_columns(table.c.name, table.c.id)).all())
+        missing = [
+            {"name": name, "description": description, "icon": icon}
+            for name, description, icon, _ in SPECIALTIES if name not in existing
+        ]
+        self._insert(table, missing)
+        ids = dict(self.connection.execute(table.select().with_only_columns(table.c.name, table.c.id)).all())
+        self.specialty_ids = [ids[name] for name, _, _, _ in SPECIALTIES]
+        self.specialty_cum_weights = list(accumulate(weight for _, _, _, weight in SPECIALTIES))
+
+    def patients(self, count: int, password_hash: str):
+        import models
+
+        rng = self.rng
+        users, profiles = models.User.__table__, models.Patient.__table__
+        created_base = datetime.combine(self.first_day, time(8, 0))
+
+        def rows(i):
+            user_id = make_uuid(rng)
+            self.patient_ids.append(user_id)
+            created_at = created_base + timedelta(minutes=rng.randrange(self.total_days * 24 * 60))
+            return (
+                {"id": user_id, "email": f"patient{i}@synthetic.medicare", "password_hash": password_hash,
+                 "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                 "phone": f"+91 9{rng.randrange(10 ** 9):09d}", "role": "patient",
+                 "created_at": created_at, "updated_at": created_at},
+                {"id": make_uuid(rng), "user_id": user_id, "age": min(95, max(1, int(rng.gauss(38, 18)))),
+                 "gender": rng.choice(["Male", "Female"]), "blood_group": rng.choice(["A+", "B+", "O+", "AB+", "O-"])},
+            )
+
+        self._paired(users, profiles, count, rows, "patients")
+
+    def doctors(self, count: int, password_hash: str):
+        import models
+
+        rng = self.rng
+        users, profiles = models.User.__table__, models.Doctor.__table__
+        availability = models.DoctorAvailability.__table__
+        availability_rows = []
+        created_base = datetime.combine(self.first_day, time(8, 0))
+
+        def rows(i):
+            user_id = make_uuid(rng)
+            specialty_id = rng.choices(self.specialty_ids, cum_weights=self.specialty_cum_weights)[0]
+            experience = rng.randint(1, 35)
+            fee = rng.randrange(300, 1500, 50) + experience * 20
+            city = rng.choice(CITIES)
+            days = sorted(rng.sample(range(6), rng.randint(3, 6)))
+            self.doctor_fees.append((user_id, fee))
+            for day in days:
+                availability_rows.append({
+                    "id": make_uuid(rng), "doctor_id": user_id, "day_of_week": day,
+                    "start_time": DAY_START, "end_time": time(17, 0), "is_available": True,
+                })
+            return (
+                {"id": user_id, "email": f"doctor{i}@synthetic.medicare", "password_hash": password_hash,
+                 "name": f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                 "phone": f"+91 8{rng.randrange(10 ** 9):09d}", "role": "doctor",
+                 "created_at": created_base, "updated_at": created_base},
+                {"id": make_uuid(rng), "user_id": user_id, "specialty_id": specialty_id,
+                 "qualification": "MBBS, MD", "experience": experience, "fee": fee,
+                 "hospital": f"{city} {rng.choice(HOSPITAL_KINDS)}", "location": city,
+                 "rating": round(min(5.0, max(3.0, rng.gauss(4.3, 0.35))), 2),
+                 "total_reviews": int(rng.paretovariate(1.5) * 10), "about": "Synthetic profile for load testing.",
+                 "verified": rng.random() < 0.9, "languages": ["English"] + rng.sample(LANGUAGES[1:], 2),
+                 "availability_days": [DAY_NAMES[day] for day in days]},
+            )
+
+        self._paired(users, profiles, count, rows, "doctors")
+        for start in range(0, len(availability_rows), self.batch_size):
+            self._insert(availability, availability_rows[start:start + self.batch_size])
+
+    def _paired(self, users, profiles, count: int, make_rows, label: str):
+        user_rows, profile_rows = [], []
+        for i in range(count):
+            user, profile = make_rows(i)
+            user_rows.append(user)
+            profile_rows.append(profile)
+            if len(user_rows) >= self.batch_size or i == count - 1:
+                self.connection.execute(users.insert(), user_rows)
+                self.connection.execute(profiles.insert(), profile_rows)
+                self.connection.commit()
+                user_rows, profile_rows = [], []
+                print(f"  {label}: {i + 1:,}/{count:,}", end="\r", file=sys.stderr)
+        print(f"  {label}: {count:,}/{count:,}", file=sys.stderr)
+
+    def _fast_insert(self, table, columns, batches, count: int, label: str):
+        # Hot path for the big tables: plain tuples straight to the DBAPI
+        # executemany, skipping per-row SQLAlchemy bind processing
+        placeholder = "?" if self.connection.dialect.paramstyle == "qmark" else "%s"
+        sql = (f"INSERT INTO {table.name} ({', '.join(columns)}) "
+               f"VALUES ({', '.join([placeholder] * len(columns))})")
+        done = 0
+        for rows in batches:
+            self.connection.exec_driver_sql(sql, rows)
+            self.connection.commit()
+            done += len(rows)
+            print(f"  {label}: {done:,}/{count:,}", end="\r", file=sys.stderr)
+        print(f"  {label}: {count:,}/{count:,}", file=sys.stderr)
+
+    def _batch_sizes(self, count: int):
+        for start in range(0, count, self.batch_size):
+            yield min(self.batch_size, count - start)
+
+    def appointments(self, count: int):
+        import models
+
+        rng = self.rng
+        if not self.doctor_fees or not self.patient_ids:
+            raise SystemExit("Appointments need at least one doctor and one patient")
+        positions = self.total_days * SLOTS_PER_DAY
+        if count > positions * len(self.doctor_fees):
+            raise SystemExit(f"{count:,} appointments do not fit {len(self.doctor_fees):,} doctors' calendars")
+
+        # Each doctor walks its calendar with a stride coprime to its size,
+        # giving scattered but never double-booked (date, time) slots
+        strides = []
+        for _ in self.doctor_fees:
+            stride = rng.randrange(1, positions)
+            while math.gcd(stride, positions) != 1:
+                stride += 1
+            strides.append((stride % positions or 1, rng.randrange(positions)))
+        booked = [0] * len(self.doctor_fees)
+
+        doctor_order = list(range(len(self.doctor_fees)))
+        patient_order = list(range(len(self.patient_ids)))
+        rng.shuffle(doctor_order)
+        rng.shuffle(patient_order)
+        doctor_weights = zipf_cum_weights(len(doctor_order), 0.8)
+        patient_weights = zipf_cum_weights(len(patient_order), 0.3)
+
+        days = [(self.first_day + timedelta(days=i)).isoformat() for i in range(self.total_days)]
+        anchor_index = (self.anchor - self.first_day).days
+        slot_times = [f"{(DAY_START.hour * 60 + i * SLOT_MINUTES) // 60:02d}:{(i * SLOT_MINUTES) % 60:02d}"
+                      for i in range(SLOTS_PER_DAY)]
+        midnight = datetime.combine(self.first_day, time(0, 0))
+        # Active bookings also get their slot reservation (see reservations.py);
+        # slot numbers there count from midnight
+        first_slot = (DAY_START.hour * 60 + DAY_START.minute) // SLOT_MINUTES
+        reservations = []
+
+        def batches():
+            for size in self._batch_sizes(count):
+                doctor_picks = rng.choices(doctor_order, cum_weights=doctor_weights, k=size)
+                patient_picks = rng.choices(patient_order, cum_weights=patient_weights, k=size)
+                rows = []
+                for doctor_index, patient_index in zip(doctor_picks, patient_picks):
+                    while booked[doctor_index] >= positions:
+                        doctor_index = rng.randrange(len(booked))
+                    stride, offset = strides[doctor_index]
+                    position = (offset + booked[doctor_index] * stride) % positions
+                    booked[doctor_index] += 1
+                    day_index, slot = divmod(position, SLOTS_PER_DAY)
+                    doctor_id, fee = self.doctor_fees[doctor_index]
+
+                    roll = rng.random()
+                    if day_index < anchor_index:
+                        status = "cancelled" if roll < 0.08 else "completed"
+                        payment_status = "paid" if status == "completed" else (
+                            "refunded" if roll < 0.04 else "pending")
+                    else:
+                        status = "cancelled" if roll < 0.05 else ("pending" if roll < 0.25 else "confirmed")
+                        payment_status = "paid" if status == "confirmed" and roll < 0.7 else "pending"
+                    # Booked between a day and a month ahead
+                    created_at = (midnight + timedelta(days=day_index, minutes=-rng.randrange(60, 60 * 24 * 30))
+                                  ).isoformat(" ", "microseconds")
+                    starts_at = (midnight + timedelta(days=day_index, minutes=(first_slot + slot) * SLOT_MINUTES)
+                                 ).isoformat(" ", "microseconds")
+                    appointment_id = make_uuid(rng)
+                    rows.append((
+                        appointment_id, self.patient_ids[patient_index], doctor_id, days[day_index],
+                        slot_times[slot], starts_at, status, "video" if roll < 0.4 else "in-person",
+                        SYMPTOMS[rng.randrange(len(SYMPTOMS))], fee, payment_status, created_at, created_at,
+                    ))
+                    if status != "cancelled":
+                        reservations.append((doctor_id, days[day_index], first_slot + slot, appointment_id, created_at))
+                yield rows
+
+        columns = ("id", "patient_id", "doctor_id", "date", "time", "starts_at", "status", "type", "symptoms",
+                   "fee", "payment_status", "created_at", "updated_at")
+        self._fast_insert(models.Appointment.__table__, columns, batches(), count, "appointments")
+        self._fast_insert(models.SlotReservation.__table__,
+                          ("doctor_id", "date", "slot", "appointment_id", "created_at"),
+                          (reservations[start:start + self.batch_size]
+                           for start in range(0, len(reservations), self.batch_size)),
+                          len(reservations), "slot reservations")
+
+    def medical_records(self, count: int):
+        import models
+
+        rng = self.rng
+        if not self.doctor_fees or not self.patient_ids:
+            raise SystemExit("Medical records need at least one doctor and one patient")
+        types, weights = zip(*RECORD_TYPES)
+        cum_weights = list(accumulate(weights))
+        created_base = datetime.combine(self.first_day, time(8, 0))
+
+        def batches():
+            for size in self._batch_sizes(count):
+                record_types = rng.choices(types, cum_weights=cum_weights, k=size)
+                rows = []
+                for record_type in record_types:
+                    doctor_id, _ = self.doctor_fees[rng.randrange(len(self.doctor_fees))]
+                    created_at = created_base + timedelta(minutes=rng.randrange(self.total_days * 24 * 60))
+                    rows.append((
+                        make_uuid(rng), self.patient_ids[rng.randrange(len(self.patient_ids))], doctor_id,
+                        record_type, f"{record_type.replace('_', ' ').title()} #{rng.randrange(10 ** 6)}",
+                        created_at.isoformat(" ", "microseconds"),
+                    ))
+                yield rows
+
+        columns = ("id", "patient_id", "doctor_id", "type", "title", "created_at")
+        self._fast_insert(models.MedicalRecord.__table__, columns, batches(), count, "medical records")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--doctors", type=int, default=500)
+    parser.add_argument("--appointments", type=int, default=100000)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--anchor", type=date.fromisoformat, default=date.today(),
+                        help="'today' for the generated calendar (YYYY-MM-DD); fix it for reproducible runs")
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument("--future-days", type=int, default=60)
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--password", default="password123", help="password for every generated user")
+    args = parser.parse_args()
+
+    import hashing
+    import migrations
+    import stats
+    from database import engine, SessionLocal
+
+    migrations.upgrade(engine)
+    started = datetime.now()
+    # Salt drawn from the seed as well, so the whole dataset is reproducible
+    salt_rng = random.Random(args.seed)
+    salt = "".join(salt_rng.choice(BCRYPT_SALT_CHARS) for _ in range(21)) + "."
+    password_hash = hashing.crypt_context().handler().using(salt=salt).hash(args.password)
+
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            # Bulk-load settings for this connection only
+            connection.exec_driver_sql("PRAGMA synchronous = OFF")
+            connection.exec_driver_sql("PRAGMA cache_size = -200000")
+        generator = Generator(connection, args.seed, args.anchor, args.batch_size, args.history_days, args.future_days)
+        generator.specialties()
+        generator.patients(args.patients, password_hash)
+        generator.doctors(args.doctors, password_hash)
+        if args.appointments:
+            generator.appointments(args.appointments)
+        if args.records:
+            generator.medical_records(args.records)
+
+    db = SessionLocal()
+    try:
+        stats.reconcile(db)
+    finally:
+        db.close()
+    print(f"✅ Generated data in {(datetime.now() - started).total_seconds():.1f}s")
+
+if __name__ == "__main__":
+    main()
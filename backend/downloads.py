@@ -0,0 +1,136 @@
+from pathlib import Path
+from typing import Optional, Tuple
+from fastapi import Request
+from starlette.responses import Response
+from urllib.parse import quote
+import anyio
+import mimetypes
+import os
+import re
+
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def file_etag(path: Path, checksum: Optional[str] = None) -> str:
+    # The upload checksum identifies the content exactly; stat is the fallback
+    if checksum:
+        return f'"{checksum}"'
+    stat = path.stat()
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    # If-None-Match uses weak comparison
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Return an inclusive (start, end) for a single byte range, None for the
+    whole file, or raise ValueError when the range cannot be satisfied."""
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        # Multiple or malformed ranges: serving the full file is allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        # No byte of an empty file can be addressed, whatever the range
+        raise ValueError("empty file")
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+class RangeFileResponse(Response):
+    """File response with single-range support and flat memory use.
+
+    Uses the ASGI zero-copy send extension (os.sendfile on the server side)
+    when the server offers it, falling back to fixed-size chunked reads.
+    """
+
+    def __init__(self, path: Path, headers: dict, status_code: int = 200, byte_range: Optional[Tuple[int, int]] = None):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.byte_range = byte_range
+
+    async def __call__(self, scope, receive, send):
+        size = int(self.headers["content-length"])
+        start = self.byte_range[0] if self.byte_range else 0
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD" or size == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            fd = await anyio.to_thread.run_sync(os.open, str(self.path), os.O_RDONLY)
+            try:
+                await send({"type": "http.response.zerocopysend", "file": fd, "offset": start, "count": size, "more_body": False})
+            finally:
+                os.close(fd)
+            return
+        if "http.response.pathsend" in extensions and self.byte_range is None:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(start)
+            remaining = size
+            while remaining > 0:
+                chunk = await file.read(min(DOWNLOAD_CHUNK_BYTES, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File shrank underneath us; end the body rather than hang
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def file_response(request: Request, path: Path, etag: str, filename: str) -> Response:
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        # Medical files: never shared caches, always revalidate
+        "cache-control": "private, no-cache",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    size = path.stat().st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        # Resume only if the client still has the same representation
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+
+    headers["content-type"] = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    quoted = quote(filename)
+    if quoted == filename:
+        headers["content-disposition"] = f'attachment; filename="{filename}"'
+    else:
+        headers["content-disposition"] = f"attachment; filename*=utf-8''{quoted}"
+    if byte_range is None:
+        headers["content-length"] = str(size)
+        return RangeFileResponse(path, headers)
+
+    start, end = byte_range
+    headers["content-length"] = str(end - start + 1)
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return RangeFileResponse(path, headers, status_code=206, byte_range=byte_range)
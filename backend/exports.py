@@ -0,0 +1,51 @@
+from datetime import date, datetime, time
+from typing import AsyncIterator, Callable
+import csv
+import io
+import os
+from serializers import dumps
+
+# Rows fetched and rendered per chunk; memory is bounded by one chunk no
+# matter how many rows the export holds
+EXPORT_BATCH_ROWS = int(os.environ.get("EXPORT_BATCH_ROWS", "1000"))
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return value
+
+def render_ndjson(rows, encoder: Callable[[object], dict]) -> bytes:
+    return b"".join(dumps(encoder(row)) + b"\n" for row in rows)
+
+def render_csv(rows, encoder: Callable[[object], dict], header=None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header is not None:
+        writer.writerow(header)
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in encoder(row).values()])
+    return buffer.getvalue().encode("utf-8")
+
+async def stream_export(session_factory, query, encoder: Callable[[object], dict], fields,
+                        export_format: str) -> AsyncIterator[bytes]:
+    """Yield the rendered rows of `query` chunk by chunk, in `export_format`.
+
+    Rows come through a server-side cursor (AsyncSession.stream with
+    yield_per), so neither the driver nor the ORM holds more than one chunk.
+    """
+    if export_format == "csv":
+        yield render_csv((), encoder, header=fields)
+    async with session_factory() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_ROWS))
+        async for rows in result.partitions():
+            if export_format == "csv":
+                yield render_csv(rows, encoder)
+            else:
+                yield render_ndjson(rows, encoder)
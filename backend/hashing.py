@@ -0,0 +1,115 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from fastapi import HTTPException, status
+from functools import lru_cache
+import hashlib
+import hmac
+import multiprocessing
+import os
+import re
+import threading
+
+# bcrypt cost factor; each +1 doubles the work per hash
+PASSWORD_HASH_ROUNDS = int(os.environ.get("PASSWORD_HASH_ROUNDS", "12"))
+# Worker processes for hashing; 0 hashes inline in the calling thread
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hash jobs allowed in flight before new ones are turned away with 503
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "16"))
+PASSWORD_HASH_TIMEOUT_SECONDS = float(os.environ.get("PASSWORD_HASH_TIMEOUT_SECONDS", "10"))
+
+@lru_cache(maxsize=None)
+def crypt_context():
+    # passlib is imported on first use, keeping it off the startup path
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=PASSWORD_HASH_ROUNDS)
+
+# Hashes written before bcrypt was enabled: unsalted SHA-256 hex digests
+_LEGACY_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+def is_legacy_hash(hashed_password: str) -> bool:
+    return bool(_LEGACY_SHA256.match(hashed_password or ""))
+
+# Run inside the worker processes
+def _hash(password: str) -> str:
+    return crypt_context().hash(password)
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return crypt_context().verify(password, hashed_password)
+
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+class HashingPool:
+    """Process pool for password KDF work with a hard cap on queued jobs.
+
+    Keeps bcrypt off the request threadpool, and rejects work with 503
+    instead of queueing without bound when a login storm outpaces the workers.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Not fork: by now this process runs the request threadpool and
+                # the job and reminder threads, and a forked child can inherit
+                # a lock one of them held and deadlock on it
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_MP_CONTEXT)
+            return self._executor
+
+    def run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, please retry",
+                headers={"Retry-After": "1"}
+            )
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Held until the job itself is done, not until this caller gives up
+        # waiting, so jobs left running by timeouts still count against the cap
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication timed out, please retry",
+                headers={"Retry-After": "1"}
+            )
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+hashing_pool = HashingPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_TIMEOUT_SECONDS)
+
+def hash_password(password: str) -> str:
+    return hashing_pool.run(_hash, password)
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    if is_legacy_hash(hashed_password):
+        digest = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(digest, hashed_password)
+    try:
+        return hashing_pool.run(_verify, password, hashed_password)
+    except ValueError:
+        # Unrecognised hash format
+        return False
+
+def needs_rehash(hashed_password: str) -> bool:
+    return is_legacy_hash(hashed_password) or crypt_context().needs_update(hashed_password)
@@ -0,0 +1,281 @@
+"""Durable background jobs, kept in the jobs table.
+
+Request handlers call enqueue() on their own session, so a job commits or
+rolls back with the change that asked for it, and returns right away.
+Worker threads in every process poll the table, claim a batch of due jobs
+with one conditional UPDATE and run their handlers. A claim is a lease: a
+worker that dies mid-batch leaves its jobs to be claimed again once
+JOB_LEASE_SECONDS pass, so handlers run at least once and must be safe to
+repeat. A failing handler is retried with exponential backoff; after
+JOB_MAX_ATTEMPTS the job stays in the table as "failed".
+
+SQLite has one writer at a time, and every claim and completion is a write
+that a booking request may have to wait behind. Workers therefore wait
+JOB_COALESCE_SECONDS after being woken so a burst of bookings is claimed,
+and later deleted, in one transaction each instead of two per job.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.orm import Session
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+import models
+from metrics import Histogram, LATENCY_BUCKETS
+
+# Worker threads per process; 0 leaves the queue to other processes
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+# First retry delay, doubled per attempt up to the cap
+JOB_BACKOFF_SECONDS = float(os.environ.get("JOB_BACKOFF_SECONDS", "2"))
+JOB_BACKOFF_MAX_SECONDS = float(os.environ.get("JOB_BACKOFF_MAX_SECONDS", "300"))
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+# Idle workers look for due jobs (retries, other processes' jobs) this often
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1"))
+# Due jobs one claim takes; a full batch wakes another worker to help
+JOB_CLAIM_BATCH = int(os.environ.get("JOB_CLAIM_BATCH", "50"))
+# How long a woken worker lets jobs gather before claiming them
+JOB_COALESCE_SECONDS = float(os.environ.get("JOB_COALESCE_SECONDS", "0.2"))
+JOB_STATUSES = ("queued", "running", "failed")
+
+logger = logging.getLogger(__name__)
+
+HANDLERS: Dict[str, Callable[[Session, dict], None]] = {}
+
+def job_handler(kind: str):
+    """Register `fn(db, payload)` for jobs of `kind`.
+
+    Changes the handler leaves uncommitted in `db` are committed when it
+    returns and rolled back when it raises.
+    """
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+def enqueue(db: Session, kind: str, payload: dict, delay: float = 0,
+            max_attempts: Optional[int] = None) -> models.Job:
+    """Queue a job in `db`'s transaction; workers see it once that commits."""
+    job = models.Job(
+        id=str(uuid.uuid4()),
+        kind=kind,
+        payload=payload,
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts or JOB_MAX_ATTEMPTS,
+        run_at=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    db.add(job)
+    db.info[_PENDING_KEY] = db.info.get(_PENDING_KEY, 0) + 1
+    return job
+
+def backoff(attempts: int) -> float:
+    # Jittered, so jobs that failed together (an outage) do not retry together
+    delay = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+class JobQueue:
+    """Worker pool over the jobs table, with depth and latency metrics."""
+
+    def __init__(self, workers: int, poll_interval: float, lease: float,
+                 batch_size: int = JOB_CLAIM_BATCH, coalesce: float = JOB_COALESCE_SECONDS):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.batch_size = batch_size
+        self.coalesce = coalesce
+        self.session_factory = None
+        self.enqueued = 0
+        # Rows per status, refreshed by the workers at most once per poll
+        self.depth: Dict[str, int] = {}
+        self._depth_at = 0.0
+        self._threads = []
+        self._stop = threading.Event()
+        # Commits since a worker last woke; notify() wakes one idle worker
+        # instead of all of them racing for the same claim
+        self._pending = 0
+        self._wake = threading.Condition()
+        self._lock = threading.Lock()
+        self._outcomes: Dict[tuple, int] = defaultdict(int)
+        self._wait: Dict[str, Histogram] = {}
+        self._run: Dict[str, Histogram] = {}
+
+    def start(self, session_factory):
+        if self._threads or self.workers <= 0:
+            return
+        self.session_factory = session_factory
+        self._stop.clear()
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self, count: int = 1):
+        with self._lock:
+            self.enqueued += count
+        self._signal()
+
+    def _signal(self):
+        with self._wake:
+            self._pending += 1
+            self._wake.notify()
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                with self.session_factory() as db:
+                    self.refresh_depth(db)
+                    while not self._stop.is_set():
+                        ran = self.work_batch(db)
+                        if ran < self.batch_size:
+                            break
+                        # More may be due; let an idle worker share them
+                        self._signal()
+            except Exception:
+                logger.exception("Job worker failed; retrying after the poll interval")
+            with self._wake:
+                woken = self._wake.wait_for(lambda: self._pending or self._stop.is_set(), self.poll_interval)
+                self._pending = 0
+            if woken:
+                self._stop.wait(self.coalesce)
+
+    def refresh_depth(self, db: Session, force: bool = False):
+        if not force and time.monotonic() - self._depth_at < self.poll_interval:
+            return
+        self._depth_at = time.monotonic()
+        table = models.Job.__table__
+        rows = db.execute(select(table.c.status, func.count()).group_by(table.c.status)).all()
+        db.rollback()
+        self.depth = {**dict.fromkeys(JOB_STATUSES, 0), **dict(rows)}
+
+    def _claim(self, db: Session, now: datetime, claim_id: str, limit: int):
+        table = models.Job.__table__
+        due = (
+            ((table.c.status == "queued") & (table.c.run_at <= now), table.c.run_at),
+            # Claimed by a worker that has since died or stalled
+            ((table.c.status == "running") & (table.c.locked_until <= now), table.c.locked_until),
+        )
+        claimed = 0
+        for condition, order in due:
+            if claimed >= limit:
+                break
+            # Read first: an idle poll should not take SQLite's write lock
+            candidates = db.execute(
+                select(table.c.id).where(condition).order_by(order).limit(limit - claimed)
+            ).scalars().all()
+            if not candidates:
+                continue
+            # Compare-and-set: of workers racing for a job, one update matches it
+            claimed += db.execute(update(table).where(table.c.id.in_(candidates), condition).values(
+                status="running",
+                attempts=table.c.attempts + 1,
+                locked_until=now + timedelta(seconds=self.lease),
+                claim_id=claim_id
+            )).rowcount
+        if not claimed:
+            db.rollback()
+            return []
+        db.commit()
+        jobs = db.execute(select(
+            table.c.id, table.c.kind, table.c.payload, table.c.attempts, table.c.max_attempts, table.c.run_at
+        ).where(table.c.claim_id == claim_id).order_by(table.c.run_at)).all()
+        db.rollback()
+        return jobs
+
+    def work_batch(self, db: Session, now: Optional[datetime] = None, limit: Optional[int] = None) -> int:
+        """Claim and run up to `limit` due jobs; returns how many ran."""
+        now = now or datetime.utcnow()
+        claim_id = str(uuid.uuid4())
+        jobs = self._claim(db, now, claim_id, limit or self.batch_size)
+        table = models.Job.__table__
+        # Only the holder of this claim may finish its jobs; after a lost
+        # lease the job has a new claim and these statements match nothing
+        claimed = table.c.claim_id == claim_id
+        done = []
+        for job_id, kind, payload, attempts, max_attempts, run_at in jobs:
+            started = time.perf_counter()
+            try:
+                handler = HANDLERS.get(kind)
+                if handler is None:
+                    raise LookupError(f"no handler registered for job kind {kind!r}")
+                handler(db, payload)
+                db.commit()
+                done.append(job_id)
+                outcome = "done"
+            except Exception as exc:
+                db.rollback()
+                error = f"{type(exc).__name__}: {exc}"[:2000]
+                if attempts >= max_attempts:
+                    outcome = "failed"
+                    values = {"status": "failed", "locked_until": None, "claim_id": None, "last_error": error}
+                    logger.error("Job %s (%s) failed for good after %d attempts: %s", job_id, kind, attempts, error)
+                else:
+                    outcome = "retried"
+                    retry_at = now + timedelta(seconds=backoff(attempts))
+                    values = {"status": "queued", "locked_until": None, "claim_id": None,
+                              "run_at": retry_at, "last_error": error}
+                    logger.warning("Job %s (%s) attempt %d failed, retrying at %s: %s",
+                                   job_id, kind, attempts, retry_at, error)
+                db.execute(update(table).where(table.c.id == job_id, claimed).values(**values))
+                db.commit()
+            self._observe(kind, outcome, (now - run_at).total_seconds(), time.perf_counter() - started)
+        if done:
+            db.execute(delete(table).where(table.c.id.in_(done), claimed))
+            db.commit()
+        return len(jobs)
+
+    def _observe(self, kind: str, outcome: str, waited: float, ran: float):
+        with self._lock:
+            self._outcomes[(kind, outcome)] += 1
+            self._wait.setdefault(kind, Histogram(LATENCY_BUCKETS)).observe(max(waited, 0.0))
+            self._run.setdefault(kind, Histogram(LATENCY_BUCKETS)).observe(ran)
+
+    def collect(self):
+        with self._lock:
+            outcomes = sorted(self._outcomes.items())
+            enqueued = self.enqueued
+        return [
+            ("jobs_depth", "gauge", "Jobs in the table by status.",
+             [(f'status="{status}"', count) for status, count in sorted(self.depth.items())]),
+            ("jobs_enqueued_total", "counter", "Jobs committed by this process.", [("", enqueued)]),
+            ("jobs_processed_total", "counter", "Job attempts by kind and outcome.",
+             [(f'kind="{kind}",outcome="{outcome}"', count) for (kind, outcome), count in outcomes]),
+        ]
+
+    def collect_histograms(self):
+        with self._lock:
+            waits = [(f'kind="{kind}"', histogram.copy()) for kind, histogram in sorted(self._wait.items())]
+            runs = [(f'kind="{kind}"', histogram.copy()) for kind, histogram in sorted(self._run.items())]
+        return [
+            ("jobs_wait_seconds", "Time from a job falling due to a worker claiming it.", waits),
+            ("jobs_run_seconds", "Handler run time per attempt.", runs),
+        ]
+
+job_queue = JobQueue(JOB_WORKERS, JOB_POLL_SECONDS, JOB_LEASE_SECONDS)
+
+# ==================== Wake-up ====================
+
+_PENDING_KEY = "jobs_enqueued"
+
+@event.listens_for(Session, "after_commit")
+def _wake_workers(session):
+    count = session.info.pop(_PENDING_KEY, 0)
+    if count:
+        job_queue.notify(count)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_jobs(session):
+    session.info.pop(_PENDING_KEY, None)
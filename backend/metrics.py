@@ -0,0 +1,223 @@
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from sqlalchemy import event
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+
+# Upper bounds in seconds, Prometheus-style (+Inf is implied)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_HOLD_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+POOL_EVENTS = ("connect", "checkout", "checkin")
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def copy(self) -> "Histogram":
+        histogram = Histogram(self.bounds)
+        histogram.counts = list(self.counts)
+        histogram.total = self.total
+        histogram.count = self.count
+        return histogram
+
+    def render(self, name: str, labels: str, lines: List[str]):
+        cumulative = 0
+        prefix = f"{labels}," if labels else ""
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+        wrapped = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{wrapped} {self.total:.6f}")
+        lines.append(f"{name}_count{wrapped} {self.count}")
+
+class MetricsRegistry:
+    """Request metrics keyed by route template, plus DB pool and threadpool gauges.
+
+    Request-side counters are only touched from the event loop thread, so
+    they need no lock; pool checkouts happen on worker threads and do.
+    """
+
+    def __init__(self):
+        self.enabled = METRICS_ENABLED
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.in_flight = 0
+        self.pool_hold: Dict[str, Histogram] = {}
+        self.pool_events: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.pools = {}
+        self.collectors = []
+        self.histogram_collectors = []
+        self._pool_lock = threading.Lock()
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        key = (method, route)
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(seconds)
+        self.responses[(method, route, status)] += 1
+
+    def instrument_pool(self, name: str, engine):
+        """Count new connections, checkouts and checkins on `engine`'s pool and
+        time how long each checkout is held.
+
+        Pool events fire only once a connection has been handed out, so the
+        wait for a free one is not observable here; checked-out connections
+        against pool size and overflow show when callers are queueing.
+        """
+        pool = engine.pool
+        histogram = self.pool_hold.setdefault(name, Histogram(POOL_HOLD_BUCKETS))
+        self.pools[name] = pool
+
+        def on_connect(dbapi_connection, connection_record):
+            with self._pool_lock:
+                self.pool_events[(name, "connect")] += 1
+
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            connection_record.info["checked_out_at"] = time.perf_counter()
+            with self._pool_lock:
+                self.pool_events[(name, "checkout")] += 1
+
+        def on_checkin(dbapi_connection, connection_record):
+            started = connection_record.info.pop("checked_out_at", None)
+            with self._pool_lock:
+                self.pool_events[(name, "checkin")] += 1
+                if started is not None:
+                    histogram.observe(time.perf_counter() - started)
+
+        event.listen(pool, "connect", on_connect)
+        event.listen(pool, "checkout", on_checkout)
+        event.listen(pool, "checkin", on_checkin)
+
+    def add_collector(self, collector):
+        """Register a callable returning extra (name, type, help, [(labels, value)]) samples."""
+        self.collectors.append(collector)
+
+    def add_histogram_collector(self, collector):
+        """Register a callable returning extra (name, help, [(labels, Histogram)]) histograms."""
+        self.histogram_collectors.append(collector)
+
+    def reset(self):
+        self.latency.clear()
+        self.responses.clear()
+        with self._pool_lock:
+            self.pool_events.clear()
+            for name in self.pool_hold:
+                self.pool_hold[name] = Histogram(POOL_HOLD_BUCKETS)
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        lines.append("# HELP http_request_duration_seconds Request latency by route template.")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        for (method, route), histogram in sorted(self.latency.items()):
+            histogram.render("http_request_duration_seconds", f'method="{method}",route="{route}"', lines)
+
+        lines.append("# HELP http_responses_total Responses by route template and status code.")
+        lines.append("# TYPE http_responses_total counter")
+        for (method, route, status), count in sorted(self.responses.items()):
+            lines.append(f'http_responses_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+        lines.append("# HELP http_requests_in_flight Requests currently being handled.")
+        lines.append("# TYPE http_requests_in_flight gauge")
+        lines.append(f"http_requests_in_flight {self.in_flight}")
+
+        lines.append("# HELP threadpool_tokens_in_use Worker threads busy running sync handlers.")
+        lines.append("# TYPE threadpool_tokens_in_use gauge")
+        try:
+            import anyio.to_thread
+            limiter = anyio.to_thread.current_default_thread_limiter()
+            lines.append(f"threadpool_tokens_in_use {limiter.borrowed_tokens}")
+            lines.append("# TYPE threadpool_tokens_total gauge")
+            lines.append(f"threadpool_tokens_total {limiter.total_tokens}")
+            lines.append("# TYPE threadpool_tasks_waiting gauge")
+            lines.append(f"threadpool_tasks_waiting {limiter.statistics().tasks_waiting}")
+        except RuntimeError:
+            # Not called from the event loop
+            pass
+
+        lines.append("# HELP db_pool_checkout_held_seconds Time a pooled DB connection stays checked out.")
+        lines.append("# TYPE db_pool_checkout_held_seconds histogram")
+        with self._pool_lock:
+            for name, histogram in sorted(self.pool_hold.items()):
+                histogram.render("db_pool_checkout_held_seconds", f'pool="{name}"', lines)
+            lines.append("# HELP db_pool_events_total New connections, checkouts and checkins per pool.")
+            lines.append("# TYPE db_pool_events_total counter")
+            for name in sorted(self.pools):
+                for kind in POOL_EVENTS:
+                    lines.append(f'db_pool_events_total{{pool="{name}",event="{kind}"}} {self.pool_events[(name, kind)]}')
+        # Queueing shows as checked_out reaching size plus max overflow
+        for gauge, method in (("db_pool_checked_out", "checkedout"), ("db_pool_size", "size"), ("db_pool_overflow", "overflow")):
+            lines.append(f"# TYPE {gauge} gauge")
+            for name, pool in sorted(self.pools.items()):
+                value = getattr(pool, method, None)
+                if value is not None:
+                    lines.append(f'{gauge}{{pool="{name}"}} {value()}')
+
+        for collector in self.collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    wrapped = f"{{{labels}}}" if labels else ""
+                    lines.append(f"{name}{wrapped} {value}")
+
+        for collector in self.histogram_collectors:
+            for name, help_text, histograms in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in histograms:
+                    histogram.render(name, labels, lines)
+
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route latency, status codes and in-flight gauges."""
+
+    def __init__(self, app, registry: MetricsRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        method = scope["method"]
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        registry.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            registry.in_flight -= 1
+            # The router stores the matched route in the scope; label by its
+            # template so /doctors/<uuid> does not create a series per doctor
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            registry.observe_request(method, template, status_holder[0], elapsed)
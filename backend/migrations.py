@@ -0,0 +1,219 @@
+"""Versioned schema migrations.
+
+create_all() only creates missing tables; it never changes existing ones.
+Each migration below evolves a live database by one numbered step, and the
+applied versions are recorded in schema_migrations. Migrations must be
+idempotent, because a fresh database already gets the current schema from
+create_all() before they run.
+
+Run from backend/:  python migrations.py status
+                    python migrations.py upgrade [--to VERSION]
+"""
+from datetime import datetime, time
+from typing import Callable, List, NamedTuple, Optional
+import argparse
+
+from sqlalchemy import (
+    Column, Date, DateTime, Integer, MetaData, String, Table, bindparam, column, inspect, select, table, text, update,
+)
+
+import models
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable
+
+MIGRATIONS: List[Migration] = []
+
+def migration(version: int, description: str):
+    def register(fn):
+        assert not MIGRATIONS or MIGRATIONS[-1].version < version, "migrations must be registered in order"
+        MIGRATIONS.append(Migration(version, description, fn))
+        return fn
+    return register
+
+# Each step spells out its own DDL and data changes as they stood when it
+# was written. Calling into models or app code would replay today's schema
+# and logic against an old database, and change the meaning of history
+# whenever that code changes.
+
+def _add_missing_columns(connection, table_name: str, columns: dict):
+    """Add each of `columns` (name -> SQLAlchemy type) that `table_name` lacks."""
+    existing = {info["name"] for info in inspect(connection).get_columns(table_name)}
+    for name, column_type in columns.items():
+        if name not in existing:
+            spelled = column_type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {spelled}"))
+
+def _create_indexes(connection, table_name: str, indexes: dict):
+    """Create each of `indexes` (name -> column list as in CREATE INDEX) not there yet."""
+    existing = {info["name"] for info in inspect(connection).get_indexes(table_name)}
+    for name, columns in indexes.items():
+        if name not in existing:
+            connection.execute(text(f"CREATE INDEX {name} ON {table_name} ({columns})"))
+
+_TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M%p", "%I %p")
+
+def _parse_time(value) -> Optional[time]:
+    # Booking times as the app accepted them when migrations 3 and 4 ran
+    if isinstance(value, time):
+        return value
+    spelled = str(value).strip().upper()
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.strptime(spelled, fmt).time()
+        except ValueError:
+            continue
+    return None
+
+@migration(1, "Add medical record file size and checksum")
+def _medical_record_file_columns(connection):
+    _add_missing_columns(connection, "medical_records", {"file_size": Integer(), "checksum": String()})
+
+@migration(2, "Add composite indexes for appointment and medical record queries")
+def _hot_path_indexes(connection):
+    _create_indexes(connection, "appointments", {
+        "ix_appointments_patient_date": "patient_id, date DESC, id DESC",
+        "ix_appointments_doctor_date": "doctor_id, date DESC, id DESC",
+        "ix_appointments_date": "date DESC, id DESC",
+        "ix_appointments_payment_fee": "payment_status, fee",
+    })
+    _create_indexes(connection, "medical_records", {
+        "ix_medical_records_patient_created": "patient_id, created_at DESC, id DESC",
+        "ix_medical_records_doctor_created": "doctor_id, created_at DESC, id DESC",
+    })
+
+@migration(3, "Reserve the slots of active appointments")
+def _slot_reservations(connection):
+    # create_all() has made the table; existing bookings get their rows. The
+    # earliest booking of a double-booked slot keeps it; later ones stay as
+    # they are but are no longer protected
+    reservations = table(
+        "slot_reservations", column("doctor_id"), column("date", Date), column("slot", Integer),
+        column("appointment_id"), column("created_at", DateTime),
+    )
+    appointments = table(
+        "appointments", column("id"), column("doctor_id"), column("date", Date), column("time"),
+        column("status"), column("created_at", DateTime),
+    )
+    taken = {tuple(row) for row in connection.execute(
+        select(reservations.c.doctor_id, reservations.c.date, reservations.c.slot)
+    )}
+    result = connection.execute(
+        select(appointments.c.id, appointments.c.doctor_id, appointments.c.date, appointments.c.time)
+        .outerjoin(reservations, reservations.c.appointment_id == appointments.c.id)
+        .where(appointments.c.status != "cancelled", reservations.c.appointment_id.is_(None))
+        .order_by(appointments.c.created_at, appointments.c.id)
+    )
+    for rows in result.partitions(10000):
+        batch = []
+        for appointment_id, doctor_id, booking_date, booking_time in rows:
+            parsed = _parse_time(booking_time)
+            if parsed is None:
+                continue
+            # 15-minute slots, numbered from midnight
+            slot = (parsed.hour * 60 + parsed.minute) // 15
+            if (doctor_id, booking_date, slot) in taken:
+                continue
+            taken.add((doctor_id, booking_date, slot))
+            batch.append({"doctor_id": doctor_id, "date": booking_date, "slot": slot,
+                          "appointment_id": appointment_id, "created_at": datetime.utcnow()})
+        if batch:
+            connection.execute(reservations.insert(), batch)
+
+@migration(4, "Add appointment start timestamps for reminders")
+def _appointment_starts_at(connection):
+    _add_missing_columns(connection, "appointments", {"starts_at": DateTime(), "reminded_at": DateTime()})
+    appointments = table(
+        "appointments", column("id"), column("date", Date), column("time"), column("starts_at", DateTime),
+    )
+    last_id = ""
+    while True:
+        # Keyset batches rather than one cursor, since the rows change under it
+        rows = connection.execute(
+            select(appointments.c.id, appointments.c.date, appointments.c.time)
+            .where(appointments.c.starts_at.is_(None), appointments.c.id > last_id)
+            .order_by(appointments.c.id).limit(10000)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        batch = []
+        for appointment_id, booking_date, booking_time in rows:
+            parsed = _parse_time(booking_time) if booking_time is not None else None
+            if booking_date is not None and parsed is not None:
+                batch.append({"key": appointment_id, "starts_at": datetime.combine(booking_date, parsed)})
+        if batch:
+            connection.execute(
+                update(appointments).where(appointments.c.id == bindparam("key"))
+                .values(starts_at=bindparam("starts_at")),
+                batch
+            )
+    _create_indexes(connection, "appointments", {"ix_appointments_starts_at": "starts_at"})
+
+@migration(5, "Seed the stat counters")
+def _stat_counters(connection):
+    # Counters that don't exist yet, counted from the source tables
+    counters = table("stat_counters", column("name"), column("value"), column("updated_at", DateTime))
+    existing = set(connection.execute(select(counters.c.name)).scalars())
+    values = {
+        name: connection.execute(text(sql)).scalar() or 0
+        for name, sql in (
+            ("total_patients", "SELECT count(*) FROM patients"),
+            ("total_doctors", "SELECT count(*) FROM doctors"),
+            ("total_appointments", "SELECT count(*) FROM appointments"),
+            ("revenue", "SELECT sum(fee) FROM appointments WHERE payment_status = 'paid'"),
+        )
+    }
+    now = datetime.utcnow()
+    rows = [{"name": name, "value": value, "updated_at": now} for name, value in values.items() if name not in existing]
+    if rows:
+        connection.execute(counters.insert(), rows)
+
+def applied_versions(bind) -> set:
+    migration_metadata.create_all(bind=bind)
+    with bind.connect() as connection:
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+def upgrade(bind, target: Optional[int] = None) -> List[Migration]:
+    """Create missing tables, then apply pending migrations up to `target` in order."""
+    models.Base.metadata.create_all(bind=bind)
+    applied = applied_versions(bind)
+    pending = [m for m in MIGRATIONS if m.version not in applied and (target is None or m.version <= target)]
+    for step in pending:
+        # One transaction per step, so a failure leaves earlier steps recorded
+        with bind.begin() as connection:
+            step.apply(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=step.version, description=step.description, applied_at=datetime.utcnow()
+            ))
+    return pending
+
+def main():
+    from database import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["status", "upgrade"])
+    parser.add_argument("--to", type=int, help="stop after this version")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        for step in upgrade(engine, args.to):
+            print(f"applied {step.version}: {step.description}")
+    applied = applied_versions(engine)
+    for step in MIGRATIONS:
+        print(f"{'x' if step.version in applied else ' '} {step.version:>3}  {step.description}")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, Enum, Numeric, Text, ForeignKey, Date, Time, JSON
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, Enum, Numeric, Text, ForeignKey, Date, Time, JSON, Index
 from sqlalchemy.orm import relationship
 import uuid
 from datetime import datetime
@@ -110,9 +110,42 @@ class Appointment(Base):
     symptoms = Column(Text)
     fee = Column(Numeric(10, 2))
     payment_status = Column(String, default="pending")
+    # date and time as one range-queryable local timestamp, kept in step on
+    # flush; NULL when the time does not parse (see reminders.py)
+    starts_at = Column(DateTime)
+    # Fire time of the latest reminder sent, so each goes out once
+    reminded_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Matched to the list (newest first, keyed on date and id), slot and
+    # revenue queries; added to existing databases by migration 2
+    __table_args__ = (
+        Index("ix_appointments_patient_date", "patient_id", date.desc(), id.desc()),
+        Index("ix_appointments_doctor_date", "doctor_id", date.desc(), id.desc()),
+        Index("ix_appointments_date", date.desc(), id.desc()),
+        Index("ix_appointments_payment_fee", "payment_status", "fee"),
+        # Reminder window loads (migration 4)
+        Index("ix_appointments_starts_at", "starts_at"),
+    )
+
+class SlotReservation(Base):
+    # One row per taken (doctor, date, slot) of every active booking; the
+    # primary key is what keeps two bookings off one slot. Holds taken for
+    # the payment flow carry expires_at until payment is verified
+    __tablename__ = "slot_reservations"
+
+    doctor_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    slot = Column(Integer, primary_key=True)  # slots.slot_index of the time
+    appointment_id = Column(String, ForeignKey("appointments.id"), nullable=False, unique=True)
+    expires_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_slot_reservations_expires", "expires_at"),
+    )
+
 class MedicalRecord(Base):
     __tablename__ = "medical_records"
 
@@ -123,5 +156,51 @@ class MedicalRecord(Base):
     type = Column(String, nullable=False)
     title = Column(String, nullable=False)
     file_url = Column(String)
+    file_size = Column(Integer)
+    checksum = Column(String)  # SHA-256 hex digest of the stored file
     notes = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_medical_records_patient_created", "patient_id", created_at.desc(), id.desc()),
+        Index("ix_medical_records_doctor_created", "doctor_id", created_at.desc(), id.desc()),
+    )
+
+class DoctorAvailability(Base):
+    __tablename__ = "doctor_availability"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    doctor_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    day_of_week = Column(Integer, nullable=False)  # 0-6, Monday-Sunday
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
+    is_available = Column(Boolean, default=True)
+
+class StatCounter(Base):
+    __tablename__ = "stat_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Numeric(16, 2), nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Job(Base):
+    # Background work queued by request handlers (see jobs.py). Finished
+    # jobs are deleted; jobs out of attempts stay as "failed"
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String, nullable=False)
+    payload = Column(JSON)
+    status = Column(String, nullable=False, default="queued")  # queued, running, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False)  # due time, pushed back by retries
+    locked_until = Column(DateTime)  # lease of the worker running it
+    claim_id = Column(String)  # the claim that holds the lease
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+        Index("ix_jobs_status_locked_until", "status", "locked_until"),
+    )
@@ -0,0 +1,73 @@
+from datetime import date, datetime
+from typing import Callable, Optional, Sequence
+from fastapi import HTTPException
+from sqlalchemy import and_, false, or_
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def _to_json(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([_to_json(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types: Callable) -> tuple:
+    """Decode an opaque cursor back into its key values, one converter per key."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("cursor has the wrong shape")
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def page_size(limit: Optional[int], default: int = DEFAULT_PAGE_SIZE) -> int:
+    if limit is None:
+        return default
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+def optional(convert: Callable) -> Callable:
+    """Cursor converter for a nullable key: None stays None."""
+    return lambda value: None if value is None else convert(value)
+
+def _nullable(column) -> bool:
+    return bool(getattr(column.expression, "nullable", False))
+
+def keyset_order(columns: Sequence, descending: bool = False) -> list:
+    """ORDER BY terms for a keyset on `columns`, matching after_key().
+
+    NULLs in nullable columns sort last on every backend (SQLite and
+    PostgreSQL disagree by default).
+    """
+    terms = []
+    for column in columns:
+        term = column.desc() if descending else column.asc()
+        terms.append(term.nulls_last() if _nullable(column) else term)
+    return terms
+
+def after_key(columns: Sequence, values: Sequence, descending: bool = False):
+    """Keyset predicate selecting rows strictly after `values` in keyset_order(columns).
+
+    Spelled out as OR/AND rather than a row-value comparison so it works on
+    every backend and lets the planner use a composite index on the columns.
+    """
+    clauses = []
+    for position, column in enumerate(columns):
+        equal = [columns[i].is_(None) if values[i] is None else columns[i] == values[i] for i in range(position)]
+        if values[position] is None:
+            # NULLs sort last, so no value of this column comes after one
+            continue
+        beyond = column < values[position] if descending else column > values[position]
+        if _nullable(column):
+            beyond = or_(beyond, column.is_(None))
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses) if clauses else false()
@@ -0,0 +1,160 @@
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Optional
+import logging
+import os
+import re
+import time
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Profile every request (test runs), or only those sending PROFILE_HEADER
+# that the middleware's `authorize` accepts
+QUERY_PROFILING = os.environ.get("QUERY_PROFILING", "false").lower() in ("1", "true")
+PROFILE_HEADER = "x-profile-queries"
+# A statement shape repeated this often in one request is a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("QUERY_PROFILE_N_PLUS_ONE", "3"))
+SLOW_QUERY_MS = float(os.environ.get("QUERY_PROFILE_SLOW_MS", "100"))
+
+_PARAM_RE = re.compile(r"%\(\w+\)s|\$\d+|%s")
+_PARAM_LIST_RE = re.compile(r"\?(\s*,\s*\?)+")
+_SPACE_RE = re.compile(r"\s+")
+_EXPLAINABLE = ("select", "with", "update", "delete")
+
+def statement_shape(statement: str) -> str:
+    # Bound values are already placeholders; fold expanded IN lists and
+    # driver-specific markers so the same query always has one shape
+    shape = _PARAM_RE.sub("?", statement)
+    shape = _PARAM_LIST_RE.sub("?", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+class QueryProfile:
+    __slots__ = ("label", "statements", "total_ms", "shapes", "slow")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.statements = 0
+        self.total_ms = 0.0
+        self.shapes = Counter()
+        self.slow = []
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.statements += 1
+        self.total_ms += elapsed_ms
+        self.shapes[statement_shape(statement)] += 1
+
+    def n_plus_one(self):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= N_PLUS_ONE_THRESHOLD]
+
+    def report(self) -> dict:
+        return {
+            "label": self.label,
+            "statements": self.statements,
+            "total_ms": round(self.total_ms, 3),
+            "n_plus_one": [{"statement": shape, "count": count} for shape, count in self.n_plus_one()],
+            "slow": self.slow,
+        }
+
+current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("current_profile", default=None)
+
+def _explain(connection, cursor, statement: str, parameters):
+    # A fresh DBAPI cursor keeps the plan query out of these same events
+    prefix = "EXPLAIN QUERY PLAN " if connection.dialect.name == "sqlite" else "EXPLAIN "
+    explain_cursor = cursor.connection.cursor()
+    try:
+        explain_cursor.execute(prefix + statement, parameters)
+        return [" | ".join(str(value) for value in row) for row in explain_cursor.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        explain_cursor.close()
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        connection.info.setdefault("profile_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is None:
+        return
+    started = connection.info.get("profile_started")
+    if not started:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+    profile.record(statement, elapsed_ms)
+    if elapsed_ms >= SLOW_QUERY_MS and not executemany and statement.lstrip()[:6].lower().startswith(_EXPLAINABLE):
+        shape = statement_shape(statement)
+        if any(slow["statement"] == shape for slow in profile.slow):
+            return
+        profile.slow.append({
+            "statement": shape,
+            "ms": round(elapsed_ms, 3),
+            "plan": _explain(connection, cursor, statement, parameters),
+        })
+
+def _handle_error(exception_context):
+    # after_cursor_execute never fires for a failed statement
+    started = exception_context.connection.info.get("profile_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def log_report(report: dict):
+    for suspect in report["n_plus_one"]:
+        logger.warning("Likely N+1 in %s: %d x %s", report["label"], suspect["count"], suspect["statement"])
+    for slow in report["slow"]:
+        logger.warning("Slow query in %s (%.1f ms): %s\n  plan: %s", report["label"], slow["ms"],
+                       slow["statement"], "\n        ".join(slow["plan"]))
+
+class QueryProfilerMiddleware:
+    """Pure ASGI middleware that profiles SQL per request.
+
+    Adds X-Query-Count, X-Query-Time-Ms and X-Query-N-Plus-One headers to
+    profiled responses, and logs likely N+1 patterns and slow-query plans.
+    Profiling costs extra work (EXPLAIN for slow queries), so PROFILE_HEADER
+    only counts when `authorize(headers)` accepts the request; without it
+    the header is ignored.
+    """
+
+    def __init__(self, app, always: bool = QUERY_PROFILING,
+                 authorize: Optional[Callable[[dict], bool]] = None):
+        self.app = app
+        self.always = always
+        self.authorize = authorize
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if not self.always:
+            headers = dict(scope["headers"])
+            requested = headers.get(PROFILE_HEADER.encode()) in (b"1", b"true")
+            if not (requested and self.authorize and self.authorize(headers)):
+                await self.app(scope, receive, send)
+                return
+
+        profile = QueryProfile(scope["path"])
+        token = current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(profile.statements).encode()))
+                headers.append((b"x-query-time-ms", f"{profile.total_ms:.3f}".encode()))
+                headers.append((b"x-query-n-plus-one", str(len(profile.n_plus_one())).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            route = scope.get("route")
+            profile.label = f"{scope['method']} {getattr(route, 'path', None) or scope['path']}"
+            log_report(profile.report())
@@ -0,0 +1,202 @@
+"""In-process reference data: specialties and compact doctor profiles.
+
+Both are small and rarely change, so every worker keeps them in memory as
+plain tuples and rebuilds them whole when they change. A snapshot is swapped
+in with one assignment, so readers never lock or see a half-loaded store.
+
+Freshness rides on a version stamp, the "reference_data_version" row of
+stat_counters. Any flush that touches a specialty, a doctor or a doctor's
+user bumps it in the same transaction. The committing worker reloads on its
+next read; other workers compare the stamp at most every
+REFERENCE_CHECK_SECONDS and reload when it has moved. A reload whose stamp
+moved further than this worker's own commits account for is "remote".
+"""
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+import os
+import time
+import models
+from serializers import DOCTOR_COLUMNS
+
+REFERENCE_CHECK_SECONDS = float(os.environ.get("REFERENCE_CHECK_SECONDS", "5"))
+VERSION_COUNTER = "reference_data_version"
+# User columns the doctor profiles are built from
+USER_PROFILE_COLUMNS = ("name", "email", "phone")
+
+class SpecialtyRecord(NamedTuple):
+    id: int
+    name: str
+    description: Optional[str]
+    icon: Optional[str]
+
+# One doctor card minus the specialty, which comes from the specialty records
+DoctorProfile = NamedTuple("DoctorProfile", [(column.key, object) for column in DOCTOR_COLUMNS])
+
+class ReferenceData:
+    __slots__ = ("version", "specialties", "specialties_by_id", "specialty_ids_by_name", "doctors")
+
+    def __init__(self, version: int, specialties: List[SpecialtyRecord], doctors: Dict[str, DoctorProfile]):
+        self.version = version
+        self.specialties = sorted(specialties, key=lambda specialty: specialty.name)
+        self.specialties_by_id = {specialty.id: specialty for specialty in specialties}
+        self.specialty_ids_by_name = {specialty.name: specialty.id for specialty in specialties}
+        self.doctors = doctors
+
+def _read_version(db: Session) -> int:
+    value = db.execute(
+        select(models.StatCounter.value).where(models.StatCounter.name == VERSION_COUNTER)
+    ).scalar()
+    return int(value or 0)
+
+class ReferenceStore:
+    """Holds the current ReferenceData snapshot.
+
+    Lock-free on purpose: async routes load through AsyncSession.run_sync,
+    which runs on the event loop thread and yields to other requests while
+    it waits on the database, so a thread lock held across it would block
+    the loop. Two overlapping reloads only duplicate work.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._data: Optional[ReferenceData] = None
+        self._stale = False
+        # Version bumps committed here since the last load
+        self._local_bumps = 0
+        self._checked_at = 0.0
+        self._listeners: List[Tuple[Callable[[], None], bool]] = []
+
+    def add_listener(self, callback: Callable[[], None], remote_only: bool = False):
+        """Call `callback` after every reload, e.g. to drop derived caches.
+
+        With remote_only, only after reloads that picked up other workers'
+        changes, for caches that this worker's own commits already keep
+        current through their session hooks.
+        """
+        self._listeners.append((callback, remote_only))
+
+    def peek(self) -> Optional[ReferenceData]:
+        """The current snapshot if it needs no database round trip, else None."""
+        data = self._data
+        if data is None or self._stale or time.monotonic() - self._checked_at >= self.check_interval:
+            return None
+        return data
+
+    def current(self, db: Session) -> ReferenceData:
+        data = self._data
+        if data is not None and not self._stale:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return data
+            # Claim the check; meanwhile other requests keep using this snapshot
+            self._checked_at = time.monotonic()
+            if _read_version(db) == data.version:
+                return data
+        return self._load(db)
+
+    async def current_async(self, db: AsyncSession) -> ReferenceData:
+        data = self.peek()
+        if data is None:
+            data = await db.run_sync(self.current)
+        return data
+
+    def _load(self, db: Session) -> ReferenceData:
+        # Cleared up front, so a change committed during the load marks it
+        # stale again and the next read reloads
+        self._stale = False
+        local_bumps, self._local_bumps = self._local_bumps, 0
+        previous = self._data
+        try:
+            # Stamp and rows come from one transaction, so they always agree
+            version = _read_version(db)
+            specialties = [SpecialtyRecord(*row) for row in db.execute(select(
+                models.Specialty.id, models.Specialty.name, models.Specialty.description, models.Specialty.icon
+            ))]
+            doctors = {}
+            for row in db.execute(select(*DOCTOR_COLUMNS).join(
+                models.User, models.Doctor.user_id == models.User.id
+            )):
+                doctors[row.user_id] = DoctorProfile(*row)
+        except Exception:
+            self._stale = True
+            self._local_bumps += local_bumps
+            raise
+        data = ReferenceData(version, specialties, doctors)
+        self._data = data
+        self._checked_at = time.monotonic()
+        self.reloads += 1
+        # A bump committed here after the stamp was read counts as remote
+        # this time: a spare notification, never a missed one
+        remote = previous is None or version - previous.version > local_bumps
+        for callback, remote_only in self._listeners:
+            if remote or not remote_only:
+                callback()
+        return data
+
+    def mark_stale(self, bumps: int = 1):
+        self._local_bumps += bumps
+        self._stale = True
+
+    def reset(self):
+        self._data = None
+        self._stale = False
+        self._local_bumps = 0
+
+reference_store = ReferenceStore(REFERENCE_CHECK_SECONDS)
+
+# ==================== Version stamp ====================
+
+_PENDING_KEY = "reference_data_changed"
+
+def _is_reference_row(instance) -> bool:
+    return isinstance(instance, (models.Specialty, models.Doctor)) or (
+        isinstance(instance, models.User) and instance.role == "doctor"
+    )
+
+def _profile_changed(instance) -> bool:
+    # Only the user columns in serializers.DOCTOR_COLUMNS; a password rehash
+    # on login leaves the cached profiles as they are
+    if isinstance(instance, models.User):
+        state = inspect(instance)
+        if state.attrs.role.history.has_changes():
+            # The old role may not be loaded; rare enough to always count
+            return True
+        return instance.role == "doctor" and any(
+            state.attrs[name].history.has_changes() for name in USER_PROFILE_COLUMNS
+        )
+    return _is_reference_row(instance)
+
+def _touches_reference_data(session: Session) -> bool:
+    if any(_is_reference_row(instance) for instance in list(session.new) + list(session.deleted)):
+        return True
+    return any(_profile_changed(instance) and session.is_modified(instance) for instance in session.dirty)
+
+@event.listens_for(Session, "before_flush")
+def _bump_version(session, flush_context, instances):
+    # Runs inside the flush, like the stat counters, so the stamp commits
+    # or rolls back with the change itself
+    if not _touches_reference_data(session):
+        return
+    table = models.StatCounter.__table__
+    bumped = session.execute(
+        table.update()
+        .where(table.c.name == VERSION_COUNTER)
+        .values(value=table.c.value + 1, updated_at=datetime.utcnow())
+    ).rowcount
+    if not bumped:
+        session.execute(table.insert().values(name=VERSION_COUNTER, value=1, updated_at=datetime.utcnow()))
+    # Once per flush, so the store can tell its own bumps from other workers'
+    session.info[_PENDING_KEY] = session.info.get(_PENDING_KEY, 0) + 1
+
+@event.listens_for(Session, "after_commit")
+def _reload_after_commit(session):
+    bumps = session.info.pop(_PENDING_KEY, 0)
+    if bumps:
+        reference_store.mark_stale(bumps)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_change(session):
+    session.info.pop(_PENDING_KEY, None)
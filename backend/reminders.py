@@ -0,0 +1,285 @@
+"""Appointment reminders, scheduled in memory instead of polled for.
+
+Appointments carry starts_at, their date and free-form time parsed into one
+indexed timestamp whenever either changes. Each worker keeps the reminders
+of appointments starting within the next REMINDER_WINDOW_HOURS (past the
+earliest reminder lead time) in a min-heap on fire time. The heap is loaded
+from ix_appointments_starts_at at startup and topped up as the window moves.
+Commits that create, reschedule or cancel an appointment update it through
+session hooks, and one thread sleeps until the earliest reminder is due.
+
+Entries are never removed from the heap; a reschedule or cancel just makes
+the old ones stale, and they are dropped when they come up. Other workers'
+heaps can be stale in the same way, so firing is a compare-and-set on the
+appointment row: it must still be active, still start at the same time and
+not have had this reminder yet. Of workers firing one reminder, a single
+update matches and runs the sink in its transaction. The default sink
+queues an appointment_reminder job (see tasks.py) for delivery with retries.
+"""
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+from sqlalchemy import event, inspect, or_, select, update
+from sqlalchemy.orm import Session
+import heapq
+import logging
+import os
+import threading
+import uuid
+import models
+from jobs import enqueue
+from slots import parse_time
+
+# Minutes before the start that each reminder goes out; empty disables them
+REMINDER_OFFSETS_MINUTES = tuple(sorted(
+    {int(minutes) for minutes in os.environ.get("REMINDER_OFFSETS_MINUTES", "1440,60").split(",") if minutes.strip()},
+    reverse=True
+))
+# Appointments loaded ahead of the earliest reminder; half of it is reloaded at a time
+REMINDER_WINDOW_HOURS = float(os.environ.get("REMINDER_WINDOW_HOURS", "6"))
+# Upper bound on the thread's sleep, so a changed wall clock is noticed
+REMINDER_MAX_SLEEP_SECONDS = 60
+REMINDER_RETRY_SECONDS = 5
+ACTIVE_STATUSES = ("pending", "confirmed")
+
+logger = logging.getLogger(__name__)
+
+class Reminder(NamedTuple):
+    appointment_id: str
+    patient_id: str
+    doctor_id: str
+    starts_at: datetime
+    minutes_before: int
+
+def appointment_start(booking_date: Optional[date], booking_time) -> Optional[datetime]:
+    """starts_at for a date and a free-form time; None when the time does not parse."""
+    parsed = parse_time(booking_time) if booking_time is not None else None
+    if booking_date is None or parsed is None:
+        return None
+    return datetime.combine(booking_date, parsed)
+
+def queue_reminder_job(db: Session, reminder: Reminder):
+    enqueue(db, "appointment_reminder", {
+        "appointment_id": reminder.appointment_id,
+        "starts_at": reminder.starts_at.isoformat(),
+        "minutes_before": reminder.minutes_before,
+    })
+
+class ReminderScheduler:
+    """Min-heap of upcoming reminders for one worker, and the thread firing them.
+
+    `sink(db, reminder)` runs in the transaction that marks the reminder
+    sent; raising rolls that back and the reminder is tried again.
+    """
+
+    def __init__(self, offsets, window_hours: float,
+                 sink: Callable[[Session, Reminder], None] = queue_reminder_job):
+        self.offsets = tuple(sorted(offsets, reverse=True))
+        self.window = timedelta(hours=window_hours)
+        self.sink = sink
+        self.session_factory = None
+        self.sent = 0
+        # (fire_at, appointment_id, starts_at, minutes_before)
+        self._heap: List[tuple] = []
+        # starts_at of every active appointment with reminders in the heap;
+        # heap entries that disagree are stale
+        self._starts: Dict[str, datetime] = {}
+        # Appointments starting up to here are in the heap; None until loaded
+        self.horizon: Optional[datetime] = None
+        self._wake = threading.Condition()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def lead(self) -> timedelta:
+        return timedelta(minutes=self.offsets[0] if self.offsets else 0)
+
+    def start(self, session_factory):
+        if self._thread or not self.offsets:
+            return
+        self.session_factory = session_factory
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="reminders", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+        with self._wake:
+            self._heap, self._starts, self.horizon = [], {}, None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.session_factory() as db:
+                    now = datetime.now()
+                    if self.horizon is None or now >= self._reload_at():
+                        self.load(db, now)
+                    self.fire_due(db)
+                delay = self._sleep_for(datetime.now())
+            except Exception:
+                logger.exception("Reminder scheduler failed; retrying")
+                delay = REMINDER_RETRY_SECONDS
+            with self._wake:
+                if not self._stop.is_set():
+                    self._wake.wait(delay)
+
+    def _reload_at(self) -> datetime:
+        return self.horizon - self.lead - self.window / 2
+
+    def _sleep_for(self, now: datetime) -> float:
+        with self._wake:
+            wake_at = self._reload_at()
+            if self._heap:
+                wake_at = min(wake_at, self._heap[0][0])
+        return min(max((wake_at - now).total_seconds(), 0), REMINDER_MAX_SLEEP_SECONDS)
+
+    def load(self, db: Session, now: Optional[datetime] = None) -> int:
+        """Add appointments starting between the horizon (or now) and the new horizon."""
+        now = now or datetime.now()
+        upper = now + self.lead + self.window
+        table = models.Appointment.__table__
+        with self._wake:
+            lower = self.horizon or now
+        rows = db.execute(
+            select(table.c.id, table.c.starts_at)
+            .where(table.c.starts_at > lower, table.c.starts_at <= upper, table.c.status.in_(ACTIVE_STATUSES))
+        ).all()
+        db.rollback()
+        with self._wake:
+            for appointment_id, starts_at in rows:
+                self._add(appointment_id, starts_at, now)
+            self.horizon = upper
+        return len(rows)
+
+    def _add(self, appointment_id: str, starts_at: datetime, now: datetime):
+        # Reminders already past are skipped, not sent late
+        entries = [(starts_at - timedelta(minutes=minutes), appointment_id, starts_at, minutes)
+                   for minutes in self.offsets]
+        entries = [entry for entry in entries if entry[0] > now]
+        if not entries:
+            self._starts.pop(appointment_id, None)
+            return
+        self._starts[appointment_id] = starts_at
+        for entry in entries:
+            heapq.heappush(self._heap, entry)
+
+    def apply(self, changes: Dict[str, tuple], now: Optional[datetime] = None):
+        """Take committed appointment changes: {id: (starts_at, active)}."""
+        now = now or datetime.now()
+        with self._wake:
+            if self.horizon is None:
+                return
+            earliest = self._heap[0][0] if self._heap else None
+            for appointment_id, (starts_at, active) in changes.items():
+                if not active or starts_at is None or starts_at > self.horizon:
+                    # Past the horizon, the window load picks it up
+                    self._starts.pop(appointment_id, None)
+                elif self._starts.get(appointment_id) != starts_at:
+                    self._add(appointment_id, starts_at, now)
+            if self._heap and (earliest is None or self._heap[0][0] < earliest):
+                self._wake.notify()
+
+    def _pop_due(self, now: datetime) -> List[tuple]:
+        due = []
+        with self._wake:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                fire_at, appointment_id, starts_at, minutes = entry
+                if self._starts.get(appointment_id) != starts_at:
+                    continue
+                if minutes == self.offsets[-1]:
+                    # Its last reminder
+                    del self._starts[appointment_id]
+                due.append(entry)
+        return due
+
+    def fire_due(self, db: Session, now: Optional[datetime] = None) -> int:
+        """Send every reminder due by `now` in one transaction; returns how many were sent."""
+        now = now or datetime.now()
+        due = self._pop_due(now)
+        if not due:
+            return 0
+        table = models.Appointment.__table__
+        sent = 0
+        try:
+            for fire_at, appointment_id, starts_at, minutes in due:
+                row = db.execute(
+                    update(table)
+                    .where(
+                        table.c.id == appointment_id,
+                        table.c.starts_at == starts_at,
+                        table.c.status.in_(ACTIVE_STATUSES),
+                        or_(table.c.reminded_at.is_(None), table.c.reminded_at < fire_at),
+                    )
+                    .values(reminded_at=fire_at)
+                    .returning(table.c.patient_id, table.c.doctor_id)
+                ).first()
+                if row is None:
+                    # Changed elsewhere, or another worker sent it
+                    continue
+                self.sink(db, Reminder(appointment_id, row.patient_id, row.doctor_id, starts_at, minutes))
+                sent += 1
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._wake:
+                for entry in due:
+                    self._starts.setdefault(entry[1], entry[2])
+                    heapq.heappush(self._heap, entry)
+            raise
+        self.sent += sent
+        return sent
+
+    def collect(self):
+        with self._wake:
+            scheduled = len(self._starts)
+        return [
+            ("reminders_scheduled", "gauge", "Appointments with reminders in this worker's heap.", [("", scheduled)]),
+            ("reminders_sent_total", "counter", "Reminders sent by this worker.", [("", self.sent)]),
+        ]
+
+reminder_scheduler = ReminderScheduler(REMINDER_OFFSETS_MINUTES, REMINDER_WINDOW_HOURS)
+
+# ==================== Change tracking ====================
+
+_PENDING_KEY = "reminder_changes"
+
+def _changed(instance, *attributes) -> bool:
+    state = inspect(instance)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+@event.listens_for(Session, "before_flush")
+def _track_appointments(session, flush_context, instances):
+    new = session.new
+    for instance in list(new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(instance, models.Appointment):
+            continue
+        if instance in session.deleted:
+            active = False
+        else:
+            if instance in new or _changed(instance, "date", "time"):
+                instance.starts_at = appointment_start(instance.date, instance.time)
+                if instance not in new:
+                    # Rescheduled: its reminders go out again
+                    instance.reminded_at = None
+            elif not _changed(instance, "status"):
+                continue
+            active = (instance.status or "pending") in ACTIVE_STATUSES
+        if instance.id is None:
+            # Normally set on INSERT; needed now to key the change
+            instance.id = str(uuid.uuid4())
+        session.info.setdefault(_PENDING_KEY, {})[instance.id] = (instance.starts_at, active)
+
+@event.listens_for(Session, "after_commit")
+def _schedule_after_commit(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        reminder_scheduler.apply(changes)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
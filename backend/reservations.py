@@ -0,0 +1,105 @@
+"""Slot reservations: the uniqueness guarantee behind every booking.
+
+Each active appointment owns one slot_reservations row keyed on (doctor,
+date, slot), inserted in the same transaction as the appointment. Two
+requests racing for a slot both pass any earlier check, but only one INSERT
+commits; the other fails on the primary key and is turned into a 409. The
+slot engine's occupancy only feeds the free-slot listing; bookings never
+trust it.
+
+A hold is a pending appointment whose reservation expires. Paying for it
+(POST /api/payments/verify) clears the expiry; otherwise the sweep cancels
+the appointment and frees the slot once the hold has lapsed.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+import os
+import time
+import models
+from slots import slot_index, slot_engine
+
+# How long a slot stays held while the patient pays
+HOLD_TTL_SECONDS = int(os.environ.get("HOLD_TTL_SECONDS", "600"))
+# Lapsed holds are swept at most this often per worker
+HOLD_SWEEP_SECONDS = float(os.environ.get("HOLD_SWEEP_SECONDS", "5"))
+
+def claim_slot(db: Session, appointment: models.Appointment,
+               expires_at: Optional[datetime] = None) -> Optional[models.SlotReservation]:
+    """Add the reservation for `appointment`; a taken slot fails at flush with IntegrityError.
+
+    A hold passes `expires_at`. Times off the slot grid cannot be reserved
+    and are let through, as the slot engine does.
+    """
+    slot = slot_index(appointment.time)
+    if slot is None:
+        return None
+    reservation = models.SlotReservation(
+        doctor_id=appointment.doctor_id,
+        date=appointment.date,
+        slot=slot,
+        appointment_id=appointment.id,
+        expires_at=expires_at
+    )
+    db.add(reservation)
+    return reservation
+
+def hold_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=HOLD_TTL_SECONDS)
+
+def release_slot(db: Session, appointment: models.Appointment):
+    table = models.SlotReservation.__table__
+    db.execute(delete(table).where(table.c.appointment_id == appointment.id))
+
+def confirm_hold(db: Session, appointment: models.Appointment) -> bool:
+    """Make a held slot permanent; False once the hold has lapsed and been released."""
+    table = models.SlotReservation.__table__
+    # Conditional on the row still being there, so a sweep that got to it
+    # first wins cleanly
+    held = db.execute(
+        update(table).where(table.c.appointment_id == appointment.id).values(expires_at=None)
+    ).rowcount
+    if held:
+        if appointment.status == "pending":
+            appointment.status = "confirmed"
+        return True
+    # No reservation: a released hold, or a time off the slot grid
+    return appointment.status != "cancelled"
+
+def release_expired_holds(db: Session, now: Optional[datetime] = None) -> int:
+    """Cancel appointments whose hold has lapsed and free their slots. Commits."""
+    now = now or datetime.utcnow()
+    table = models.SlotReservation.__table__
+    expired = db.execute(select(table.c.appointment_id).where(table.c.expires_at <= now)).scalars().all()
+    released: List[str] = []
+    for appointment_id in expired:
+        # Re-checked per row: the hold may have been paid for meanwhile
+        if db.execute(delete(table).where(
+            table.c.appointment_id == appointment_id, table.c.expires_at <= now
+        )).rowcount:
+            released.append(appointment_id)
+    if not released:
+        db.rollback()
+        return 0
+
+    appointments = db.scalars(select(models.Appointment).where(models.Appointment.id.in_(released))).all()
+    slots = []
+    for appointment in appointments:
+        if appointment.status == "pending":
+            appointment.status = "cancelled"
+            slots.append((appointment.doctor_id, appointment.date, appointment.time))
+    db.commit()
+    for doctor_id, booking_date, booking_time in slots:
+        slot_engine.release(doctor_id, booking_date, booking_time)
+    return len(released)
+
+_next_sweep = 0.0
+
+def sweep_expired_holds(db: Session) -> int:
+    """release_expired_holds, at most every HOLD_SWEEP_SECONDS."""
+    global _next_sweep
+    if time.monotonic() < _next_sweep:
+        return 0
+    _next_sweep = time.monotonic() + HOLD_SWEEP_SECONDS
+    return release_expired_holds(db)
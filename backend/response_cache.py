@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.responses import Response
+import hashlib
+import json
+import os
+import threading
+import time
+from downloads import etag_matches
+from search import tokenize
+import models
+
+# Rendered doctor catalog responses, bounded by total size in bytes
+DOCTOR_CACHE_MAX_BYTES = int(os.environ.get("DOCTOR_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Backstop for changes the session hooks cannot see (bulk SQL, a lagging replica)
+DOCTOR_CACHE_TTL_SECONDS = float(os.environ.get("DOCTOR_CACHE_TTL_SECONDS", "300"))
+# Rough per-entry cost of the key, ETag and bookkeeping on top of the body
+ENTRY_OVERHEAD_BYTES = 256
+
+class CachedResponse(NamedTuple):
+    expires_at: float
+    body: bytes
+    etag: str
+
+def render_json(content) -> bytes:
+    # Same conversion and encoding a plain return value gets from FastAPI
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+def strong_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+class ResponseCache:
+    """Bounded LRU of rendered JSON bodies and their strong ETags.
+
+    Keys are ("list", ...) for catalog pages and ("doctor", user_id) for a
+    single doctor. A change to any doctor drops every list page (any of them
+    may show it) and that doctor's own entry.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+        # Bumped by every invalidation; a response computed across one is
+        # not stored, since it may have read the rows from before the change
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def list_key(specialty, search, limit, offset, cursor, include_total) -> tuple:
+        # Search ignores case and punctuation, and a cursor overrides offset
+        terms = tuple(tokenize(search)) if search else None
+        return ("list", specialty or None, terms, limit, 0 if cursor else offset, cursor, include_total)
+
+    @staticmethod
+    def doctor_key(doctor_id: str) -> tuple:
+        return ("doctor", doctor_id)
+
+    def get(self, key: tuple) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, body: bytes, generation: int) -> CachedResponse:
+        """Store a rendered body computed since `generation` was read; returns the entry either way."""
+        entry = CachedResponse(time.monotonic() + self.ttl, body, strong_etag(body))
+        cost = len(body) + ENTRY_OVERHEAD_BYTES
+        with self._lock:
+            if generation != self.generation or cost > self.max_bytes:
+                return entry
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self.size_bytes += cost
+            while self.size_bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def _drop(self, key: tuple):
+        entry = self._entries.pop(key)
+        self.size_bytes -= len(entry.body) + ENTRY_OVERHEAD_BYTES
+
+    def invalidate(self, doctor_ids=None):
+        """Drop entries that may show these doctors; every entry when None."""
+        with self._lock:
+            self.generation += 1
+            if doctor_ids is None:
+                self._entries.clear()
+                self.size_bytes = 0
+                return
+            for key in list(self._entries):
+                if key[0] == "list" or key[1] in doctor_ids:
+                    self._drop(key)
+
+    def clear(self):
+        self.invalidate()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "bytes": self.size_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+doctor_cache = ResponseCache(DOCTOR_CACHE_MAX_BYTES, DOCTOR_CACHE_TTL_SECONDS)
+
+def cached_json_response(request: Request, entry: CachedResponse) -> Response:
+    # no-cache: clients may store the response but must revalidate each use
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+# ==================== Invalidation ====================
+
+_PENDING_KEY = "doctor_cache_pending"
+
+@event.listens_for(Session, "after_flush")
+def _collect_doctor_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, models.Doctor):
+            pending.add(instance.user_id)
+        elif isinstance(instance, models.User) and instance.role == "doctor":
+            pending.add(instance.id)
+        elif isinstance(instance, models.Specialty):
+            # Shown on every doctor of that specialty
+            pending.add(None)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_doctor_responses(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    doctor_cache.invalidate(None if None in pending else pending)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_doctor_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -29,6 +29,16 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+# Specialty Schemas
+class SpecialtyResponse(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    icon: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
 # Patient Schemas
 class PatientProfile(BaseModel):
     age: Optional[int] = None
@@ -73,6 +83,15 @@ class DoctorResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AvailabilityWindow(BaseModel):
+    day_of_week: int  # 0-6, Monday-Sunday
+    start_time: time
+    end_time: time
+    is_available: bool = True
+
+class AvailabilityUpdate(BaseModel):
+    windows: List[AvailabilityWindow]
+
 # Appointment Schemas
 class AppointmentCreate(BaseModel):
     doctor_id: str
@@ -81,6 +100,13 @@ class AppointmentCreate(BaseModel):
     type: str  # 'video' or 'in-person'
     symptoms: str
 
+class AppointmentBatchItem(AppointmentCreate):
+    # Admins importing a schedule name the patient; patients book for themselves
+    patient_id: Optional[str] = None
+
+class AppointmentBatchCreate(BaseModel):
+    appointments: List[AppointmentBatchItem]
+
 class AppointmentUpdate(BaseModel):
     status: Optional[str] = None
     payment_status: Optional[str] = None
@@ -101,6 +127,17 @@ class AppointmentResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AppointmentBatchResult(BaseModel):
+    index: int
+    status: int  # HTTP status this booking would have got on its own
+    appointment: Optional[AppointmentResponse] = None
+    detail: Optional[str] = None
+
+class AppointmentBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[AppointmentBatchResult]
+
 # Auth Response
 class TokenResponse(BaseModel):
     access_token: str
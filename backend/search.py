@@ -0,0 +1,224 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import re
+import threading
+import unicodedata
+import models
+
+# Relative weight of a match in each indexed field
+FIELD_WEIGHTS = {"name": 3.0, "specialty": 2.0, "hospital": 1.0, "location": 1.0}
+
+# Minimum trigram similarity for a fuzzy (typo-tolerant) token match
+MIN_SIMILARITY = 0.3
+PREFIX_SCORE = 1.0
+EXACT_SCORE = 1.2
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    folded = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    return _TOKEN_RE.findall(folded)
+
+def trigrams(token: str, prefix_only: bool = False) -> Set[str]:
+    # Padded like pg_trgm; a prefix query leaves out the trailing pad
+    padded = f"  {token}" if prefix_only else f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class DoctorSearchIndex:
+    """In-process trigram index over doctor name, specialty, hospital and location.
+
+    Tokens are indexed once per distinct spelling, so a query only scores the
+    vocabulary and then fans out to doctors through the token postings.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._stale: Set[str] = set()
+        self._docs: Dict[str, dict] = {}
+        self._token_docs: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._gram_tokens: Dict[str, Set[str]] = defaultdict(set)
+
+    def reset(self):
+        with self._lock:
+            self._loaded = False
+            self._stale.clear()
+            self._docs.clear()
+            self._token_docs.clear()
+            self._gram_tokens.clear()
+
+    def mark_stale(self, doctor_ids):
+        with self._lock:
+            self._stale.update(doctor_ids)
+
+    def _rows(self, db: Session, doctor_ids=None):
+        query = db.query(
+            models.Doctor.user_id,
+            models.User.name,
+            models.Specialty.name,
+            models.Doctor.hospital,
+            models.Doctor.location
+        ).join(models.User, models.Doctor.user_id == models.User.id).outerjoin(
+            models.Specialty, models.Doctor.specialty_id == models.Specialty.id
+        )
+        if doctor_ids is not None:
+            query = query.filter(models.Doctor.user_id.in_(doctor_ids))
+        return query.yield_per(1000)
+
+    def _add(self, doctor_id: str, name, specialty, hospital, location):
+        fields = {"name": name, "specialty": specialty, "hospital": hospital, "location": location}
+        weights: Dict[str, float] = {}
+        for field, value in fields.items():
+            for token in tokenize(value):
+                weights[token] = max(weights.get(token, 0.0), FIELD_WEIGHTS[field])
+
+        for token, weight in weights.items():
+            postings = self._token_docs[token]
+            if not postings:
+                for gram in trigrams(token):
+                    self._gram_tokens[gram].add(token)
+            postings[doctor_id] = weight
+        self._docs[doctor_id] = {"specialty": specialty, "name": name or "", "tokens": list(weights)}
+
+    def _remove(self, doctor_id: str):
+        doc = self._docs.pop(doctor_id, None)
+        if doc is None:
+            return
+        for token in doc["tokens"]:
+            postings = self._token_docs.get(token)
+            if postings is None:
+                continue
+            postings.pop(doctor_id, None)
+            if not postings:
+                del self._token_docs[token]
+                for gram in trigrams(token):
+                    tokens = self._gram_tokens.get(gram)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._gram_tokens[gram]
+
+    def _sync(self, db: Session):
+        if not self._loaded:
+            self.reset()
+            for row in self._rows(db):
+                self._add(*row)
+            self._loaded = True
+            return
+        if self._stale:
+            stale = list(self._stale)
+            self._stale.clear()
+            for doctor_id in stale:
+                self._remove(doctor_id)
+            for chunk_start in range(0, len(stale), 500):
+                for row in self._rows(db, stale[chunk_start:chunk_start + 500]):
+                    self._add(*row)
+
+    def _match_tokens(self, term: str) -> Dict[str, float]:
+        prefix_grams = trigrams(term, prefix_only=True)
+        full_grams = trigrams(term)
+
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in prefix_grams:
+            for token in self._gram_tokens.get(gram, ()):
+                shared[token] += 1
+
+        # Tokens sharing too few grams cannot reach MIN_SIMILARITY
+        min_shared = max(1, int(len(prefix_grams) * MIN_SIMILARITY))
+        matches = {}
+        for token, count in shared.items():
+            if token == term:
+                matches[token] = EXACT_SCORE
+            elif token.startswith(term):
+                matches[token] = PREFIX_SCORE
+            elif count >= min_shared:
+                token_grams = trigrams(token)
+                similarity = len(full_grams & token_grams) / len(full_grams | token_grams)
+                if similarity >= MIN_SIMILARITY:
+                    matches[token] = similarity
+        return matches
+
+    def _rank(self, terms: List[str], specialty: Optional[str]) -> List[Tuple[str, float]]:
+        if not terms:
+            return []
+
+        scores: Optional[Dict[str, float]] = None
+        for term in terms:
+            term_scores: Dict[str, float] = {}
+            for token, token_score in self._match_tokens(term).items():
+                for doctor_id, weight in self._token_docs[token].items():
+                    score = token_score * weight
+                    if score > term_scores.get(doctor_id, 0.0):
+                        term_scores[doctor_id] = score
+            # Every query term has to match something
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    doctor_id: score + term_scores[doctor_id]
+                    for doctor_id, score in scores.items()
+                    if doctor_id in term_scores
+                }
+            if not scores:
+                return []
+
+        # Doctors without a specialty are left out of listings, so of matches too
+        scores = {
+            doctor_id: score for doctor_id, score in scores.items()
+            if self._docs[doctor_id]["specialty"] is not None
+            and (not specialty or self._docs[doctor_id]["specialty"] == specialty)
+        }
+        return sorted(scores.items(), key=lambda item: (-item[1], self._docs[item[0]]["name"]))
+
+    def search(self, db: Session, text: str, specialty: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Return (doctor user_id, score) pairs for every listed doctor that
+        matches, best first."""
+        terms = tokenize(text)
+        with self._lock:
+            self._sync(db)
+            return self._rank(terms, specialty)
+
+    def search_cached(self, text: str, specialty: Optional[str] = None) -> Optional[List[Tuple[str, float]]]:
+        """Like search(), but never touches the database: returns None when the
+        index needs a sync first, so async callers can do that off the loop."""
+        terms = tokenize(text)
+        with self._lock:
+            if not self._loaded or self._stale:
+                return None
+            return self._rank(terms, specialty)
+
+doctor_search_index = DoctorSearchIndex()
+
+# ==================== Change tracking ====================
+
+_PENDING_KEY = "doctor_search_pending"
+
+@event.listens_for(Session, "after_flush")
+def _collect_doctor_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, models.Doctor):
+            pending.add(instance.user_id)
+        elif isinstance(instance, models.User) and instance.role == "doctor":
+            pending.add(instance.id)
+        elif isinstance(instance, models.Specialty):
+            # Specialty renames touch many doctors; rebuild from scratch
+            pending.add(None)
+
+@event.listens_for(Session, "after_commit")
+def _apply_doctor_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if None in pending:
+        doctor_search_index.reset()
+    else:
+        doctor_search_index.mark_stale(pending)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_doctor_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -3,7 +3,8 @@ from sqlalchemy.orm import Session
 from database import SessionLocal, engine
 import models
 from auth import get_password_hash
-from datetime import datetime, timedelta
+from stats import reconcile as reconcile_stats
+from datetime import datetime, timedelta, time
 import uuid
 import os
 
@@ -19,7 +20,9 @@ def seed_database():
         print("🌱 Starting database seeding...")
         
         # Clear existing data
+        db.query(models.SlotReservation).delete()
         db.query(models.Appointment).delete()
+        db.query(models.DoctorAvailability).delete()
         db.query(models.Doctor).delete()
         db.query(models.Patient).delete()
         db.query(models.Specialty).delete()
@@ -184,6 +187,7 @@ def seed_database():
             }
         ]
         
+        day_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
         for doctor_data in doctors_data:
             user = models.User(
                 id=str(uuid.uuid4()),
@@ -214,9 +218,23 @@ def seed_database():
                 availability_days=doctor_data["availability_days"]
             )
             db.add(doctor)
+            
+            # Weekly consultation hours matching availability_days
+            for day_name in doctor_data["availability_days"]:
+                db.add(models.DoctorAvailability(
+                    id=str(uuid.uuid4()),
+                    doctor_id=user.id,
+                    day_of_week=day_names.index(day_name),
+                    start_time=time(9, 0),
+                    end_time=time(17, 0),
+                    is_available=True
+                ))
         db.commit()
         print(f"✅ Created {len(doctors_data)} doctors")
         
+        # Bulk deletes above bypass the counter hooks; rebuild from scratch
+        reconcile_stats(db)
+        
         print("✅ Database seeding completed successfully!")
         print("\n📋 Login Credentials:")
         print("Admin: admin@example.com / admin123")
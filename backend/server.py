@@ -1,45 +1,100 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Response
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from contextlib import asynccontextmanager
+from datetime import date as date_type, datetime
 import logging
+import os
 from pathlib import Path
-from dotenv import load_dotenv
-import shutil
 import uuid as uuid_module
 import models
 import schemas
 import auth
-from database import engine, get_db
+import hashing
+import stats
+import migrations
+from database import (engine, read_engine, async_engine, async_read_engine,
+                      get_db, get_read_db, get_async_read_db, get_session_factory,
+                      get_async_read_session_factory)
 from seed_data import seed_database
-
-# Load environment variables
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
-
-# Create FastAPI app
-app = FastAPI(title="MediCare API", version="1.0.0")
+from slots import slot_engine, slot_index, SLOT_MINUTES, MAX_SLOT_DAYS
+from search import doctor_search_index
+from response_cache import doctor_cache, render_json, cached_json_response
+from serializers import doctor_select, serialize_doctor, compile_encoder, dumps, list_response, FAST_JSON_RESPONSES
+from bookings import BatchBooking, MAX_BATCH_APPOINTMENTS, BATCH_CONFLICT_RETRIES
+from jobs import enqueue, job_queue
+from reminders import reminder_scheduler
+from reservations import claim_slot, release_slot, confirm_hold, hold_expiry, sweep_expired_holds
+from reference import reference_store, ReferenceData
+from pagination import encode_cursor, decode_cursor, page_size, after_key, keyset_order, optional
+from uploads import UPLOAD_DIR, save_upload, UploadSizeLimitMiddleware
+from downloads import file_etag, file_response
+from exports import EXPORT_MEDIA_TYPES, stream_export
+import metrics
+import profiling
+import tasks  # registers the background job handlers
+
+# Importing this module must stay free of I/O: DDL and filesystem setup run
+# in the app lifespan (see init_storage), so workers and test collection
+# only pay for the imports themselves.
+RUN_MIGRATIONS_ON_STARTUP = os.environ.get("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
 
 # Create API router
 api_router = APIRouter(prefix="/api")
 
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# SQL profiling and pool timing hook into the shared engines once, in memory
+profiling.instrument_engine(engine)
+metrics.registry.instrument_pool("primary", engine)
+if read_engine is not engine:
+    profiling.instrument_engine(read_engine)
+    metrics.registry.instrument_pool("replica", read_engine)
+# Async engines run these hooks through their sync core
+if async_engine is not None:
+    profiling.instrument_engine(async_engine.sync_engine)
+    metrics.registry.instrument_pool("primary_async", async_engine.sync_engine)
+if async_read_engine not in (None, async_engine):
+    profiling.instrument_engine(async_read_engine.sync_engine)
+    metrics.registry.instrument_pool("replica_async", async_read_engine.sync_engine)
+
+def _cache_metrics():
+    cache = auth.principal_cache.stats()
+    doctors = doctor_cache.stats()
+    return [
+        ("auth_principal_cache_entries", "gauge", "Cached principals.", [("", cache["size"])]),
+        ("auth_principal_cache_lookups_total", "counter", "Principal cache lookups by outcome.",
+         [('result="hit"', cache["hits"]), ('result="miss"', cache["misses"])]),
+        ("auth_principal_cache_evictions_total", "counter", "Principals evicted for space.", [("", cache["evictions"])]),
+        ("doctor_response_cache_entries", "gauge", "Cached doctor catalog responses.", [("", doctors["size"])]),
+        ("doctor_response_cache_bytes", "gauge", "Bytes held by cached doctor responses.", [("", doctors["bytes"])]),
+        ("doctor_response_cache_lookups_total", "counter", "Doctor response cache lookups by outcome.",
+         [('result="hit"', doctors["hits"]), ('result="miss"', doctors["misses"])]),
+        ("doctor_response_cache_evictions_total", "counter", "Doctor responses evicted for space.",
+         [("", doctors["evictions"])]),
+        ("reference_data_reloads_total", "counter", "Reference data snapshots loaded.", [("", reference_store.reloads)]),
+        ("password_hash_rejected_total", "counter", "Hashing requests turned away with 503.",
+         [("", hashing.hashing_pool.rejected)]),
+    ]
+
+metrics.registry.add_collector(_cache_metrics)
+metrics.registry.add_collector(job_queue.collect)
+metrics.registry.add_histogram_collector(job_queue.collect_histograms)
+metrics.registry.add_collector(reminder_scheduler.collect)
+
+# Rendered doctor responses embed reference data, so a reload (including one
+# triggered by another worker's change) drops them. The search index
+# re-indexes this worker's changes doctor by doctor from its own session
+# hooks; only other workers' changes, whose doctors are unknown, rebuild it
+reference_store.add_listener(doctor_cache.clear)
+reference_store.add_listener(doctor_search_index.reset, remote_only=True)
+
 logger = logging.getLogger(__name__)
 
 # Health Check
@@ -47,6 +102,11 @@ logger = logging.getLogger(__name__)
 async def root():
     return {"message": "MediCare API is running", "version": "1.0.0"}
 
+# Prometheus text exposition; async so it can read the threadpool limiter
+@api_router.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 # ==================== Authentication Routes ====================
 
 @api_router.post("/auth/register", response_model=schemas.TokenResponse)
@@ -92,6 +152,8 @@ def register(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
             "token_type": "bearer",
             "user": new_user
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
@@ -110,6 +172,15 @@ def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
             detail="Incorrect email or password"
         )
     
+    # Upgrade legacy SHA-256 or lower-cost hashes now that we have the plaintext
+    if auth.password_needs_rehash(user.password_hash):
+        try:
+            user.password_hash = auth.get_password_hash(credentials.password)
+            db.commit()
+        except HTTPException:
+            # Hashing pool is saturated; try again on the next login
+            db.rollback()
+    
     # Generate token
     access_token = auth.create_access_token(
         data={"sub": str(user.id), "role": user.role}
@@ -122,151 +193,334 @@ def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
     }
 
 @api_router.get("/auth/me", response_model=schemas.UserResponse)
-def get_current_user_info(current_user: models.User = Depends(auth.get_current_user)):
+async def get_current_user_info(current_user: models.User = Depends(auth.get_current_user_async)):
     return current_user
 
 # ==================== Doctor Routes ====================
 
+# The hot read routes below are async on AsyncSession: waiting on the
+# database does not hold one of the threadpool's workers
+
+def _search_doctors_on_primary(session_factory, text: str, specialty: Optional[str]):
+    # The index syncs changed doctors from the primary, since a lagging
+    # replica could hand it stale rows that it would then keep
+    with session_factory() as primary:
+        return doctor_search_index.search(primary, text, specialty)
+
+async def _doctor_rows(db: AsyncSession, data: ReferenceData, doctor_ids: List[str]) -> list:
+    # Profiles come from memory; only doctors added since the last reload
+    # (by another worker) still need a query
+    rows = {doctor_id: data.doctors[doctor_id] for doctor_id in doctor_ids if doctor_id in data.doctors}
+    missing = [doctor_id for doctor_id in doctor_ids if doctor_id not in rows]
+    if missing:
+        for row in await db.execute(doctor_select().where(models.Doctor.user_id.in_(missing))):
+            rows[row.user_id] = row
+    return [rows[doctor_id] for doctor_id in doctor_ids if doctor_id in rows]
+
+async def _list_doctors(db: AsyncSession, data: ReferenceData, session_factory,
+                        specialty, search, limit, offset, cursor, include_total) -> dict:
+    query = doctor_select().where(models.Doctor.specialty_id.isnot(None))
+    next_cursor = None
+    
+    if search:
+        # Ranked lookup through the in-process index instead of a wildcard scan
+        matches = doctor_search_index.search_cached(search, specialty)
+        if matches is None:
+            matches = await run_in_threadpool(_search_doctors_on_primary, session_factory, search, specialty)
+        total = len(matches)
+        start = decode_cursor(cursor, int)[0] if cursor else offset
+        page_ids = [doctor_id for doctor_id, _ in matches[start:start + limit]]
+        rows = await _doctor_rows(db, data, page_ids)
+        if start + limit < total:
+            next_cursor = encode_cursor(start + limit)
+    else:
+        if specialty:
+            # Filter on the id, so the query needs no join to specialties
+            specialty_id = data.specialty_ids_by_name.get(specialty)
+            if specialty_id is None:
+                return {"doctors": [], "total": 0 if include_total else None, "next_cursor": None}
+            query = query.where(models.Doctor.specialty_id == specialty_id)
+        total = None
+        if include_total:
+            total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar_one()
+        
+        # Keyset on the primary key so deep pages cost the same as the first
+        query = query.order_by(models.Doctor.id)
+        if cursor:
+            query = query.where(models.Doctor.id > decode_cursor(cursor, str)[0])
+        elif offset:
+            query = query.offset(offset)
+        rows = (await db.execute(query.limit(limit + 1))).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].id)
+    
+    return {
+        "doctors": [serialize_doctor(row, data.specialties_by_id) for row in rows],
+        "total": total,
+        "next_cursor": next_cursor
+    }
+
+# Both doctor routes serve rendered bodies from doctor_cache (see
+# response_cache.py) and answer a matching If-None-Match with 304
 @api_router.get("/doctors", response_model=dict)
-def get_doctors(
+async def get_doctors(
+    request: Request,
     specialty: Optional[str] = None,
     search: Optional[str] = None,
     limit: int = 20,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_read_db),
+    session_factory=Depends(get_session_factory)
+):
+    limit = page_size(limit)
+    # Fresh reference data first: a reload also drops stale cached responses
+    data = await reference_store.current_async(db)
+    key = doctor_cache.list_key(specialty, search, limit, offset, cursor, include_total)
+    entry = doctor_cache.get(key)
+    if entry is None:
+        generation = doctor_cache.generation
+        content = await _list_doctors(db, data, session_factory, specialty, search, limit, offset, cursor, include_total)
+        entry = doctor_cache.put(key, render_json(content), generation)
+    return cached_json_response(request, entry)
+
+@api_router.get("/doctors/{doctor_id}")
+async def get_doctor(doctor_id: str, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    data = await reference_store.current_async(db)
+    key = doctor_cache.doctor_key(doctor_id)
+    entry = doctor_cache.get(key)
+    if entry is None:
+        generation = doctor_cache.generation
+        rows = await _doctor_rows(db, data, [doctor_id])
+        if not rows:
+            raise HTTPException(status_code=404, detail="Doctor not found")
+        entry = doctor_cache.put(key, render_json(serialize_doctor(rows[0], data.specialties_by_id)), generation)
+    return cached_json_response(request, entry)
+
+@api_router.get("/specialties", response_model=List[schemas.SpecialtyResponse])
+async def get_specialties(db: AsyncSession = Depends(get_async_read_db)):
+    data = await reference_store.current_async(db)
+    return data.specialties
+
+@api_router.get("/doctors/{doctor_id}/slots")
+def get_doctor_slots(
+    doctor_id: str,
+    start: Optional[date_type] = None,
+    days: int = 7,
     db: Session = Depends(get_db)
 ):
-    query = db.query(models.Doctor).join(models.User).join(models.Specialty)
-    
-    if specialty:
-        query = query.filter(models.Specialty.name == specialty)
-    
-    if search:
-        query = query.filter(
-            models.User.name.ilike(f"%{search}%") |
-            models.Specialty.name.ilike(f"%{search}%")
-        )
+    if days < 1 or days > MAX_SLOT_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {MAX_SLOT_DAYS}")
     
-    total = query.count()
-    doctors = query.offset(offset).limit(limit).all()
-    
-    # Serialize doctors manually
-    doctors_list = []
-    for doctor in doctors:
-        doctor_dict = {
-            "id": doctor.id,
-            "user_id": doctor.user_id,
-            "specialty_id": doctor.specialty_id,
-            "experience": doctor.experience,
-            "fee": doctor.fee,
-            "rating": doctor.rating,
-            "languages": doctor.languages,
-            "availability_days": doctor.availability_days,
-            "user": {
-                "id": doctor.user.id,
-                "name": doctor.user.name,
-                "email": doctor.user.email,
-                "phone": doctor.user.phone,
-                "role": doctor.user.role
-            },
-            "specialty": {
-                "id": doctor.specialty.id,
-                "name": doctor.specialty.name,
-                "description": doctor.specialty.description
-            }
-        }
-        doctors_list.append(doctor_dict)
+    sweep_expired_holds(db)
+    slots = slot_engine.free_slots(db, doctor_id, start or date_type.today(), days)
+    if slots is None:
+        raise HTTPException(status_code=404, detail="Doctor not found")
     
     return {
-        "doctors": doctors_list,
-        "total": total
+        "doctor_id": doctor_id,
+        "slot_minutes": SLOT_MINUTES,
+        "days": slots
     }
 
-@api_router.get("/doctors/{doctor_id}")
-def get_doctor(doctor_id: str, db: Session = Depends(get_db)):
+@api_router.put("/doctors/{doctor_id}/availability")
+def update_doctor_availability(
+    doctor_id: str,
+    availability: schemas.AvailabilityUpdate,
+    current_user: models.User = Depends(auth.require_role(["doctor", "admin"])),
+    db: Session = Depends(get_db)
+):
+    if current_user.role == "doctor" and current_user.id != doctor_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
     doctor = db.query(models.Doctor).filter(models.Doctor.user_id == doctor_id).first()
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
     
-    # Get specialty info
-    specialty = db.query(models.Specialty).filter(models.Specialty.id == doctor.specialty_id).first()
-    
-    # Manually serialize to avoid schema issues
-    doctor_data = {
-        "id": doctor.id,
-        "user_id": doctor.user_id,
-        "specialty_id": doctor.specialty_id,
-        "experience": doctor.experience,
-        "fee": doctor.fee,
-        "rating": doctor.rating,
-        "languages": doctor.languages,
-        "availability_days": doctor.availability_days,
-        "user": {
-            "id": doctor.user.id,
-            "name": doctor.user.name,
-            "email": doctor.user.email,
-            "phone": doctor.user.phone,
-            "role": doctor.user.role
-        },
-        "specialty": {
-            "id": specialty.id,
-            "name": specialty.name,
-            "description": specialty.description
-        } if specialty else None
-    }
+    for window in availability.windows:
+        if not 0 <= window.day_of_week <= 6:
+            raise HTTPException(status_code=400, detail="day_of_week must be between 0 and 6")
+    
+    # Replace the weekly template
+    db.query(models.DoctorAvailability).filter(
+        models.DoctorAvailability.doctor_id == doctor_id
+    ).delete()
+    for window in availability.windows:
+        db.add(models.DoctorAvailability(
+            id=str(uuid_module.uuid4()),
+            doctor_id=doctor_id,
+            day_of_week=window.day_of_week,
+            start_time=window.start_time,
+            end_time=window.end_time,
+            is_available=window.is_available
+        ))
+    db.commit()
+    slot_engine.invalidate_doctor(doctor_id)
     
-    return doctor_data
+    return {"message": "Availability updated successfully"}
 
 # ==================== Appointment Routes ====================
 
-@api_router.post("/appointments", response_model=schemas.AppointmentResponse)
-def create_appointment(
-    appointment_data: schemas.AppointmentCreate,
-    current_user: models.User = Depends(auth.require_role(["patient"])),
-    db: Session = Depends(get_db)
-):
+def _book_appointment(db: Session, appointment_data: schemas.AppointmentCreate, patient_id: str,
+                      hold_until: Optional[datetime] = None) -> models.Appointment:
     import uuid
+    # Lapsed holds would otherwise keep their slots looking taken
+    sweep_expired_holds(db)
+    
     # Get doctor to retrieve fee
     doctor = db.query(models.Doctor).filter(models.Doctor.user_id == appointment_data.doctor_id).first()
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
     
+    if slot_index(appointment_data.time) is None:
+        raise HTTPException(status_code=400, detail="Invalid appointment time")
+    if not slot_engine.in_hours(db, appointment_data.doctor_id, appointment_data.date, appointment_data.time):
+        raise HTTPException(status_code=409, detail="Doctor is not available at that time")
+    # Whether the slot is free is left to the reservation's primary key: this
+    # worker's occupancy misses other workers' bookings and cancellations
+    
     new_appointment = models.Appointment(
         id=str(uuid.uuid4()),
-        patient_id=current_user.id,
+        patient_id=patient_id,
         doctor_id=appointment_data.doctor_id,
         date=appointment_data.date,
         time=str(appointment_data.time),  # Convert time to string
         type=appointment_data.type,
         symptoms=appointment_data.symptoms,
         fee=doctor.fee,
-        status="confirmed"
+        # A held slot is pending until its payment is verified
+        status="pending" if hold_until else "confirmed"
     )
     
     db.add(new_appointment)
-    db.commit()
+    claim_slot(db, new_appointment, expires_at=hold_until)
+    if not hold_until:
+        # Held slots are confirmed, and announced, once paid for
+        enqueue(db, "booking_confirmation", {"appointment_id": new_appointment.id})
+    try:
+        db.commit()
+    except IntegrityError:
+        # The slot is reserved, possibly by a booking in another worker
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Time slot already booked")
     db.refresh(new_appointment)
-    
+    slot_engine.occupy(new_appointment.doctor_id, new_appointment.date, new_appointment.time)
     return new_appointment
 
-@api_router.get("/appointments", response_model=List[schemas.AppointmentResponse])
-def get_appointments(
-    status: Optional[str] = None,
-    current_user: models.User = Depends(auth.get_current_user),
+@api_router.post("/appointments", response_model=schemas.AppointmentResponse)
+def create_appointment(
+    appointment_data: schemas.AppointmentCreate,
+    current_user: models.User = Depends(auth.require_role(["patient"])),
     db: Session = Depends(get_db)
 ):
+    return _book_appointment(db, appointment_data, current_user.id)
+
+encode_appointment = compile_encoder(schemas.AppointmentResponse)
+APPOINTMENT_FIELDS = tuple(schemas.AppointmentResponse.model_fields)
+
+def _scope_appointments(query, current_user, status: Optional[str]):
+    # Patients and doctors only ever see their own appointments
     if current_user.role == "patient":
-        query = db.query(models.Appointment).filter(models.Appointment.patient_id == current_user.id)
+        query = query.where(models.Appointment.patient_id == current_user.id)
     elif current_user.role == "doctor":
-        query = db.query(models.Appointment).filter(models.Appointment.doctor_id == current_user.id)
-    else:
-        query = db.query(models.Appointment)
+        query = query.where(models.Appointment.doctor_id == current_user.id)
     
     if status:
-        query = query.filter(models.Appointment.status == status)
+        query = query.where(models.Appointment.status == status)
+    return query
+
+@api_router.post("/appointments/batch", response_model=schemas.AppointmentBatchResponse)
+def create_appointments_batch(
+    batch: schemas.AppointmentBatchCreate,
+    current_user: models.User = Depends(auth.require_role(["patient", "admin"])),
+    db: Session = Depends(get_db)
+):
+    if len(batch.appointments) > MAX_BATCH_APPOINTMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_APPOINTMENTS} appointments per batch")
+    
+    sweep_expired_holds(db)
+    for attempt in range(BATCH_CONFLICT_RETRIES + 1):
+        booking = BatchBooking(db, current_user)
+        try:
+            created = booking.run(batch.appointments)
+            # Rendered before the commit expires the new rows, which would reload each one
+            results = [
+                {**result, "appointment": encode_appointment(result["appointment"]) if result["appointment"] else None}
+                for result in booking.results
+            ]
+            body = dumps({"created": len(created), "failed": len(results) - len(created), "results": results})
+            for appointment in created:
+                enqueue(db, "booking_confirmation", {"appointment_id": appointment.id})
+            db.commit()
+            break
+        except IntegrityError:
+            # A concurrent booking reserved one of the slots after the lookup;
+            # the next pass sees it and reports that item as a 409
+            db.rollback()
+    else:
+        raise HTTPException(status_code=409, detail="Slots kept being taken concurrently; retry the batch")
+    booking.occupy_slots()
+    
+    return Response(body, media_type="application/json")
+
+@api_router.get("/appointments", response_model=List[schemas.AppointmentResponse])
+async def get_appointments(
+    response: Response,
+    status: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    query = _scope_appointments(select(models.Appointment), current_user, status)
     
-    appointments = query.order_by(models.Appointment.date.desc()).all()
+    # Newest first, keyed on (date, id). Paged only when the client asks with
+    # limit or cursor, so existing clients still get the full list; the next
+    # page's cursor goes in a header so the body stays a plain list
+    sort_key = (models.Appointment.date, models.Appointment.id)
+    paged = limit is not None or cursor is not None
+    if cursor:
+        query = query.where(after_key(sort_key, decode_cursor(cursor, date_type.fromisoformat, str), descending=True))
+    query = query.order_by(*keyset_order(sort_key, descending=True))
+    if paged:
+        limit = page_size(limit)
+        query = query.limit(limit + 1)
+    appointments = (await db.scalars(query)).all()
+    headers = {}
+    if paged and len(appointments) > limit:
+        appointments = appointments[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(appointments[-1].date, appointments[-1].id)
+    if FAST_JSON_RESPONSES:
+        # Same bytes as the response_model path, without validating each row
+        return list_response(appointments, encode_appointment, headers)
+    response.headers.update(headers)
     return appointments
 
+@api_router.get("/appointments/export")
+async def export_appointments(
+    format: str = "ndjson",
+    status: Optional[str] = None,
+    current_user: models.User = Depends(auth.get_current_user_async),
+    session_factory=Depends(get_async_read_session_factory)
+):
+    if current_user.role not in ("doctor", "admin"):
+        raise HTTPException(status_code=403, detail="Not authorized to access this resource")
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_MEDIA_TYPES)}")
+    
+    # Plain columns rather than ORM objects; rows are rendered as they stream
+    columns = [getattr(models.Appointment, name) for name in APPOINTMENT_FIELDS]
+    query = _scope_appointments(select(*columns), current_user, status)
+    query = query.order_by(models.Appointment.date.desc(), models.Appointment.id.desc())
+    filename = f"appointments-{date_type.today().isoformat()}.{format}"
+    return StreamingResponse(
+        stream_export(session_factory, query, encode_appointment, APPOINTMENT_FIELDS, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @api_router.patch("/appointments/{appointment_id}/status")
 def update_appointment_status(
     appointment_id: str,
@@ -284,63 +538,82 @@ def update_appointment_status(
     if current_user.role == "doctor" and appointment.doctor_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    previous_status = appointment.status
     if update_data.status:
         appointment.status = update_data.status
     if update_data.payment_status:
         appointment.payment_status = update_data.payment_status
     
-    db.commit()
+    # The slot reservation follows the booking in and out of cancellation
+    if previous_status != "cancelled" and appointment.status == "cancelled":
+        release_slot(db, appointment)
+    elif previous_status == "cancelled" and appointment.status != "cancelled":
+        claim_slot(db, appointment)
+    elif previous_status == "pending" and appointment.status != "pending":
+        # Confirmed by hand: a held slot stays taken
+        confirm_hold(db, appointment)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Time slot already booked")
     db.refresh(appointment)
     
+    # Keep slot occupancy in step with cancellations
+    if previous_status != "cancelled" and appointment.status == "cancelled":
+        slot_engine.release(appointment.doctor_id, appointment.date, appointment.time)
+    elif previous_status == "cancelled" and appointment.status != "cancelled":
+        slot_engine.occupy(appointment.doctor_id, appointment.date, appointment.time)
+    
     return {"message": "Appointment updated successfully", "appointment": appointment}
 
 # ==================== Admin Routes ====================
 
 @api_router.get("/admin/stats", response_model=schemas.AdminStats)
 def get_admin_stats(
+    current_user: models.User = Depends(auth.require_role(["admin"])),
+    db: Session = Depends(get_read_db),
+    primary: Session = Depends(get_db)
+):
+    # Counters are maintained on every write, so this is a single small read
+    return stats.read(db, primary)
+
+@api_router.post("/admin/stats/reconcile", response_model=schemas.AdminStats)
+def reconcile_admin_stats(
     current_user: models.User = Depends(auth.require_role(["admin"])),
     db: Session = Depends(get_db)
 ):
-    total_patients = db.query(models.Patient).count()
-    total_doctors = db.query(models.Doctor).count()
-    total_appointments = db.query(models.Appointment).count()
-    
-    # Calculate revenue from paid appointments
-    from sqlalchemy import func
-    revenue = db.query(func.sum(models.Appointment.fee)).filter(
-        models.Appointment.payment_status == "paid"
-    ).scalar() or 0
-    
-    return {
-        "total_patients": total_patients,
-        "total_doctors": total_doctors,
-        "total_appointments": total_appointments,
-        "revenue": revenue
-    }
+    return stats.reconcile(db)
 
 # ==================== Medical Records Routes ====================
 
 @api_router.get("/medical-records")
 def get_medical_records(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
+    limit = page_size(limit)
     if current_user.role == "patient":
-        records = db.query(models.MedicalRecord).filter(models.MedicalRecord.patient_id == current_user.id).all()
+        query = db.query(models.MedicalRecord).filter(models.MedicalRecord.patient_id == current_user.id)
     elif current_user.role == "doctor":
-        records = db.query(models.MedicalRecord).filter(models.MedicalRecord.doctor_id == current_user.id).all()
+        query = db.query(models.MedicalRecord).filter(models.MedicalRecord.doctor_id == current_user.id)
     else:
-        records = db.query(models.MedicalRecord).all()
+        query = db.query(models.MedicalRecord)
     
-    return {"records": records}
-
-from fastapi import UploadFile, File
-import shutil
-from pathlib import Path
-
-# Create uploads directory
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+    # Rows from before created_at had a default may have none; they come last
+    sort_key = (models.MedicalRecord.created_at, models.MedicalRecord.id)
+    if cursor:
+        values = decode_cursor(cursor, optional(datetime.fromisoformat), str)
+        query = query.filter(after_key(sort_key, values, descending=True))
+    records = query.order_by(*keyset_order(sort_key, descending=True)).limit(limit + 1).all()
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(records[-1].created_at, records[-1].id)
+    
+    return {"records": records, "next_cursor": next_cursor}
 
 @api_router.post("/medical-records")
 async def upload_medical_record(
@@ -351,27 +624,58 @@ async def upload_medical_record(
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
-    import uuid
-    # Save file
-    file_path = UPLOAD_DIR / f"{uuid.uuid4()}_{file.filename}"
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Chunked, off-loop write with type/size checks and checksum in one pass
+    saved = await save_upload(file)
     
-    # Create record
-    record = models.MedicalRecord(
-        id=str(uuid.uuid4()),
-        patient_id=current_user.id,
-        type=type,
-        title=title or file.filename,
-        file_url=str(file_path),
-        notes=notes
-    )
-    db.add(record)
-    db.commit()
-    db.refresh(record)
+    def create_record():
+        record = models.MedicalRecord(
+            id=str(uuid_module.uuid4()),
+            patient_id=current_user.id,
+            type=type,
+            title=title or file.filename,
+            file_url=str(saved["path"]),
+            file_size=saved["size"],
+            checksum=saved["checksum"],
+            notes=notes
+        )
+        db.add(record)
+        db.commit()
+        db.refresh(record)
+        return record
+    
+    try:
+        record = await run_in_threadpool(create_record)
+    except Exception:
+        saved["path"].unlink(missing_ok=True)
+        raise
     
     return {"message": "File uploaded successfully", "record": record}
 
+@api_router.get("/medical-records/{record_id}/file")
+def download_medical_record(
+    record_id: str,
+    request: Request,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    record = db.query(models.MedicalRecord).filter(models.MedicalRecord.id == record_id).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="Record not found")
+    
+    # Authorization check
+    if current_user.role == "patient" and record.patient_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if current_user.role == "doctor" and record.doctor_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    file_path = Path(record.file_url or "")
+    if not record.file_url or not file_path.is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    # Stored as "<uuid>_<original name>"
+    filename = file_path.name.split("_", 1)[-1]
+    return file_response(request, file_path, file_etag(file_path, record.checksum), filename)
+
 # ==================== Payment Routes ====================
 
 @api_router.post("/payments/create-order")
@@ -386,11 +690,30 @@ def create_payment_order(
     import random
     order_id = f"order_{uuid.uuid4()}"
     
+    if not payment_data.get("doctor_id"):
+        return {
+            "order_id": order_id,
+            "amount": payment_data.get("amount"),
+            "currency": "INR",
+            "key": "test_key",  # Would be actual Razorpay key
+            "message": "Payment order created successfully"
+        }
+    
+    # An order for a booking holds its slot until the payment is verified
+    try:
+        appointment_data = schemas.AppointmentCreate.model_validate(payment_data)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    hold_until = hold_expiry()
+    appointment = _book_appointment(db, appointment_data, current_user.id, hold_until=hold_until)
+    
     return {
         "order_id": order_id,
-        "amount": payment_data.get("amount"),
+        "appointment_id": appointment.id,
+        "amount": appointment.fee,
         "currency": "INR",
         "key": "test_key",  # Would be actual Razorpay key
+        "hold_expires_at": hold_until,
         "message": "Payment order created successfully"
     }
 
@@ -407,7 +730,15 @@ def verify_payment(
     if appointment_id:
         appointment = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
         if appointment:
+            was_held = appointment.status == "pending"
+            if not confirm_hold(db, appointment):
+                db.rollback()
+                raise HTTPException(status_code=409, detail="Slot hold expired; book the appointment again")
             appointment.payment_status = "paid"
+            # Sent after the response, by the job workers
+            enqueue(db, "payment_receipt", {"appointment_id": appointment.id})
+            if was_held and appointment.status == "confirmed":
+                enqueue(db, "booking_confirmation", {"appointment_id": appointment.id})
             db.commit()
     
     return {
@@ -433,11 +764,20 @@ def get_video_token(
         raise HTTPException(status_code=403, detail="Not authorized")
     
 
+# In-memory state derived from the database; stale once seeding wipes the tables
+def reset_caches():
+    slot_engine.reset()
+    doctor_search_index.reset()
+    auth.principal_cache.clear()
+    doctor_cache.clear()
+    reference_store.reset()
+
 # Seed database endpoint
 @api_router.post("/seed")
 def seed_database_endpoint():
     try:
         seed_database()
+        reset_caches()
         return {"message": "Database seeded successfully"}
     except Exception as e:
         logger.error(f"Seeding error: {str(e)}")
@@ -447,10 +787,87 @@ def seed_database_endpoint():
 def seed_database_endpoint_get():
     try:
         seed_database()
+        reset_caches()
         return {"message": "Database seeded successfully"}
     except Exception as e:
         logger.error(f"Seeding error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Seeding failed: {str(e)}")
 
-# Include router
-app.include_router(api_router)
\ No newline at end of file
+def init_storage():
+    """Create missing tables, apply pending schema migrations and make the upload directory."""
+    migrations.upgrade(engine)
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+async def _session_factory(app: FastAPI):
+    # Through the session factory dependency, so an app whose database is
+    # overridden (benchmarks) warms up and runs jobs against that database
+    return await app.dependency_overrides.get(get_session_factory, get_session_factory)()
+
+async def _warm_reference_data(app: FastAPI):
+    session_factory = await _session_factory(app)
+
+    def load():
+        with session_factory() as db:
+            reference_store.current(db)
+
+    await run_in_threadpool(load)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    # With several workers, set RUN_MIGRATIONS_ON_STARTUP=false and run
+    # "python migrations.py upgrade" once per deploy instead
+    if RUN_MIGRATIONS_ON_STARTUP:
+        await run_in_threadpool(init_storage)
+    else:
+        await run_in_threadpool(UPLOAD_DIR.mkdir, parents=True, exist_ok=True)
+    await _warm_reference_data(app)
+    session_factory = await _session_factory(app)
+    job_queue.start(session_factory)
+    reminder_scheduler.start(session_factory)
+    yield
+    await run_in_threadpool(reminder_scheduler.stop)
+    await run_in_threadpool(job_queue.stop)
+    hashing.hashing_pool.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+    if async_read_engine not in (None, async_engine):
+        await async_read_engine.dispose()
+
+def _admin_request(headers: dict) -> bool:
+    # Runs before routing, so from the principal cache or the signed claim;
+    # never a query of its own
+    scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    return scheme.lower() == "bearer" and auth.token_role(token.strip()) == models.UserRole.admin.value
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="MediCare API", version="1.0.0", lifespan=lifespan)
+
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Query-Count", "X-Query-Time-Ms", "X-Query-N-Plus-One"],
+    )
+
+    # Cut off oversized uploads before Starlette spools them to disk
+    app.add_middleware(UploadSizeLimitMiddleware, path="/api/medical-records")
+
+    # SQL profiling per request: always when QUERY_PROFILING is set, otherwise
+    # only for admins sending "X-Profile-Queries: 1"
+    app.add_middleware(profiling.QueryProfilerMiddleware, authorize=_admin_request)
+
+    # Outermost, so timings cover every other middleware too
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    app.include_router(api_router)
+    return app
+
+# For "uvicorn server:app"; "uvicorn --factory server:create_app" also works
+app = create_app()
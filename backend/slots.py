@@ -0,0 +1,242 @@
+from datetime import date, datetime, time, timedelta
+from time import monotonic
+from typing import Dict, List, Optional
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+import os
+import threading
+import models
+
+# Slot grid: every day is split into 96 slots of 15 minutes, stored as one int bitmap
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+FULL_DAY_MASK = (1 << SLOTS_PER_DAY) - 1
+
+# Used for doctors without DoctorAvailability rows (falls back to availability_days)
+DEFAULT_START_TIME = time(9, 0)
+DEFAULT_END_TIME = time(17, 0)
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+MAX_SLOT_DAYS = 60
+# A doctor's template and bookings are reloaded once older than this, so
+# other workers' bookings, cancellations and swept holds show up
+SLOT_REFRESH_SECONDS = float(os.environ.get("SLOT_REFRESH_SECONDS", "30"))
+
+def parse_time(value) -> Optional[time]:
+    """Read a time or a "HH:MM" / "HH:MM AM" string; None when it is neither."""
+    if isinstance(value, time):
+        return value
+    text = str(value).strip().upper()
+    for fmt in ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M%p", "%I %p"):
+        try:
+            return datetime.strptime(text, fmt).time()
+        except ValueError:
+            continue
+    return None
+
+def slot_index(value) -> Optional[int]:
+    """Map a time or a "HH:MM" / "HH:MM AM" string to its slot index."""
+    parsed = parse_time(value)
+    if parsed is None:
+        return None
+    return (parsed.hour * 60 + parsed.minute) // SLOT_MINUTES
+
+def slot_label(index: int) -> str:
+    minutes = index * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def range_mask(start: time, end: time) -> int:
+    first = slot_index(start)
+    # An end time of 00:00 means "until midnight"
+    last = SLOTS_PER_DAY if end == time(0, 0) else -(-(end.hour * 60 + end.minute) // SLOT_MINUTES)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+def load_templates(db: Session, doctor_ids) -> Dict[str, List[int]]:
+    """Weekly availability bitmaps (Monday first) of the given doctors, in two
+    queries however many there are; unknown doctors are left out."""
+    doctors = db.execute(select(models.Doctor.user_id, models.Doctor.availability_days).where(
+        models.Doctor.user_id.in_(doctor_ids)
+    )).all()
+    rows: Dict[str, list] = {}
+    for row in db.query(models.DoctorAvailability).filter(models.DoctorAvailability.doctor_id.in_(doctor_ids)):
+        rows.setdefault(row.doctor_id, []).append(row)
+
+    templates = {}
+    default_mask = range_mask(DEFAULT_START_TIME, DEFAULT_END_TIME)
+    for doctor_id, availability_days in doctors:
+        template = [0] * 7
+        if doctor_id in rows:
+            for row in rows[doctor_id]:
+                if row.is_available:
+                    template[row.day_of_week] |= range_mask(row.start_time, row.end_time)
+        else:
+            for day_name in availability_days or []:
+                if day_name in DAY_NAMES:
+                    template[DAY_NAMES.index(day_name)] = default_mask
+        templates[doctor_id] = template
+    return templates
+
+def covers(template: List[int], booking_date: date, index: int) -> bool:
+    return bool((template[booking_date.weekday()] >> index) & 1)
+
+class SlotEngine:
+    """Per-doctor, per-day slot occupancy kept as bitmaps.
+
+    A doctor's weekly template and upcoming reservations are loaded on first
+    use and reloaded every `refresh_seconds`; in between, this worker's own
+    bookings and cancellations update them through occupy()/release().
+    Other workers' changes only show up on the next reload, so occupancy is
+    a hint for listing free slots. Whether a booking gets its slot is decided
+    by the slot_reservations primary key (see reservations.py).
+    """
+
+    def __init__(self, refresh_seconds: float = SLOT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._templates: Dict[str, List[int]] = {}
+        self._occupancy: Dict[str, Dict[date, int]] = {}
+        # Active bookings per slot, so releasing one of two overlapping
+        # bookings does not free the slot
+        self._counts: Dict[str, Dict[tuple, int]] = {}
+        self._loaded_at: Dict[str, float] = {}
+
+    def reset(self):
+        with self._lock:
+            self._templates.clear()
+            self._occupancy.clear()
+            self._counts.clear()
+            self._loaded_at.clear()
+
+    def invalidate_doctor(self, doctor_id: str):
+        with self._lock:
+            self._templates.pop(doctor_id, None)
+
+    def _load_template(self, db: Session, doctor_id: str) -> Optional[List[int]]:
+        return load_templates(db, [doctor_id]).get(doctor_id)
+
+    def _load_bookings(self, db: Session, doctor_id: str):
+        # Reservations rather than appointments: lapsed holds not swept yet
+        # are already free. Only today onward, so past days drop out of
+        # memory at every reload
+        table = models.SlotReservation.__table__
+        reserved = db.execute(
+            select(table.c.date, table.c.slot).where(
+                table.c.doctor_id == doctor_id,
+                table.c.date >= date.today(),
+                or_(table.c.expires_at.is_(None), table.c.expires_at > datetime.utcnow())
+            )
+        ).all()
+
+        occupancy: Dict[date, int] = {}
+        counts: Dict[tuple, int] = {}
+        for booking_date, index in reserved:
+            occupancy[booking_date] = occupancy.get(booking_date, 0) | (1 << index)
+            counts[(booking_date, index)] = 1
+        self._occupancy[doctor_id] = occupancy
+        self._counts[doctor_id] = counts
+
+    def _ensure_loaded(self, db: Session, doctor_id: str) -> Optional[List[int]]:
+        # Loading happens under the lock so a booking committed while we read
+        # is either seen by the query or applied by occupy() right after
+        with self._lock:
+            loaded_at = self._loaded_at.get(doctor_id)
+            if loaded_at is not None and monotonic() - loaded_at >= self.refresh_seconds:
+                self._templates.pop(doctor_id, None)
+                self._occupancy.pop(doctor_id, None)
+            template = self._templates.get(doctor_id)
+            if template is None:
+                template = self._load_template(db, doctor_id)
+                if template is None:
+                    return None
+                self._templates[doctor_id] = template
+            if doctor_id not in self._occupancy:
+                self._load_bookings(db, doctor_id)
+                self._loaded_at[doctor_id] = monotonic()
+            return template
+
+    def occupy(self, doctor_id: str, booking_date: date, booking_time) -> None:
+        index = slot_index(booking_time)
+        if index is None:
+            return
+        with self._lock:
+            # Doctors not loaded yet pick the booking up from the database later
+            occupancy = self._occupancy.get(doctor_id)
+            if occupancy is None or booking_date < date.today():
+                return
+            key = (booking_date, index)
+            counts = self._counts[doctor_id]
+            counts[key] = counts.get(key, 0) + 1
+            occupancy[booking_date] = occupancy.get(booking_date, 0) | (1 << index)
+
+    def release(self, doctor_id: str, booking_date: date, booking_time) -> None:
+        index = slot_index(booking_time)
+        if index is None:
+            return
+        with self._lock:
+            occupancy = self._occupancy.get(doctor_id)
+            if occupancy is None:
+                return
+            key = (booking_date, index)
+            counts = self._counts[doctor_id]
+            remaining = counts.get(key, 0) - 1
+            if remaining > 0:
+                counts[key] = remaining
+                return
+            counts.pop(key, None)
+            mask = occupancy.get(booking_date, 0) & ~(1 << index)
+            if mask:
+                occupancy[booking_date] = mask
+            else:
+                occupancy.pop(booking_date, None)
+
+    def in_hours(self, db: Session, doctor_id: str, booking_date: date, booking_time) -> bool:
+        """Whether the doctor's weekly template covers the slot; False for an
+        unknown doctor or a time that does not parse."""
+        index = slot_index(booking_time)
+        if index is None:
+            return False
+        template = self._ensure_loaded(db, doctor_id)
+        if template is None:
+            return False
+        return covers(template, booking_date, index)
+
+    def is_free(self, db: Session, doctor_id: str, booking_date: date, booking_time) -> bool:
+        """Whether the slot is in the doctor's hours and not booked, as far as
+        this worker knows; a hint, not a guarantee."""
+        if not self.in_hours(db, doctor_id, booking_date, booking_time):
+            return False
+        index = slot_index(booking_time)
+        with self._lock:
+            return not (self._occupancy[doctor_id].get(booking_date, 0) >> index) & 1
+
+    def free_slots(self, db: Session, doctor_id: str, start: date, days: int) -> Optional[List[dict]]:
+        template = self._ensure_loaded(db, doctor_id)
+        if template is None:
+            return None
+
+        now = datetime.now()
+        days_out = []
+        with self._lock:
+            occupancy = self._occupancy[doctor_id]
+            for offset in range(days):
+                day = start + timedelta(days=offset)
+                free = template[day.weekday()] & ~occupancy.get(day, 0)
+                if day == now.date():
+                    # Drop slots that have already started today
+                    elapsed = (now.hour * 60 + now.minute) // SLOT_MINUTES + 1
+                    free &= FULL_DAY_MASK ^ ((1 << elapsed) - 1)
+                elif day < now.date():
+                    free = 0
+                days_out.append((day, free))
+
+        return [
+            {
+                "date": day,
+                "slots": [slot_label(i) for i in range(SLOTS_PER_DAY) if (free >> i) & 1]
+            }
+            for day, free in days_out
+        ]
+
+slot_engine = SlotEngine()
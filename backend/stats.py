@@ -0,0 +1,135 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+import models
+
+COUNTER_NAMES = ("total_patients", "total_doctors", "total_appointments", "revenue")
+
+def _paid_amount(payment_status, fee) -> Decimal:
+    if payment_status != "paid" or fee is None:
+        return Decimal(0)
+    return Decimal(str(fee))
+
+def _previous(instance, attribute):
+    history = inspect(instance).attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(instance, attribute)
+
+def _collect_deltas(session: Session) -> dict:
+    deltas = dict.fromkeys(COUNTER_NAMES, 0)
+    for instance in session.new:
+        if isinstance(instance, models.Patient):
+            deltas["total_patients"] += 1
+        elif isinstance(instance, models.Doctor):
+            deltas["total_doctors"] += 1
+        elif isinstance(instance, models.Appointment):
+            deltas["total_appointments"] += 1
+            deltas["revenue"] += _paid_amount(instance.payment_status, instance.fee)
+
+    for instance in session.deleted:
+        if isinstance(instance, models.Patient):
+            deltas["total_patients"] -= 1
+        elif isinstance(instance, models.Doctor):
+            deltas["total_doctors"] -= 1
+        elif isinstance(instance, models.Appointment):
+            deltas["total_appointments"] -= 1
+            deltas["revenue"] -= _paid_amount(_previous(instance, "payment_status"), _previous(instance, "fee"))
+
+    for instance in session.dirty:
+        if isinstance(instance, models.Appointment) and session.is_modified(instance):
+            before = _paid_amount(_previous(instance, "payment_status"), _previous(instance, "fee"))
+            after = _paid_amount(instance.payment_status, instance.fee)
+            deltas["revenue"] += after - before
+    return {name: delta for name, delta in deltas.items() if delta}
+
+def upsert_statement(dialect_name: str, rows: list, update: bool):
+    """INSERT `rows` into stat_counters; counters that exist already take the
+    new value when `update`, else are left alone.
+
+    There is no portable upsert: SQLite and PostgreSQL each have their own
+    ON CONFLICT construct and MySQL has ON DUPLICATE KEY UPDATE. Other
+    backends are refused here rather than sent SQL they would reject.
+    """
+    table = models.StatCounter.__table__
+    if dialect_name in ("sqlite", "postgresql"):
+        insert = (sqlite if dialect_name == "sqlite" else postgresql).insert(table).values(rows)
+        if not update:
+            return insert.on_conflict_do_nothing(index_elements=["name"])
+        return insert.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"value": insert.excluded.value, "updated_at": insert.excluded.updated_at}
+        )
+    if dialect_name in ("mysql", "mariadb"):
+        insert = mysql.insert(table).values(rows)
+        if not update:
+            # MySQL has no DO NOTHING; rewriting the key with itself is the idiom
+            return insert.on_duplicate_key_update(name=insert.inserted.name)
+        return insert.on_duplicate_key_update(value=insert.inserted.value, updated_at=insert.inserted.updated_at)
+    raise NotImplementedError(f"Stat counters have no upsert for the {dialect_name} backend")
+
+def _upsert(db, values: dict, update: bool):
+    bind = db.get_bind() if isinstance(db, Session) else db
+    now = datetime.utcnow()
+    rows = [{"name": name, "value": value, "updated_at": now} for name, value in values.items()]
+    db.execute(upsert_statement(bind.dialect.name, rows, update))
+
+def _source_values(db) -> dict:
+    """Every counter counted from the source tables; `db` is a Session or Connection."""
+    appointments = models.Appointment.__table__
+    return {
+        "total_patients": db.execute(select(func.count()).select_from(models.Patient.__table__)).scalar(),
+        "total_doctors": db.execute(select(func.count()).select_from(models.Doctor.__table__)).scalar(),
+        "total_appointments": db.execute(select(func.count()).select_from(appointments)).scalar(),
+        "revenue": db.execute(
+            select(func.sum(appointments.c.fee)).where(appointments.c.payment_status == "paid")
+        ).scalar() or 0,
+    }
+
+def seed(db):
+    """Insert the counters that don't exist yet, counted from the source tables.
+
+    Rows that exist are left alone, so concurrent seeds don't collide.
+    """
+    _upsert(db, _source_values(db), update=False)
+
+@event.listens_for(Session, "before_flush")
+def _apply_counter_deltas(session, flush_context, instances):
+    # Runs inside the flush, so counters commit or roll back with the rows
+    deltas = _collect_deltas(session)
+    table = models.StatCounter.__table__
+    for name, delta in deltas.items():
+        statement = (
+            table.update()
+            .where(table.c.name == name)
+            .values(value=table.c.value + delta, updated_at=datetime.utcnow())
+        )
+        if not session.execute(statement).rowcount:
+            # Migration 5 seeds the rows; should one be missing anyway, count
+            # it from the source tables, which don't hold this flush's rows yet
+            seed(session)
+            session.execute(statement)
+
+def reconcile(db: Session) -> dict:
+    """Rebuild every counter from the source tables in one transaction."""
+    values = _source_values(db)
+    _upsert(db, values, update=True)
+    db.commit()
+    return values
+
+def read(db: Session, primary: Optional[Session] = None) -> dict:
+    """Read the counters from `db`, which may be a read-only replica session;
+    missing counters are rebuilt through `primary` (defaults to `db`)."""
+    rows = dict(db.query(models.StatCounter.name, models.StatCounter.value).all())
+    if any(name not in rows for name in COUNTER_NAMES):
+        # First run against an existing database
+        return reconcile(primary or db)
+    return {
+        "total_patients": int(rows["total_patients"]),
+        "total_doctors": int(rows["total_doctors"]),
+        "total_appointments": int(rows["total_appointments"]),
+        "revenue": rows["revenue"],
+    }
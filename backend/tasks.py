@@ -0,0 +1,51 @@
+"""Side work that request handlers hand to the job queue (see jobs.py).
+
+Delivery is mocked with log lines, like the payment gateway. A job may run
+more than once, and its appointment may have changed since it was queued,
+so each handler re-reads the appointment and is safe to repeat.
+"""
+from sqlalchemy.orm import Session
+import logging
+import models
+from jobs import job_handler
+
+logger = logging.getLogger(__name__)
+
+def _appointment_and_patient(db: Session, payload: dict):
+    appointment = db.get(models.Appointment, payload["appointment_id"])
+    if appointment is None:
+        return None, None
+    return appointment, db.get(models.User, appointment.patient_id)
+
+@job_handler("booking_confirmation")
+def send_booking_confirmation(db: Session, payload: dict):
+    appointment, patient = _appointment_and_patient(db, payload)
+    if appointment is None or appointment.status == "cancelled":
+        return
+    # In production, send through the email/SMS provider
+    logger.info("Booking confirmation to %s: appointment %s on %s at %s",
+                patient.email if patient else appointment.patient_id,
+                appointment.id, appointment.date, appointment.time)
+
+@job_handler("payment_receipt")
+def send_payment_receipt(db: Session, payload: dict):
+    appointment, patient = _appointment_and_patient(db, payload)
+    if appointment is None or appointment.payment_status != "paid":
+        return
+    logger.info("Payment receipt to %s: %s INR for appointment %s",
+                patient.email if patient else appointment.patient_id, appointment.fee, appointment.id)
+
+@job_handler("appointment_reminder")
+def send_appointment_reminder(db: Session, payload: dict):
+    appointment, patient = _appointment_and_patient(db, payload)
+    if appointment is None or appointment.status == "cancelled":
+        return
+    # Moved since it was queued: the new time has reminders of its own
+    if appointment.starts_at is None or appointment.starts_at.isoformat() != payload["starts_at"]:
+        return
+    doctor = db.get(models.User, appointment.doctor_id)
+    for recipient in (patient, doctor):
+        if recipient is not None:
+            logger.info("Reminder to %s: appointment %s in %d minutes, on %s at %s",
+                        recipient.email, appointment.id, payload["minutes_before"],
+                        appointment.date, appointment.time)
@@ -0,0 +1,107 @@
+from pathlib import Path
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+import hashlib
+import os
+import uuid
+
+UPLOAD_DIR = Path(os.environ.get("UPLOAD_DIR", "uploads"))
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(250 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Accepted content types and the leading bytes each one must start with
+ALLOWED_UPLOAD_TYPES = {
+    "application/pdf": [(0, b"%PDF-")],
+    "image/png": [(0, b"\x89PNG\r\n\x1a\n")],
+    "image/jpeg": [(0, b"\xff\xd8\xff")],
+    "image/webp": [(8, b"WEBP")],
+    "application/dicom": [(128, b"DICM")],
+}
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File exceeds the upload limit of {MAX_UPLOAD_BYTES} bytes"
+    )
+
+def check_upload_type(content_type: str, head: bytes) -> None:
+    signatures = ALLOWED_UPLOAD_TYPES.get((content_type or "").split(";")[0].strip().lower())
+    if signatures is None:
+        raise HTTPException(status_code=415, detail=f"Unsupported file type: {content_type}")
+    if not any(head[offset:offset + len(magic)] == magic for offset, magic in signatures):
+        raise HTTPException(status_code=415, detail="File contents do not match its declared type")
+
+def _write_chunk(buffer, hasher, chunk: bytes) -> None:
+    # hashlib releases the GIL on large buffers, so this runs well off-loop
+    hasher.update(chunk)
+    buffer.write(chunk)
+
+async def save_upload(file: UploadFile) -> dict:
+    """Stream an upload to UPLOAD_DIR in chunks, checking type and size and
+    computing its SHA-256 in the same pass. Nothing blocking runs on the loop."""
+    head = await file.read(UPLOAD_CHUNK_BYTES)
+    check_upload_type(file.content_type, head)
+
+    await run_in_threadpool(UPLOAD_DIR.mkdir, parents=True, exist_ok=True)
+    # Only keep the base name; the client controls file.filename
+    file_path = UPLOAD_DIR / f"{uuid.uuid4()}_{Path(file.filename or 'upload').name}"
+    hasher = hashlib.sha256()
+    size = 0
+
+    buffer = await run_in_threadpool(file_path.open, "wb")
+    try:
+        chunk = head
+        while chunk:
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise _too_large()
+            await run_in_threadpool(_write_chunk, buffer, hasher, chunk)
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(file_path.unlink, missing_ok=True)
+        raise
+    await run_in_threadpool(buffer.close)
+
+    return {"path": file_path, "size": size, "checksum": hasher.hexdigest()}
+
+class UploadSizeLimitMiddleware:
+    """Reject oversized upload bodies while they are still arriving.
+
+    Starlette spools the whole multipart body before the route runs, so the
+    limit has to be enforced here: on Content-Length up front, and on the
+    running byte count for chunked bodies.
+    """
+
+    def __init__(self, app, path: str, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.path = path
+        # Allow for multipart boundaries and form fields around the file
+        self.max_bytes = max_bytes + 64 * 1024
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse(status_code=413, content={"detail": _too_large().detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI re-raises HTTPExceptions from body parsing as-is
+                    raise _too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -64,6 +64,11 @@ export const doctorAPI = {
     const response = await apiClient.get(`/doctors/${doctorId}`);
     return response.data;
   },
+
+  getSlots: async (doctorId, params = {}) => {
+    const response = await apiClient.get(`/doctors/${doctorId}/slots`, { params });
+    return response.data;
+  },
 };
 
 // Appointment APIs
@@ -119,6 +124,13 @@ export const medicalRecordAPI = {
     });
     return response.data;
   },
+
+  download: async (recordId) => {
+    const response = await apiClient.get(`/medical-records/${recordId}/file`, {
+      responseType: 'blob',
+    });
+    return response.data;
+  },
 };
 
 // Payment APIs (to be implemented)
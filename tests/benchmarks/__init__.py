@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+SCRATCH_DIR = os.path.join(tempfile.gettempdir(), "medicare_bench")
+os.makedirs(SCRATCH_DIR, exist_ok=True)
+
+# The backend modules read these at import time: keep the app off the
+# checked-in medicare.db and make bcrypt cheap enough to measure the handlers
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(SCRATCH_DIR, 'app.db')}")
+os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(SCRATCH_DIR, "uploads"))
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
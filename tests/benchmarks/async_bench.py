@@ -0,0 +1,126 @@
+"""Concurrency scaling of the async read routes against their sync versions.
+
+Sync routes run on Starlette's threadpool (anyio's default limiter, 40
+workers), so at most that many requests can wait on the database at once.
+The async routes wait on the event loop instead. To make the waiting
+visible with an in-process SQLite file, every statement is delayed by
+--db-latency-ms, standing in for the network round trip to a database
+server. The delay runs on the thread executing the statement: a threadpool
+worker for the sync route, the aiosqlite connection thread for the async one.
+The latency has to be large enough that 40 waiting workers, not the CPU cost
+of a request, is what limits the sync route; below that both stacks saturate
+the same core and finish level.
+
+Run from the repository root:  python -m tests.benchmarks.async_bench --concurrency 10 40 80 160
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+from tests.benchmarks.common import use_scratch_database
+
+def add_latency(engine, seconds: float):
+    from sqlalchemy import event
+
+    def on_connect(dbapi_connection, connection_record):
+        raw = getattr(dbapi_connection, "driver_connection", dbapi_connection)
+        delay = lambda statement: time.sleep(seconds)
+        if hasattr(raw, "set_trace_callback") and not asyncio.iscoroutinefunction(raw.set_trace_callback):
+            raw.set_trace_callback(delay)
+        else:
+            # aiosqlite: install the callback on its worker thread's connection
+            dbapi_connection.await_(raw.set_trace_callback(delay))
+
+    event.listen(engine, "connect", on_connect)
+
+def add_sync_route(app):
+    from fastapi import Depends
+    import models
+    from database import get_read_db
+    from reference import reference_store
+    from serializers import doctor_select, serialize_doctor
+
+    # First page of GET /api/doctors as it was before the async port
+    @app.get("/bench/sync/doctors")
+    def list_doctors_sync(limit: int = 20, db=Depends(get_read_db)):
+        data = reference_store.current(db)
+        query = doctor_select().where(models.Doctor.specialty_id.isnot(None)).order_by(models.Doctor.id)
+        rows = db.execute(query.limit(limit + 1)).all()
+        return {"doctors": [serialize_doctor(row, data.specialties_by_id) for row in rows[:limit]],
+                "total": None, "next_cursor": None}
+
+async def load(client, path: str, concurrency: int, duration: float) -> dict:
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get(path)
+            assert response.status_code == 200, response.text
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+async def run(args):
+    import httpx
+    import anyio.to_thread
+    import database
+    from server import app, init_storage
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    init_storage()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/api/seed")
+
+        # Only now slow the database down; seeding ran at full speed
+        latency = args.db_latency_ms / 1000
+        for engine in (database.engine, database.async_engine.sync_engine):
+            add_latency(engine, latency)
+        database.engine.dispose()
+        await database.async_engine.dispose()
+        add_sync_route(app)
+
+        threads = anyio.to_thread.current_default_thread_limiter().total_tokens
+        print(f"threadpool {threads} workers, DB pool {database.DB_POOL_SIZE}+{database.DB_MAX_OVERFLOW}, "
+              f"{args.db_latency_ms:.0f} ms per statement, {args.duration:.0f}s per cell\n")
+        print(f"{'clients':>8}{'sync req/s':>12}{'p50':>9}{'async req/s':>13}{'p50':>9}{'speedup':>9}")
+        for concurrency in args.concurrency:
+            sync = await load(client, "/bench/sync/doctors", concurrency, args.duration)
+            asynchronous = await load(client, "/api/doctors?include_total=false", concurrency, args.duration)
+            print(f"{concurrency:>8}{sync['rps']:>12.0f}{sync['p50']:>7.0f}ms{asynchronous['rps']:>13.0f}"
+                  f"{asynchronous['p50']:>7.0f}ms{asynchronous['rps'] / sync['rps']:>8.1f}x")
+    # aiosqlite connection threads are non-daemon; interpreter exit waits on them
+    await database.async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 40, 80, 160])
+    parser.add_argument("--db-latency-ms", type=float, default=200)
+    parser.add_argument("--duration", type=float, default=5)
+    args = parser.parse_args()
+
+    use_scratch_database("async")
+    os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
+    # Every request has to reach the database, not the response cache
+    os.environ["DOCTOR_CACHE_MAX_BYTES"] = "0"
+    # Both stacks get the same generous pool, so the threadpool is the only cap
+    pool = max(args.concurrency)
+    os.environ["DB_POOL_SIZE"] = str(pool)
+    os.environ["DB_MAX_OVERFLOW"] = "0"
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Booking throughput: one POST /api/appointments per booking versus
+POST /api/appointments/batch.
+
+Every booking takes a distinct slot (doctors x far-future days x the working
+day), so nothing conflicts and both paths do the full insert. The single
+path runs as the patient; batches run as the admin naming that patient.
+
+Run from the repository root:  python -m tests.benchmarks.batch_bench --bookings 5000 --batch-sizes 100 1000 5000
+"""
+from datetime import date, timedelta
+import argparse
+import asyncio
+import os
+import time
+
+from tests.benchmarks.common import use_scratch_database
+
+def slot_plan(working_days: dict, first_day: date):
+    # Endless distinct (doctor, date, time) triples inside each doctor's
+    # hours, one day at a time
+    from slots import DAY_NAMES
+
+    day = first_day
+    while True:
+        doctor_ids = [doctor_id for doctor_id, days in working_days.items() if DAY_NAMES[day.weekday()] in days]
+        for minute in range(9 * 60, 17 * 60, 15):
+            for doctor_id in doctor_ids:
+                yield {"doctor_id": doctor_id, "date": day.isoformat(),
+                       "time": f"{minute // 60:02d}:{minute % 60:02d}", "type": "video",
+                       "symptoms": "Follow-up"}
+        day += timedelta(days=1)
+
+async def run(args):
+    import httpx
+    import logging
+    import database
+    from server import app, init_storage
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    init_storage()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=None) as client:
+        await client.post("/api/seed")
+        tokens = {}
+        for role, email, password in (("patient", "john@example.com", "password123"),
+                                      ("admin", "admin@example.com", "admin123")):
+            tokens[role] = {"Authorization": "Bearer " + (await client.post("/api/auth/login", json={
+                "email": email, "password": password, "role": role
+            })).json()["access_token"]}
+        patient_id = (await client.get("/api/auth/me", headers=tokens["patient"])).json()["id"]
+        working_days = {doctor["user_id"]: doctor["availability_days"] or []
+                        for doctor in (await client.get("/api/doctors")).json()["doctors"]}
+        plan = slot_plan(working_days, date.today() + timedelta(days=365))
+
+        print(f"{args.bookings} bookings per path\n")
+        print(f"{'path':<18}{'seconds':>9}{'bookings/s':>12}{'speedup':>9}")
+        started = time.perf_counter()
+        for _ in range(args.bookings):
+            response = await client.post("/api/appointments", headers=tokens["patient"], json=next(plan))
+            assert response.status_code == 200, response.text
+        single = time.perf_counter() - started
+        print(f"{'single':<18}{single:>9.2f}{args.bookings / single:>12.0f}{1:>8.1f}x")
+
+        for size in args.batch_sizes:
+            started = time.perf_counter()
+            for offset in range(0, args.bookings, size):
+                items = [{**next(plan), "patient_id": patient_id}
+                         for _ in range(min(size, args.bookings - offset))]
+                response = await client.post("/api/appointments/batch", headers=tokens["admin"],
+                                             json={"appointments": items})
+                assert response.status_code == 200 and response.json()["failed"] == 0, response.text
+            elapsed = time.perf_counter() - started
+            print(f"{f'batch of {size}':<18}{elapsed:>9.2f}{args.bookings / elapsed:>12.0f}"
+                  f"{single / elapsed:>8.1f}x")
+    await database.async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=5000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    use_scratch_database("batch")
+    os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import os
+import statistics
+import tempfile
+import time
+
+def use_scratch_database(name: str) -> str:
+    # Must run before database.py is imported, which reads DATABASE_URL once
+    path = os.path.join(tempfile.gettempdir(), f"medicare_bench_{name}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+def time_calls(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
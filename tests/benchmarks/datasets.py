@@ -0,0 +1,68 @@
+from datetime import date
+import os
+
+from sqlalchemy import create_engine
+
+from tests.benchmarks import SCRATCH_DIR
+
+# Fixed seed and anchor so every run benchmarks the same rows
+SEED = 20240601
+ANCHOR = date(2026, 1, 15)
+PASSWORD = "password123"
+ADMIN_EMAIL = "admin@synthetic.medicare"
+
+SIZES = {
+    "small": {"patients": 200, "doctors": 20, "appointments": 2000, "records": 500},
+    "medium": {"patients": 5000, "doctors": 500, "appointments": 100000, "records": 20000},
+    "large": {"patients": 50000, "doctors": 5000, "appointments": 1000000, "records": 200000},
+}
+
+def dataset_engine(size: str):
+    """Engine for a generated dataset, building it on first use."""
+    import database
+    import migrations
+
+    counts = SIZES[size]
+    path = os.path.join(SCRATCH_DIR, f"dataset_{size}_{SEED}.db")
+    url = f"sqlite:///{path}"
+    if not os.path.exists(path):
+        _build(url, path, counts)
+    # Same pool and pragma settings as the app's own engine
+    engine = database.make_engine(url)
+    # Datasets built under an older schema are brought up to date in place
+    migrations.upgrade(engine)
+    return engine
+
+def _build(url: str, path: str, counts: dict):
+    import datagen
+    import hashing
+    import migrations
+    import models
+    import stats
+    from sqlalchemy.orm import Session
+
+    partial = path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    engine = create_engine(f"sqlite:///{partial}")
+    migrations.upgrade(engine)
+    password_hash = hashing.crypt_context().hash(PASSWORD)
+
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA synchronous = OFF")
+        generator = datagen.Generator(connection, SEED, ANCHOR, 50000, 365, 60)
+        generator.specialties()
+        generator.patients(counts["patients"], password_hash)
+        generator.doctors(counts["doctors"], password_hash)
+        generator.appointments(counts["appointments"])
+        generator.medical_records(counts["records"])
+        connection.execute(models.User.__table__.insert(), [{
+            "id": "00000000-0000-4000-8000-000000000001", "email": ADMIN_EMAIL,
+            "password_hash": password_hash, "name": "Bench Admin", "role": "admin",
+        }])
+        connection.commit()
+
+    with Session(engine) as db:
+        stats.reconcile(db)
+    engine.dispose()
+    os.replace(partial, path)
@@ -0,0 +1,270 @@
+"""In-process benchmarks for the hot API routes.
+
+Runs the FastAPI app against generated datasets and reports, per route,
+throughput, p50/p95/p99 latency and SQL statements per request. Results are
+compared with a stored baseline; any route slower (or issuing more SQL) than
+the baseline by more than the threshold counts as a regression.
+
+Run from the repository root:
+    python -m tests.benchmarks.endpoints --sizes small medium
+    MEDICARE_BENCH=1 MEDICARE_BENCH_SIZES=small,medium python -m pytest tests/benchmarks
+
+The baseline is tests/benchmarks/baseline.json, committed with the code.
+Timings depend on the machine, so refresh it on the machine that runs the
+gate, and whenever a change makes a route deliberately slower or adds SQL;
+commit the new file with that change:
+    python -m tests.benchmarks.endpoints --sizes small medium --update-baseline
+MEDICARE_BENCH_THRESHOLD (default 0.25) sets the allowed slowdown.
+"""
+from datetime import timedelta
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from tests.benchmarks import datasets
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = float(os.environ.get("MEDICARE_BENCH_THRESHOLD", "0.25"))
+DEFAULT_ITERATIONS = int(os.environ.get("MEDICARE_BENCH_ITERATIONS", "100"))
+WARMUP_ITERATIONS = 5
+
+# Bookings made by the benchmark land well past the generated calendar
+BOOKING_OFFSET_DAYS = 400
+
+def _percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        self.watch(engine)
+
+    def watch(self, engine):
+        from sqlalchemy import event
+
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+def _measure(client, counter, request, iterations: int) -> dict:
+    for i in range(WARMUP_ITERATIONS):
+        request(client, -1 - i)
+
+    latencies, statements = [], []
+    started = time.perf_counter()
+    for i in range(iterations):
+        before = counter.count
+        request_started = time.perf_counter()
+        response = request(client, i)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        statements.append(counter.count - before)
+        assert response.status_code < 400, f"{response.status_code}: {response.text[:200]}"
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    statements.sort()
+    return {
+        "throughput_rps": round(iterations / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50), 3),
+        "p95_ms": round(_percentile(latencies, 0.95), 3),
+        "p99_ms": round(_percentile(latencies, 0.99), 3),
+        "statements": statements[len(statements) // 2],
+    }
+
+def _fixtures(engine):
+    from sqlalchemy import text
+
+    with engine.connect() as connection:
+        busy_patient = connection.execute(text(
+            "SELECT u.email FROM appointments a JOIN users u ON u.id = a.patient_id "
+            "GROUP BY u.email ORDER BY COUNT(*) DESC LIMIT 1"
+        )).scalar()
+        doctor_id = connection.execute(text(
+            "SELECT user_id FROM doctors ORDER BY id LIMIT 1"
+        )).scalar()
+        working_days = sorted(connection.execute(text(
+            "SELECT DISTINCT day_of_week FROM doctor_availability WHERE doctor_id = :doctor_id AND is_available"
+        ), {"doctor_id": doctor_id}).scalars())
+    return busy_patient, doctor_id, working_days
+
+def _booking_day(working_days, n: int):
+    # The n-th of the doctor's working days from the first Monday past the
+    # generated calendar; bookings on other days are refused
+    start = datasets.ANCHOR + timedelta(days=BOOKING_OFFSET_DAYS)
+    start += timedelta(days=-start.weekday() % 7)
+    week, day = divmod(n, len(working_days))
+    return start + timedelta(weeks=week, days=working_days[day])
+
+def _remove_bench_bookings(engine):
+    import stats
+    from sqlalchemy import text
+    from sqlalchemy.orm import Session
+
+    cutoff = datasets.ANCHOR + timedelta(days=BOOKING_OFFSET_DAYS - 1)
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM slot_reservations WHERE date > :cutoff"),
+                           {"cutoff": cutoff.isoformat()})
+        removed = connection.execute(text("DELETE FROM appointments WHERE date > :cutoff"),
+                                     {"cutoff": cutoff.isoformat()}).rowcount
+    if removed:
+        with Session(engine) as db:
+            stats.reconcile(db)
+
+def run_size(size: str, iterations: int = DEFAULT_ITERATIONS) -> dict:
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from sqlalchemy.orm import sessionmaker
+
+    import database
+    import server
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    engine = datasets.dataset_engine(size)
+    _remove_bench_bookings(engine)
+    busy_patient, doctor_id, working_days = _fixtures(engine)
+    counter = StatementCounter(engine)
+    async_engine = database.make_async_engine(str(engine.url))
+    BenchSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncBenchSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    counter.watch(async_engine.sync_engine)
+
+    def bench_db():
+        db = BenchSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def async_bench_db():
+        async with AsyncBenchSession() as db:
+            yield db
+
+    async def bench_session_factory():
+        return BenchSession
+
+    async def async_bench_session_factory():
+        return AsyncBenchSession
+
+    overrides = {
+        database.get_db: bench_db,
+        database.get_read_db: bench_db,
+        database.get_async_db: async_bench_db,
+        database.get_async_read_db: async_bench_db,
+        database.get_session_factory: bench_session_factory,
+        database.get_async_read_session_factory: async_bench_session_factory,
+    }
+    server.app.dependency_overrides.update(overrides)
+    server.reset_caches()
+    try:
+        with TestClient(server.app) as client:
+            def login(email, role):
+                response = client.post("/api/auth/login", json={
+                    "email": email, "password": datasets.PASSWORD, "role": role
+                })
+                assert response.status_code == 200, response.text
+                return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            patient = login(busy_patient, "patient")
+            admin = login(datasets.ADMIN_EMAIL, "admin")
+
+            def book(c, i):
+                # Warmup calls use negative i; every call gets its own slot
+                slot = i + WARMUP_ITERATIONS
+                day = _booking_day(working_days, slot // 32)
+                minutes = 9 * 60 + (slot % 32) * 15
+                return c.post("/api/appointments", headers=patient, json={
+                    "doctor_id": doctor_id, "date": day.isoformat(),
+                    "time": f"{minutes // 60:02d}:{minutes % 60:02d}", "type": "video",
+                    "symptoms": "benchmark"
+                })
+
+            routes = {
+                "POST /api/auth/login": lambda c, i: c.post("/api/auth/login", json={
+                    "email": busy_patient, "password": datasets.PASSWORD, "role": "patient"
+                }),
+                "GET /api/doctors": lambda c, i: c.get("/api/doctors"),
+                "GET /api/doctors?search": lambda c, i: c.get("/api/doctors", params={"search": "sharma"}),
+                "POST /api/appointments": book,
+                "GET /api/appointments (patient)": lambda c, i: c.get("/api/appointments?limit=100", headers=patient),
+                "GET /api/appointments (admin)": lambda c, i: c.get("/api/appointments?limit=100", headers=admin),
+                "GET /api/admin/stats": lambda c, i: c.get("/api/admin/stats", headers=admin),
+            }
+            return {name: _measure(client, counter, request, iterations) for name, request in routes.items()}
+    finally:
+        for dependency in overrides:
+            server.app.dependency_overrides.pop(dependency, None)
+        server.reset_caches()
+        _remove_bench_bookings(engine)
+        engine.dispose()
+        asyncio.run(async_engine.dispose())
+
+def load_baseline(path: str = BASELINE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as handle:
+        return json.load(handle)
+
+def save_baseline(baseline: dict, path: str = BASELINE_PATH):
+    with open(path, "w") as handle:
+        json.dump(baseline, handle, indent=2, sort_keys=True)
+        handle.write("\n")
+
+def compare(size: str, results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for route, current in results.items():
+        previous = baseline.get(size, {}).get(route)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"[{size}] {route}: p95 {current['p95_ms']:.2f}ms vs baseline {previous['p95_ms']:.2f}ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+            regressions.append(f"[{size}] {route}: {current['throughput_rps']:.0f} req/s vs baseline "
+                               f"{previous['throughput_rps']:.0f} req/s")
+        # Statement counts are deterministic, so any increase is a regression
+        if current["statements"] > previous["statements"]:
+            regressions.append(f"[{size}] {route}: {current['statements']} SQL statements vs baseline "
+                               f"{previous['statements']}")
+    return regressions
+
+def print_report(size: str, results: dict):
+    print(f"\n== {size}: {datasets.SIZES[size]}")
+    print(f"{'route':<34}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'SQL':>6}")
+    for route, metrics in results.items():
+        print(f"{route:<34}{metrics['throughput_rps']:>9.1f}{metrics['p50_ms']:>9.2f}"
+              f"{metrics['p95_ms']:>9.2f}{metrics['p99_ms']:>9.2f}{metrics['statements']:>6}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=sorted(datasets.SIZES), default=["small"])
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    regressions = []
+    for size in args.sizes:
+        results = run_size(size, args.iterations)
+        print_report(size, results)
+        if args.update_baseline:
+            baseline[size] = results
+        else:
+            regressions += compare(size, results, baseline, args.threshold)
+
+    if args.update_baseline:
+        save_baseline(baseline, args.baseline)
+        print(f"\nBaseline written to {args.baseline}")
+    elif regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    elif not any(size in baseline for size in args.sizes):
+        print("\nNo baseline for these sizes yet; run with --update-baseline to record one")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Memory and time-to-first-byte of the streaming appointment export.
+
+For each table size the export is driven straight through the ASGI app (an
+HTTP client would buffer the body), discarding chunks as they arrive, and
+compared with materializing the same rows at once: every ORM object loaded,
+encoded and joined into one body, the way an unpaginated list route would.
+Peak memory is traced in a separate pass, since tracemalloc slows Python
+down.
+
+Run from the repository root:  python -m tests.benchmarks.export_bench --rows 10000 100000 300000
+"""
+from datetime import date, timedelta
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+import uuid
+
+from tests.benchmarks.common import use_scratch_database
+
+def fill_appointments(engine, total: int):
+    from sqlalchemy import func, select
+    import models
+
+    table = models.Appointment.__table__
+    with engine.connect() as connection:
+        existing = connection.execute(select(func.count()).select_from(table)).scalar()
+    patients = [str(uuid.uuid4()) for _ in range(200)]
+    doctors = [str(uuid.uuid4()) for _ in range(20)]
+    for start in range(existing, total, 50000):
+        rows = [{
+            "id": str(uuid.uuid4()), "patient_id": patients[i % 200], "doctor_id": doctors[i % 20],
+            "date": date(2024, 1, 1) + timedelta(days=i % 700), "time": f"{9 + i % 8:02d}:00",
+            "status": "confirmed", "type": "video", "symptoms": "Recurring headache", "fee": 500 + i % 40 * 25,
+            "payment_status": "paid",
+        } for i in range(start, min(start + 50000, total))]
+        with engine.begin() as connection:
+            connection.execute(table.insert(), rows)
+
+async def stream_export(app, token: str, export_format: str) -> dict:
+    path = "/api/appointments/export"
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+             "query_string": f"format={export_format}".encode(), "client": ("127.0.0.1", 1), "server": ("bench", 80),
+             "headers": [(b"authorization", f"Bearer {token}".encode())]}
+    stats = {"status": None, "bytes": 0, "first_byte": None}
+    done = asyncio.Event()
+
+    async def receive():
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            stats["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            if stats["first_byte"] is None and message.get("body"):
+                stats["first_byte"] = time.perf_counter()
+            stats["bytes"] += len(message.get("body", b""))
+            if not message.get("more_body"):
+                done.set()
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    assert stats["status"] == 200, stats
+    return {"ttfb_ms": (stats["first_byte"] - started) * 1000,
+            "total_ms": (time.perf_counter() - started) * 1000, "bytes": stats["bytes"]}
+
+def materialize(engine) -> dict:
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session
+    import models
+    from serializers import dumps
+    from server import encode_appointment
+
+    started = time.perf_counter()
+    with Session(engine) as db:
+        rows = db.scalars(select(models.Appointment).order_by(models.Appointment.date.desc())).all()
+        body = dumps([encode_appointment(row) for row in rows])
+    elapsed = (time.perf_counter() - started) * 1000
+    return {"ttfb_ms": elapsed, "total_ms": elapsed, "bytes": len(body)}
+
+async def peak_mib(case) -> float:
+    tracemalloc.start()
+    try:
+        await case()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+async def run(args):
+    import httpx
+    import logging
+    import database
+    from server import app, init_storage
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    init_storage()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.post("/api/seed")
+        token = (await client.post("/api/auth/login", json={
+            "email": "admin@example.com", "password": "admin123", "role": "admin"
+        })).json()["access_token"]
+
+    print(f"{'rows':>8}  {'path':<18}{'ttfb ms':>10}{'total ms':>10}{'MiB out':>9}{'peak MiB':>10}")
+    for rows in sorted(args.rows):
+        fill_appointments(database.engine, rows)
+        cases = {f"stream {fmt}": (lambda fmt=fmt: stream_export(app, token, fmt)) for fmt in ("ndjson", "csv")}
+
+        async def materialize_case():
+            # Blocks the loop, as the sync work would block a worker thread
+            return materialize(database.engine)
+
+        cases["materialize json"] = materialize_case
+        for name, case in cases.items():
+            timing = await case()
+            peak = await peak_mib(case)
+            print(f"{rows:>8}  {name:<18}{timing['ttfb_ms']:>10.1f}{timing['total_ms']:>10.0f}"
+                  f"{timing['bytes'] / (1024 * 1024):>9.1f}{peak:>10.1f}")
+    await database.async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 300000])
+    args = parser.parse_args()
+
+    use_scratch_database("export")
+    os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
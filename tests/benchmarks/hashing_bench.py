@@ -0,0 +1,49 @@
+"""Measure password verification throughput (logins/sec) through the hashing pool.
+
+Run from the repository root:  python -m tests.benchmarks.hashing_bench --rounds 12 --workers 1 2 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+def run(workers: int, logins: int, password: str, hashed: str) -> float:
+    import hashing
+
+    pool = hashing.HashingPool(workers, max_pending=max(1, workers) * 4, timeout=60)
+    # Warm the worker processes so fork cost is not counted
+    for _ in range(max(1, workers)):
+        pool.run(hashing._verify, password, hashed)
+
+    # Request threads submit concurrently, as the Starlette threadpool would
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers) * 4) as threads:
+        results = list(threads.map(lambda _: pool.run(hashing._verify, password, hashed), range(logins)))
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+    assert all(results)
+    return logins / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--logins", type=int, default=40)
+    args = parser.parse_args()
+
+    # Must be set before hashing.py builds its CryptContext
+    os.environ["PASSWORD_HASH_ROUNDS"] = str(args.rounds)
+    import hashing
+
+    password = "correct horse battery staple"
+    hashed = hashing._hash(password)
+    print(f"bcrypt rounds={args.rounds}, cpu cores={os.cpu_count()}\n")
+    print(f"{'workers':>8}{'logins/s':>11}{'per core':>10}")
+    for workers in args.workers:
+        rate = run(workers, args.logins, password, hashed)
+        cores = min(max(1, workers), os.cpu_count() or 1)
+        label = "inline" if workers == 0 else str(workers)
+        print(f"{label:>8}{rate:>11.1f}{rate / cores:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Throughput cost of the request metrics middleware.
+
+Runs the same requests with metrics recording switched on and off, in
+interleaved rounds so drift affects both modes equally, and reports the
+best round of each (the least disturbed by scheduler noise). The overhead
+verdict divides the middleware's isolated per-request cost by each route's
+request time; the target is under 2%.
+
+Run from the repository root:  python -m tests.benchmarks.metrics_bench --requests 2000 --rounds 7
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from tests.benchmarks.common import use_scratch_database
+
+TARGET_OVERHEAD = 0.02
+
+async def throughput(client, path: str, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path)
+        assert response.status_code == 200, response.text
+    return requests / (time.perf_counter() - started)
+
+async def middleware_cost_us(metrics, calls: int = 100_000) -> float:
+    """Per-request cost of the middleware alone, around a no-op ASGI app."""
+    async def noop(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/"}
+    timings = []
+    for handler in (noop, metrics.MetricsMiddleware(noop, metrics.MetricsRegistry())):
+        started = time.perf_counter()
+        for _ in range(calls):
+            await handler(dict(scope), receive, send)
+        timings.append((time.perf_counter() - started) / calls * 1e6)
+    return timings[1] - timings[0]
+
+async def run(args):
+    import httpx
+    import database
+    import metrics
+    from server import app, init_storage
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    cost = await middleware_cost_us(metrics)
+    print(f"middleware cost: {cost:.2f} us/request\n")
+
+    # ASGITransport does not run the lifespan, so prepare storage directly
+    init_storage()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/api/seed")
+        doctor_id = (await client.get("/api/doctors")).json()["doctors"][0]["user_id"]
+        paths = ["/api/", "/api/doctors", f"/api/doctors/{doctor_id}"]
+
+        # A/B throughput is reported for context; on a noisy host it cannot
+        # resolve a 2% difference, so the verdict uses the isolated cost
+        print(f"{'route':<30}{'off req/s':>11}{'on req/s':>11}{'A/B':>9}{'cost share':>12}")
+        worst = 0.0
+        for path in paths:
+            samples = {True: [], False: []}
+            for _ in range(args.rounds):
+                for enabled in (False, True):
+                    metrics.registry.enabled = enabled
+                    samples[enabled].append(await throughput(client, path, args.requests))
+            off, on = max(samples[False]), max(samples[True])
+            share = cost / (1e6 / on)
+            worst = max(worst, share)
+            print(f"{path[:29]:<30}{off:>11.0f}{on:>11.0f}{(off - on) / off:>9.2%}{share:>12.2%}")
+        metrics.registry.enabled = True
+    # The seed and doctor routes opened aiosqlite connections, whose worker
+    # threads would keep the interpreter from exiting
+    await database.async_engine.dispose()
+
+    verdict = "ok" if worst < TARGET_OVERHEAD else "OVER TARGET"
+    print(f"\nworst overhead {worst:.2%} (target < {TARGET_OVERHEAD:.0%}): {verdict}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=7)
+    args = parser.parse_args()
+
+    use_scratch_database("metrics")
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Compare the doctor search index with the old leading-wildcard ILIKE query.
+
+Run from the repository root:  python -m tests.benchmarks.search_bench --doctors 100000
+"""
+import argparse
+import random
+import time
+import uuid
+
+from tests.benchmarks.common import use_scratch_database, time_calls
+
+FIRST_NAMES = ["Aarav", "Priya", "Rahul", "Sneha", "Vikram", "Ananya", "Rohan", "Kavya", "Arjun", "Meera",
+               "Sarah", "Rajesh", "Amit", "Neha", "Karan", "Divya", "Sanjay", "Pooja", "Nikhil", "Isha"]
+LAST_NAMES = ["Sharma", "Kumar", "Patel", "Reddy", "Singh", "Johnson", "Iyer", "Gupta", "Nair", "Das",
+              "Mehta", "Rao", "Joshi", "Menon", "Bose", "Kapoor", "Chopra", "Verma", "Pillai", "Khan"]
+SPECIALTIES = ["Cardiology", "Dermatology", "Neurology", "Pediatrics", "Orthopedics",
+               "Ophthalmology", "Dentistry", "ENT", "Psychiatry", "General Medicine"]
+CITIES = ["Mumbai", "Delhi", "Bangalore", "Pune", "Hyderabad", "Chennai", "Kolkata", "Jaipur", "Lucknow", "Kochi"]
+HOSPITAL_KINDS = ["City Hospital", "Care Clinic", "Medical Centre", "Health Institute", "General Hospital"]
+
+QUERIES = ["sharma", "card", "priya reddy", "neurlogy", "mumbai", "kumar delhi"]
+
+def populate(db, doctors: int, seed: int):
+    import models
+
+    rng = random.Random(seed)
+    db.execute(models.Specialty.__table__.insert(), [
+        {"id": i + 1, "name": name, "description": name} for i, name in enumerate(SPECIALTIES)
+    ])
+    batch_size = 10000
+    for start in range(0, doctors, batch_size):
+        users, profiles = [], []
+        for i in range(start, min(start + batch_size, doctors)):
+            user_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            city = rng.choice(CITIES)
+            users.append({
+                "id": user_id,
+                "email": f"doctor{i}@bench.local",
+                "password_hash": "x",
+                "name": f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "role": "doctor",
+            })
+            profiles.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "user_id": user_id,
+                "specialty_id": rng.randint(1, len(SPECIALTIES)),
+                "hospital": f"{city} {rng.choice(HOSPITAL_KINDS)}",
+                "location": city,
+                "fee": rng.randrange(500, 2500, 100),
+            })
+        db.execute(models.User.__table__.insert(), users)
+        db.execute(models.Doctor.__table__.insert(), profiles)
+    db.commit()
+
+def ilike_search(db, search: str, limit: int = 20):
+    import models
+
+    query = db.query(models.Doctor).join(models.User).join(models.Specialty).filter(
+        models.User.name.ilike(f"%{search}%") |
+        models.Specialty.name.ilike(f"%{search}%")
+    )
+    total = query.count()
+    return total, query.limit(limit).all()
+
+def indexed_search(db, index, search: str, limit: int = 20):
+    import models
+
+    matches = index.search(db, search)
+    page_ids = [doctor_id for doctor_id, _ in matches[:limit]]
+    doctors = db.query(models.Doctor).filter(models.Doctor.user_id.in_(page_ids)).all() if page_ids else []
+    return len(matches), doctors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--doctors", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    use_scratch_database("search")
+    import models
+    from database import SessionLocal, engine
+    from search import DoctorSearchIndex
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    started = time.perf_counter()
+    populate(db, args.doctors, args.seed)
+    print(f"Loaded {args.doctors} doctors in {time.perf_counter() - started:.1f}s")
+
+    index = DoctorSearchIndex()
+    started = time.perf_counter()
+    index.search(db, "warmup")
+    print(f"Built search index in {(time.perf_counter() - started) * 1000:.0f} ms\n")
+
+    print(f"{'query':<14}{'ilike hits':>11}{'ilike p50':>11}{'index hits':>12}{'index p50':>11}{'speedup':>9}")
+    for search in QUERIES:
+        ilike_total, _ = ilike_search(db, search)
+        index_total, _ = indexed_search(db, index, search)
+        ilike = time_calls(lambda: ilike_search(db, search), args.repeat)
+        indexed = time_calls(lambda: indexed_search(db, index, search), args.repeat)
+        print(f"{search:<14}{ilike_total:>11}{ilike['p50_ms']:>9.2f}ms{index_total:>12}"
+              f"{indexed['p50_ms']:>9.2f}ms{ilike['p50_ms'] / indexed['p50_ms']:>8.1f}x")
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Serialization cost of GET /api/appointments bodies, per 10k rows.
+
+Compares the response_model path (FastAPI validates every row into
+AppointmentResponse, dumps it, runs jsonable_encoder, then json.dumps) with
+the fast path (a compiled row encoder plus orjson, or the stdlib fallback
+when orjson is missing). All three must produce identical bytes; the run
+stops if they do not.
+
+Run from the repository root:  python -m tests.benchmarks.serialize_bench --rows 10000 --repeat 20
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import List
+import argparse
+import asyncio
+import uuid
+
+from tests.benchmarks.common import time_calls, use_scratch_database
+
+def make_rows(count: int) -> list:
+    import models
+
+    started = datetime(2025, 1, 1, 9, 30, 15, 250000)
+    return [
+        models.Appointment(
+            id=str(uuid.uuid4()), patient_id=str(uuid.uuid4()), doctor_id=str(uuid.uuid4()),
+            date=date(2025, 1, 1) + timedelta(days=i % 365), time=f"{9 + i % 8:02d}:{(i % 4) * 15:02d}",
+            status=("pending", "confirmed", "completed", "cancelled")[i % 4],
+            type="video" if i % 3 else "in-person", symptoms="Recurring headache and mild fever",
+            fee=Decimal("500.00") + i % 50 * 25, payment_status="paid" if i % 2 else "pending",
+            created_at=started + timedelta(minutes=i),
+        )
+        for i in range(count)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    use_scratch_database("serialize")
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    import schemas
+    import serializers
+
+    rows = make_rows(args.rows)
+    field = create_response_field("response", List[schemas.AppointmentResponse])
+    encoder = serializers.compile_encoder(schemas.AppointmentResponse)
+
+    def response_model_path() -> bytes:
+        content = asyncio.run(serialize_response(field=field, response_content=rows, is_coroutine=True))
+        return JSONResponse(content).body
+
+    def fast_path() -> bytes:
+        return serializers.list_response(rows, encoder).body
+
+    def stdlib_fast_path() -> bytes:
+        saved, serializers.orjson = serializers.orjson, None
+        try:
+            return serializers.list_response(rows, encoder).body
+        finally:
+            serializers.orjson = saved
+
+    paths = {"response_model": response_model_path, "compiled + stdlib json": stdlib_fast_path}
+    if serializers.orjson is not None:
+        paths["compiled + orjson"] = fast_path
+    else:
+        print("orjson is not installed; timing the stdlib fallback only\n")
+
+    expected = response_model_path()
+    for name, path in paths.items():
+        assert path() == expected, f"{name} does not match the response_model output"
+
+    per_10k = 10000 / args.rows
+    baseline = None
+    print(f"{args.rows} rows, {len(expected) / 1024:.0f} KiB body, {args.repeat} runs; ms per 10k rows\n")
+    print(f"{'path':<24}{'mean':>9}{'p50':>9}{'p95':>9}{'speedup':>9}")
+    for name, path in paths.items():
+        timing = time_calls(path, args.repeat)
+        baseline = baseline or timing["mean_ms"]
+        print(f"{name:<24}{timing['mean_ms'] * per_10k:>9.1f}{timing['p50_ms'] * per_10k:>9.1f}"
+              f"{timing['p95_ms'] * per_10k:>9.1f}{baseline / timing['mean_ms']:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Cold-start cost of an API worker.
+
+Each run starts a fresh interpreter and times three phases:
+  import    import server (must do no I/O)
+  startup   the lifespan startup step: migrations and upload directory
+  first     the first request through the ASGI app (GET /api/)
+Startup is measured both on an empty database (full DDL) and on one that is
+already current (the common case when a new worker joins). A separate
+-X importtime run lists the heaviest top-level imports.
+
+Run from the repository root:  python -m tests.benchmarks.startup_bench --runs 7 --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from tests.benchmarks import BACKEND_DIR
+from tests.benchmarks.common import use_scratch_database
+
+CHILD = r"""
+import asyncio, json, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+
+async def main():
+    messages = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        messages.append(message)
+    async with server.app.router.lifespan_context(server.app):
+        ready = time.perf_counter()
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                 "scheme": "http", "path": "/api/", "raw_path": b"/api/", "root_path": "",
+                 "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+        await server.app(scope, receive, send)
+        assert messages[0]["status"] == 200
+        answered = time.perf_counter()
+    return ready, answered
+
+ready, answered = asyncio.run(main())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_ms": (answered - ready) * 1000,
+}))
+"""
+
+def run_child(env: dict) -> dict:
+    output = subprocess.run([sys.executable, "-c", CHILD], env=env, cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def _import_times(env: dict, code: str) -> dict:
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            env=env, cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    times = {}
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Two-space indent: a top-level import of the -c code (or of site)
+        if name.startswith("   ") and not name.startswith("    ") and cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1000
+    return times
+
+def heaviest_imports(env: dict, top: int) -> list:
+    interpreter = _import_times(env, "pass")
+    rows = [(ms, name) for name, ms in _import_times(env, "import server").items() if name not in interpreter]
+    return sorted(rows, reverse=True)[:top]
+
+def summarize(label: str, samples: list):
+    row = f"{label:<16}"
+    for key in ("import_ms", "startup_ms", "first_ms"):
+        values = sorted(sample[key] for sample in samples)
+        row += f"{statistics.median(values):>10.1f}{values[-1]:>9.1f}"
+    print(row)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--top", type=int, default=12, help="heaviest direct imports to list")
+    parser.add_argument("--budget-ms", type=float, help="fail if median import + startup exceeds this")
+    args = parser.parse_args()
+
+    database_path = use_scratch_database("startup")
+    env = {**os.environ, "UPLOAD_DIR": tempfile.mkdtemp(prefix="medicare_bench_uploads_")}
+    # One untimed run compiles bytecode so every timed run starts equally warm
+    run_child(env)
+
+    results = {"empty database": [], "current database": []}
+    for _ in range(args.runs):
+        if os.path.exists(database_path):
+            os.remove(database_path)
+        results["empty database"].append(run_child(env))
+        results["current database"].append(run_child(env))
+
+    print(f"{args.runs} runs per case; median and max in ms\n")
+    print(f"{'':<16}{'import':>10}{'max':>9}{'startup':>10}{'max':>9}{'first req':>10}{'max':>9}")
+    for label, samples in results.items():
+        summarize(label, samples)
+
+    print("\nheaviest imports pulled in by server (cumulative ms)")
+    for cumulative, name in heaviest_imports(env, args.top):
+        print(f"  {cumulative:>8.1f}  {name}")
+
+    if args.budget_ms is not None:
+        current = results["current database"]
+        cold_start = statistics.median(s["import_ms"] + s["startup_ms"] for s in current)
+        print(f"\ncold start {cold_start:.0f} ms against a budget of {args.budget_ms:.0f} ms")
+        if cold_start > args.budget_ms:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
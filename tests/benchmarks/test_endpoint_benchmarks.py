@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+# Benchmarks are slow and machine-dependent; opt in explicitly
+pytestmark = pytest.mark.skipif(
+    os.environ.get("MEDICARE_BENCH") != "1",
+    reason="set MEDICARE_BENCH=1 to run the endpoint benchmarks"
+)
+
+SIZES = os.environ.get("MEDICARE_BENCH_SIZES", "small").split(",")
+
+@pytest.mark.parametrize("size", SIZES)
+def test_endpoints_within_baseline(size):
+    from tests.benchmarks import endpoints
+
+    results = endpoints.run_size(size)
+    endpoints.print_report(size, results)
+    baseline = endpoints.load_baseline()
+    if size not in baseline:
+        pytest.skip(f"no baseline for {size}; run python -m tests.benchmarks.endpoints --update-baseline")
+
+    regressions = endpoints.compare(size, results, baseline, endpoints.DEFAULT_THRESHOLD)
+    assert not regressions, "\n".join(regressions)
@@ -0,0 +1,119 @@
+"""Latency of other endpoints while large medical-record uploads are in flight.
+
+Compares the streaming upload route with the previous blocking copyfileobj
+handler, mounted on the same app for the run.
+
+Run from the repository root:  python -m tests.benchmarks.upload_bench --uploads 4 --size-mb 100
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from tests.benchmarks.common import use_scratch_database
+
+BODY_CHUNK = 64 * 1024
+BOUNDARY = "benchboundary"
+
+def multipart_stream(size: int):
+    async def body():
+        yield (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"scan.pdf\"\r\n"
+               f"Content-Type: application/pdf\r\n\r\n%PDF-").encode()
+        chunk = b"x" * BODY_CHUNK
+        for _ in range(size // BODY_CHUNK):
+            yield chunk
+            # Let other tasks run between chunks, like a socket read would
+            await asyncio.sleep(0)
+        yield f"\r\n--{BOUNDARY}--\r\n".encode()
+    return body()
+
+def add_legacy_route(app, upload_dir):
+    from fastapi import Depends, File, UploadFile
+    import auth
+
+    @app.post("/bench/legacy-upload")
+    async def legacy_upload(file: UploadFile = File(...), current_user=Depends(auth.get_current_user)):
+        with (upload_dir / f"legacy_{file.filename}").open("wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        return {"ok": True}
+
+async def measure(client, headers, upload_path: str, uploads: int, size: int, probe_interval: float):
+    latencies = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            response = await client.get("/api/")
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200
+            await asyncio.sleep(probe_interval)
+
+    async def upload():
+        response = await client.post(
+            upload_path,
+            headers={**headers, "Content-Type": f"multipart/form-data; boundary={BOUNDARY}"},
+            content=multipart_stream(size),
+        )
+        assert response.status_code == 200, response.text
+
+    prober = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(upload() for _ in range(uploads)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await prober
+
+    latencies.sort()
+    return {
+        "probes": len(latencies),
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "max": latencies[-1],
+        "upload_s": elapsed,
+    }
+
+async def run(args):
+    import httpx
+    from server import app, init_storage
+
+    upload_dir = __import__("uploads").UPLOAD_DIR
+    add_legacy_route(app, upload_dir)
+    # ASGITransport does not run the lifespan, so prepare storage directly
+    init_storage()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/api/seed")
+        token = (await client.post("/api/auth/login", json={
+            "email": "john@example.com", "password": "password123", "role": "patient"
+        })).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        size = args.size_mb * 1024 * 1024
+        print(f"{args.uploads} concurrent uploads of {args.size_mb} MB; probing GET /api/\n")
+        print(f"{'handler':<11}{'probes':>7}{'p50':>10}{'p99':>10}{'max':>10}{'uploads':>10}")
+        for label, path in (("legacy", "/bench/legacy-upload"), ("streaming", "/api/medical-records")):
+            result = await measure(client, headers, path, args.uploads, size, args.probe_interval)
+            print(f"{label:<11}{result['probes']:>7}{result['p50']:>8.2f}ms{result['p99']:>8.2f}ms"
+                  f"{result['max']:>8.2f}ms{result['upload_s']:>9.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--probe-interval", type=float, default=0.005)
+    args = parser.parse_args()
+
+    use_scratch_database("upload")
+    os.environ["UPLOAD_DIR"] = tempfile.mkdtemp(prefix="medicare_bench_uploads_")
+    os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutil.rmtree(os.environ["UPLOAD_DIR"], ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Profile SQL on every request in test runs, so likely N+1 patterns and
+# slow-query plans are logged (see backend/profiling.py)
+os.environ.setdefault("QUERY_PROFILING", "true")
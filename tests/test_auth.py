@@ -0,0 +1,84 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import database
+import migrations
+import models
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(auth.time, "monotonic", clock)
+    return clock
+
+def principal(user_id: str, role: str = "patient") -> auth.Principal:
+    return auth.Principal(models.User(id=user_id, email=f"{user_id}@test", name=user_id, role=role))
+
+def test_entries_expire_after_the_ttl_or_the_token(clock):
+    cache = auth.PrincipalCache(maxsize=10, ttl=60)
+    cache.put("a", {"exp": None}, principal("a"))
+    # A token with 5 seconds left is cached for 5 seconds, not 60
+    cache.put("b", {"exp": time.time() + 5}, principal("b"))
+
+    clock.now += 10
+    assert cache.get("a")[1].id == "a"
+    assert cache.get("b") is None
+    clock.now += 50
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 0, "hits": 1, "misses": 2, "evictions": 0}
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = auth.PrincipalCache(maxsize=2, ttl=60)
+    cache.put("a", {}, principal("a"))
+    cache.put("b", {}, principal("b"))
+    assert cache.get("a") is not None
+    cache.put("c", {}, principal("c"))
+
+    assert cache.get("b") is None
+    assert [cache.get(token)[1].id for token in ("a", "c")] == ["a", "c"]
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+    # A user's every token goes at once
+    cache.put("a2", {}, principal("a"))
+    cache.invalidate_user("a")
+    assert cache.get("a") is None and cache.get("a2") is None
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'auth.db'}")
+    migrations.upgrade(engine)
+    monkeypatch.setattr(auth, "principal_cache", auth.PrincipalCache(maxsize=10, ttl=60))
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with TestSession() as db:
+        db.add(models.User(id="admin", email="admin@test", password_hash="-", name="Admin", role="admin"))
+        db.commit()
+        yield db
+    engine.dispose()
+
+def test_role_change_reaches_role_checks_at_once(db):
+    token = auth.create_access_token({"sub": "admin", "role": "admin"})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    admin_only = auth.require_role(["admin"])
+    assert admin_only(auth.get_current_user(credentials, db)).role == "admin"
+    assert auth.principal_cache.stats()["size"] == 1
+
+    # The token still claims admin; the committed change drops the cached
+    # principal, and the reloaded one decides
+    db.get(models.User, "admin").role = "patient"
+    db.commit()
+    assert auth.principal_cache.stats()["size"] == 0
+    with pytest.raises(HTTPException) as raised:
+        admin_only(auth.get_current_user(credentials, db))
+    assert raised.value.status_code == 403
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import database
+
+def test_sqlite_connections_get_wal_and_tuned_pragmas(tmp_path):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # NORMAL
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == database.SQLITE_BUSY_TIMEOUT_MS
+        assert connection.execute(text("PRAGMA mmap_size")).scalar() == database.SQLITE_MMAP_SIZE
+    assert engine.pool.size() == database.DB_POOL_SIZE
+    engine.dispose()
+
+def test_replica_engine_reads_but_refuses_writes(tmp_path):
+    path = tmp_path / "primary.db"
+    primary = database.make_engine(f"sqlite:///{path}")
+    with primary.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+        connection.execute(text("INSERT INTO items VALUES (1)"))
+
+    # Same file, writable on disk: query_only is what blocks the write
+    replica = database.make_engine(f"sqlite:///{path}", read_only=True)
+    with replica.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM items")).scalar() == 1
+    with pytest.raises(OperationalError):
+        with replica.begin() as connection:
+            connection.execute(text("INSERT INTO items VALUES (2)"))
+    replica.dispose()
+    primary.dispose()
+
+def test_backend_without_an_async_driver_gets_no_async_engine(monkeypatch):
+    # Neither the sync nor an async MySQL driver needs to be installed for this
+    assert database.make_async_engine("mysql://user@localhost/medicare") is None
+    assert database.make_async_engine("mssql+pyodbc://user@dsn") is None
+
+    # The async routes then fail with a message saying why; the rest still work
+    monkeypatch.setattr(database, "AsyncReadSessionLocal", None)
+    with pytest.raises(RuntimeError, match="No async driver"):
+        asyncio.run(database.get_async_read_session_factory())
+
+    async def first_session():
+        async for db in database.get_async_read_db():
+            return db
+
+    with pytest.raises(RuntimeError, match="ASYNC_DRIVERS"):
+        asyncio.run(first_session())
@@ -0,0 +1,245 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import database
+import migrations
+import models
+import reference
+import search
+import server
+
+DOCTORS = 25
+
+@pytest.fixture
+def doctor_app(tmp_path):
+    """The app on a scratch database with DOCTORS doctors, counting SQL statements."""
+    url = f"sqlite:///{tmp_path / 'doctors.db'}"
+    engine = database.make_engine(url)
+    migrations.upgrade(engine)
+    async_engine = database.make_async_engine(url)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncTestSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    doctor_ids = []
+    with TestSession() as db:
+        specialties = [models.Specialty(name=f"Specialty {i}") for i in range(3)]
+        db.add_all(specialties)
+        db.flush()
+        for i in range(DOCTORS):
+            user_id = str(uuid.uuid4())
+            doctor_ids.append(user_id)
+            db.add(models.User(id=user_id, email=f"d{i}@test", password_hash="-", name=f"Dr. {i}", role="doctor"))
+            db.add(models.Doctor(user_id=user_id, specialty_id=specialties[i % 3].id, fee=500, verified=True,
+                                 languages=["English"], availability_days=["Mon"]))
+        db.commit()
+
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    for watched in (engine, async_engine.sync_engine):
+        event.listen(watched, "before_cursor_execute", count)
+
+    def test_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def async_test_db():
+        async with AsyncTestSession() as db:
+            yield db
+
+    async def test_session_factory():
+        return TestSession
+
+    async def async_test_session_factory():
+        return AsyncTestSession
+
+    server.app.dependency_overrides.update({
+        database.get_db: test_db,
+        database.get_read_db: test_db,
+        database.get_async_db: async_test_db,
+        database.get_async_read_db: async_test_db,
+        database.get_session_factory: test_session_factory,
+        database.get_async_read_session_factory: async_test_session_factory,
+    })
+    server.reset_caches()
+    # No `with`: the lifespan would migrate the app's own database
+    yield TestClient(server.app), statements, doctor_ids, engine
+    server.app.dependency_overrides.clear()
+    server.reset_caches()
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+def statements_for(client, statements, path: str) -> int:
+    before = len(statements)
+    response = client.get(path)
+    assert response.status_code == 200, response.text
+    return len(statements) - before
+
+def test_doctor_pages_run_a_fixed_number_of_statements(doctor_app):
+    client, statements, doctor_ids, engine = doctor_app
+    # Cold: the reference version, specialties and doctor profiles, then
+    # the page's rows; never a query per doctor on the page
+    assert statements_for(client, statements, "/api/doctors?limit=20") == 4
+    assert len(client.get("/api/doctors?limit=20").json()["doctors"]) == 20
+
+    # Reference data loaded but responses not cached; the count only on request
+    server.doctor_cache.clear()
+    assert statements_for(client, statements, "/api/doctors?limit=20") == 1
+    assert statements_for(client, statements, "/api/doctors?limit=20&include_total=true") == 2
+    # A profile comes straight from the reference store
+    assert statements_for(client, statements, f"/api/doctors/{doctor_ids[0]}") == 0
+    assert statements_for(client, statements, f"/api/doctors/{doctor_ids[1]}") == 0
+
+def test_search_follows_another_workers_doctor_edit(doctor_app, monkeypatch):
+    client, statements, doctor_ids, engine = doctor_app
+    monkeypatch.setattr(reference.reference_store, "check_interval", 0)
+    assert [d["user"]["name"] for d in client.get("/api/doctors?search=Asclepius").json()["doctors"]] == []
+
+    # Committed by another worker: no session hook here sees it, only the
+    # version stamp moves
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE users SET name = 'Dr. Asclepius' WHERE id = :id"), {"id": doctor_ids[3]})
+        bumped = connection.execute(text(
+            "UPDATE stat_counters SET value = value + 1 WHERE name = :name"
+        ), {"name": reference.VERSION_COUNTER}).rowcount
+        if not bumped:
+            connection.execute(text("INSERT INTO stat_counters (name, value) VALUES (:name, 1)"),
+                               {"name": reference.VERSION_COUNTER})
+
+    found = client.get("/api/doctors?search=Asclepius").json()["doctors"]
+    assert [d["user"]["name"] for d in found] == ["Dr. Asclepius"]
+
+def test_only_profile_edits_move_the_reference_version(doctor_app):
+    client, statements, doctor_ids, engine = doctor_app
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def version(db):
+        return db.execute(text("SELECT value FROM stat_counters WHERE name = :name"),
+                          {"name": reference.VERSION_COUNTER}).scalar() or 0
+
+    with TestSession() as db:
+        doctor = db.get(models.User, doctor_ids[0])
+        before = version(db)
+        # As on login, when the hash parameters have moved on
+        doctor.password_hash = "rehashed"
+        db.commit()
+        assert version(db) == before
+
+        doctor.phone = "+91 90000 00000"
+        db.commit()
+        assert version(db) == before + 1
+        doctor.role = "admin"
+        db.commit()
+        assert version(db) == before + 2
+
+def test_search_total_counts_only_listed_doctors(doctor_app):
+    client, statements, doctor_ids, engine = doctor_app
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with TestSession() as db:
+        # No specialty: never listed, so not counted either
+        db.add(models.User(id="unlisted", email="unlisted@test", password_hash="-", name="Dr. Unlisted", role="doctor"))
+        db.add(models.Doctor(user_id="unlisted", fee=500, languages=["English"], availability_days=["Mon"]))
+        db.commit()
+
+    page = client.get("/api/doctors?search=Dr&limit=10").json()
+    assert page["total"] == DOCTORS
+    rest = client.get(f"/api/doctors?search=Dr&limit=100&cursor={page['next_cursor']}").json()
+    assert len(page["doctors"]) + len(rest["doctors"]) == page["total"]
+    assert rest["next_cursor"] is None
+
+def test_doctor_list_filters_and_pages_on_the_async_session(doctor_app):
+    client, statements, doctor_ids, engine = doctor_app
+    # Specialty 1 has every third doctor, starting with the second; pages
+    # follow the doctors' own ids
+    with engine.connect() as connection:
+        expected = connection.execute(text(
+            "SELECT user_id FROM doctors JOIN specialties ON specialties.id = specialty_id "
+            "WHERE specialties.name = 'Specialty 1' ORDER BY doctors.id"
+        )).scalars().all()
+    assert sorted(expected) == sorted(doctor_ids[1::3])
+    seen, params = [], {"specialty": "Specialty 1", "limit": 3, "include_total": "true"}
+    while True:
+        page = client.get("/api/doctors", params=params).json()
+        assert page["total"] == len(expected)
+        seen.extend(doctor["user_id"] for doctor in page["doctors"])
+        if page["next_cursor"] is None:
+            break
+        params["cursor"] = page["next_cursor"]
+    assert seen == expected
+    assert all(doctor["specialty"]["name"] == "Specialty 1" for doctor in client.get(
+        "/api/doctors", params={"specialty": "Specialty 1", "limit": 100}).json()["doctors"])
+
+    # An offset still works for the first page
+    offset = client.get("/api/doctors", params={"specialty": "Specialty 1", "limit": 3, "offset": 6}).json()
+    assert [doctor["user_id"] for doctor in offset["doctors"]] == expected[6:9]
+    assert client.get("/api/doctors", params={"specialty": "Unknown", "include_total": "true"}).json() == {
+        "doctors": [], "total": 0, "next_cursor": None
+    }
+
+def test_matching_etag_is_a_304_until_a_doctor_changes(doctor_app):
+    client, statements, doctor_ids, engine = doctor_app
+    paths = ["/api/doctors?limit=100", f"/api/doctors/{doctor_ids[0]}", f"/api/doctors/{doctor_ids[1]}"]
+    etags = {}
+    for path in paths:
+        first = client.get(path)
+        etags[path] = first.headers["etag"]
+        assert first.headers["cache-control"] == "no-cache"
+        cached = client.get(path, headers={"If-None-Match": etags[path]})
+        assert (cached.status_code, cached.content, cached.headers["etag"]) == (304, b"", etags[path])
+
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with TestSession() as db:
+        db.get(models.User, doctor_ids[0]).name = "Dr. Renamed"
+        db.commit()
+
+    for path in paths[:2]:
+        changed = client.get(path, headers={"If-None-Match": etags[path]})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etags[path]
+    # Re-rendered, but the same bytes: a strong ETag on the body still matches
+    assert client.get(paths[2], headers={"If-None-Match": etags[paths[2]]}).status_code == 304
+
+def test_reference_reload_changes_the_etag(doctor_app, monkeypatch):
+    client, statements, doctor_ids, engine = doctor_app
+    monkeypatch.setattr(reference.reference_store, "check_interval", 0)
+    path = f"/api/doctors/{doctor_ids[0]}"
+    etag = client.get(path).headers["etag"]
+    assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+    # Another worker renames the doctor's specialty
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE specialties SET name = 'Cardiology' WHERE name = 'Specialty 0'"))
+        connection.execute(text("UPDATE stat_counters SET value = value + 1 WHERE name = :name"),
+                           {"name": reference.VERSION_COUNTER})
+
+    reloaded = client.get(path, headers={"If-None-Match": etag})
+    assert reloaded.status_code == 200
+    assert reloaded.json()["specialty"]["name"] == "Cardiology"
+    assert reloaded.headers["etag"] != etag
+
+def test_local_doctor_edit_reindexes_only_that_doctor(doctor_app):
+    client, statements, doctor_ids, engine = doctor_app
+    index = search.doctor_search_index
+    assert client.get("/api/doctors?search=Dr").json()["doctors"]
+
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with TestSession() as db:
+        db.get(models.User, doctor_ids[3]).name = "Dr. Asclepius"
+        db.commit()
+    # The reference reload this triggers leaves the index loaded
+    client.get("/api/doctors")
+    assert index._loaded and index._stale == {doctor_ids[3]}
+
+    found = client.get("/api/doctors?search=Asclepius").json()["doctors"]
+    assert [d["user"]["name"] for d in found] == ["Dr. Asclepius"]
+    assert len(index._docs) == DOCTORS
@@ -0,0 +1,119 @@
+import hashlib
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import database
+import migrations
+import models
+import server
+from downloads import parse_range
+
+CONTENT = bytes(range(256)) * 4
+PATIENT_ID = str(uuid.uuid4())
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-0", (0, 0)),
+    ("bytes=1023-", (1023, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),    # the end is clamped to the file
+    ("bytes=-1", (1023, 1023)),
+    ("bytes=-5000", (0, 1023)),           # a suffix longer than the file is all of it
+    ("bytes=0-1,5-6", None),              # several ranges: the whole file is fine too
+    ("items=0-1", None),
+])
+def test_range_edges(header, expected):
+    assert parse_range(header, len(CONTENT)) == expected
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1024-", 1024),
+    ("bytes=5-4", 1024),
+    ("bytes=-0", 1024),
+    ("bytes=-500", 0),
+    ("bytes=0-", 0),
+])
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
+
+@pytest.fixture
+def files_app(tmp_path):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'downloads.db'}")
+    migrations.upgrade(engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    records = {}
+    with TestSession() as db:
+        db.add(models.User(id=PATIENT_ID, email="patient@test", password_hash="-", name="Patient", role="patient"))
+        for name, content in (("scan.pdf", CONTENT), ("empty.pdf", b"")):
+            path = tmp_path / f"{uuid.uuid4()}_{name}"
+            path.write_bytes(content)
+            record = models.MedicalRecord(id=str(uuid.uuid4()), patient_id=PATIENT_ID, type="report", title=name,
+                                          file_url=str(path), file_size=len(content),
+                                          checksum=hashlib.sha256(content).hexdigest())
+            db.add(record)
+            records[name] = f"/api/medical-records/{record.id}/file"
+        db.commit()
+
+    def test_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    server.app.dependency_overrides[database.get_db] = test_db
+    server.reset_caches()
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': PATIENT_ID, 'role': 'patient'})}"}
+    # No `with`: the lifespan would migrate the app's own database
+    yield TestClient(server.app), headers, records
+    server.app.dependency_overrides.pop(database.get_db, None)
+    server.reset_caches()
+    engine.dispose()
+
+def test_range_is_served_as_206(files_app):
+    client, headers, records = files_app
+    whole = client.get(records["scan.pdf"], headers=headers)
+    assert (whole.status_code, whole.content) == (200, CONTENT)
+    assert whole.headers["accept-ranges"] == "bytes"
+    assert whole.headers["etag"] == f'"{hashlib.sha256(CONTENT).hexdigest()}"'
+
+    partial = client.get(records["scan.pdf"], headers={**headers, "Range": "bytes=1000-"})
+    assert (partial.status_code, partial.content) == (206, CONTENT[1000:])
+    assert partial.headers["content-range"] == "bytes 1000-1023/1024"
+    assert partial.headers["content-length"] == "24"
+
+    last = client.get(records["scan.pdf"], headers={**headers, "Range": "bytes=-1"})
+    assert (last.status_code, last.content) == (206, CONTENT[-1:])
+
+def test_unsatisfiable_range_is_a_416(files_app):
+    client, headers, records = files_app
+    past_end = client.get(records["scan.pdf"], headers={**headers, "Range": "bytes=2048-"})
+    assert (past_end.status_code, past_end.headers["content-range"]) == (416, "bytes */1024")
+
+    # Nothing in an empty file can be addressed, not even a suffix
+    empty = client.get(records["empty.pdf"], headers={**headers, "Range": "bytes=-500"})
+    assert (empty.status_code, empty.headers["content-range"]) == (416, "bytes */0")
+    assert client.get(records["empty.pdf"], headers=headers).content == b""
+
+def test_if_range_mismatch_sends_the_whole_file(files_app):
+    client, headers, records = files_app
+    etag = client.get(records["scan.pdf"], headers=headers).headers["etag"]
+
+    resumed = client.get(records["scan.pdf"], headers={**headers, "Range": "bytes=1000-", "If-Range": etag})
+    assert resumed.status_code == 206
+    changed = client.get(records["scan.pdf"], headers={**headers, "Range": "bytes=1000-", "If-Range": '"stale"'})
+    assert (changed.status_code, changed.content) == (200, CONTENT)
+    assert "content-range" not in changed.headers
+
+def test_matching_etag_is_a_304(files_app):
+    client, headers, records = files_app
+    etag = client.get(records["scan.pdf"], headers=headers).headers["etag"]
+
+    for match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        cached = client.get(records["scan.pdf"], headers={**headers, "If-None-Match": match})
+        assert (cached.status_code, cached.content) == (304, b"")
+        assert cached.headers["etag"] == etag
+    assert client.get(records["scan.pdf"], headers={**headers, "If-None-Match": '"other"'}).status_code == 200
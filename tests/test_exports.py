@@ -0,0 +1,133 @@
+from datetime import date, datetime
+from decimal import Decimal
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import database
+import exports
+import migrations
+import models
+import server
+
+SYMPTOMS = 'Cough, "dry"\nsince Monday'
+
+@pytest.fixture
+def export_app(tmp_path):
+    url = f"sqlite:///{tmp_path / 'exports.db'}"
+    engine = database.make_engine(url)
+    migrations.upgrade(engine)
+    async_engine = database.make_async_engine(url)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncTestSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    with TestSession() as db:
+        for user_id, role in (("patient", "patient"), ("doctor", "doctor"), ("locum", "doctor"), ("admin", "admin")):
+            db.add(models.User(id=user_id, email=f"{user_id}@test", password_hash="-", name=user_id.title(), role=role))
+        for day in range(1, 6):
+            db.add(models.Appointment(id=f"doctor-{day}", patient_id="patient", doctor_id="doctor",
+                                      date=date(2026, 3, day), time="10:00", type="video", symptoms=SYMPTOMS,
+                                      fee=Decimal("500"), status="cancelled" if day == 5 else "confirmed",
+                                      created_at=datetime(2026, 2, 1, 9, 30)))
+        db.add(models.Appointment(id="locum-1", patient_id="patient", doctor_id="locum", date=date(2026, 3, 1),
+                                  time="11:00", type="in-person", symptoms=None, fee=None))
+        db.commit()
+
+    async def async_test_db():
+        async with AsyncTestSession() as db:
+            yield db
+
+    async def async_test_session_factory():
+        return AsyncTestSession
+
+    server.app.dependency_overrides.update({
+        database.get_async_db: async_test_db,
+        database.get_async_read_db: async_test_db,
+        database.get_async_read_session_factory: async_test_session_factory,
+    })
+    server.reset_caches()
+    # No `with`: the lifespan would migrate the app's own database
+    yield TestClient(server.app), AsyncTestSession
+    server.app.dependency_overrides.clear()
+    server.reset_caches()
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+def export(client, user_id: str, role: str, **params):
+    token = auth.create_access_token({"sub": user_id, "role": role})
+    return client.get("/api/appointments/export", headers={"Authorization": f"Bearer {token}"}, params=params)
+
+def test_export_is_scoped_to_the_caller(export_app):
+    client, AsyncTestSession = export_app
+    assert export(client, "patient", "patient").status_code == 403
+
+    def ids(user_id, role, **params):
+        response = export(client, user_id, role, **params)
+        assert response.status_code == 200, response.text
+        return [json.loads(line)["id"] for line in response.text.splitlines()]
+
+    # Newest first
+    assert ids("doctor", "doctor") == [f"doctor-{day}" for day in range(5, 0, -1)]
+    assert ids("locum", "doctor") == ["locum-1"]
+    assert ids("doctor", "doctor", status="cancelled") == ["doctor-5"]
+    assert sorted(ids("admin", "admin")) == sorted([f"doctor-{day}" for day in range(1, 6)] + ["locum-1"])
+
+    invalid = export(client, "admin", "admin", format="xml")
+    assert (invalid.status_code, invalid.json()["detail"]) == (400, "format must be one of: ndjson, csv")
+
+def test_csv_has_a_header_and_quotes_awkward_values(export_app):
+    client, AsyncTestSession = export_app
+    response = export(client, "admin", "admin", format="csv")
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.headers["content-disposition"] == (
+        f'attachment; filename="appointments-{date.today().isoformat()}.csv"'
+    )
+    assert response.text.startswith(",".join(server.APPOINTMENT_FIELDS) + "\n")
+    # The newline inside the symptoms stays inside one quoted field
+    assert '"Cough, ""dry""\nsince Monday"' in response.text
+
+    rows = {row["id"]: row for row in csv.DictReader(io.StringIO(response.text))}
+    assert len(rows) == 6
+    first = rows["doctor-4"]
+    assert (first["symptoms"], first["fee"], first["status"]) == (SYMPTOMS, "500.00", "confirmed")
+    assert (first["date"], first["created_at"]) == ("2026-03-04", "2026-02-01T09:30:00")
+    # NULLs are empty fields
+    assert (rows["locum-1"]["symptoms"], rows["locum-1"]["fee"]) == ("", "")
+
+def test_ndjson_streams_in_chunks(export_app, monkeypatch):
+    client, AsyncTestSession = export_app
+    assert export(client, "doctor", "doctor").headers["content-type"] == "application/x-ndjson"
+
+    # The test client gathers the body in one piece, so read the stream itself
+    monkeypatch.setattr(exports, "EXPORT_BATCH_ROWS", 2)
+    query = select(*[getattr(models.Appointment, name) for name in server.APPOINTMENT_FIELDS]).where(
+        models.Appointment.doctor_id == "doctor"
+    ).order_by(models.Appointment.date.desc())
+
+    async def collect(export_format):
+        stream = exports.stream_export(AsyncTestSession, query, server.encode_appointment,
+                                       server.APPOINTMENT_FIELDS, export_format)
+        return [chunk async for chunk in stream]
+
+    chunks = asyncio.run(collect("ndjson"))
+
+    # Five rows, two per chunk, every chunk whole lines
+    assert len(chunks) == 3
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    lines = b"".join(chunks).decode().splitlines()
+    first = json.loads(lines[0])
+    assert set(first) == set(server.APPOINTMENT_FIELDS)
+    assert (first["id"], first["symptoms"], first["fee"], first["date"]) == ("doctor-5", SYMPTOMS, "500.00", "2026-03-05")
+    assert len(lines) == 5
+
+    # CSV: the header goes out on its own before the first query chunk
+    chunks = asyncio.run(collect("csv"))
+    assert chunks[0] == (",".join(server.APPOINTMENT_FIELDS) + "\n").encode()
+    assert len(chunks) == 4
@@ -0,0 +1,129 @@
+import hashlib
+import threading
+import time
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import database
+import hashing
+import migrations
+import models
+import server
+
+PATIENT_ID = str(uuid.uuid4())
+
+@pytest.fixture
+def pool():
+    pool = hashing.HashingPool(workers=1, max_pending=1, timeout=5)
+    yield pool
+    pool.shutdown()
+
+def wait_for_job(pool):
+    deadline = time.monotonic() + 5
+    while pool._slots._value and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def test_full_pool_turns_work_away_with_503(pool):
+    # The worker starts up first, so the job below holds the slot a while
+    pool.run(time.sleep, 0)
+    running = threading.Thread(target=pool.run, args=(time.sleep, 1))
+    running.start()
+    wait_for_job(pool)
+
+    with pytest.raises(HTTPException) as raised:
+        pool.run(time.sleep, 0)
+    assert (raised.value.status_code, raised.value.headers) == (503, {"Retry-After": "1"})
+    assert pool.rejected == 1
+
+    running.join()
+    assert pool.run(time.sleep, 0) is None
+
+def test_timed_out_job_keeps_its_slot_until_done(pool):
+    pool.run(time.sleep, 0)
+    pool.timeout = 0.2
+    with pytest.raises(HTTPException) as raised:
+        pool.run(time.sleep, 1)
+    assert raised.value.detail == "Authentication timed out, please retry"
+
+    # Still running in the worker, so still counted against the cap
+    with pytest.raises(HTTPException) as raised:
+        pool.run(time.sleep, 0)
+    assert raised.value.detail == "Authentication is busy, please retry"
+
+    pool.timeout = 5
+    time.sleep(1)
+    assert pool.run(time.sleep, 0) is None
+
+@pytest.fixture
+def login_app(tmp_path):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'logins.db'}")
+    migrations.upgrade(engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def test_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    server.app.dependency_overrides[database.get_db] = test_db
+    server.reset_caches()
+    # No `with`: the lifespan would migrate the app's own database
+    yield TestClient(server.app), TestSession
+    server.app.dependency_overrides.pop(database.get_db, None)
+    server.reset_caches()
+    engine.dispose()
+
+def add_user(TestSession, password_hash: str):
+    with TestSession() as db:
+        db.add(models.User(id=PATIENT_ID, email="patient@test.com", password_hash=password_hash,
+                           name="Patient", role="patient"))
+        db.commit()
+
+def stored_hash(TestSession) -> str:
+    with TestSession() as db:
+        return db.get(models.User, PATIENT_ID).password_hash
+
+def login(client, password: str = "secret"):
+    return client.post("/api/auth/login", json={"email": "patient@test.com", "password": password, "role": "patient"})
+
+def test_legacy_hash_is_upgraded_on_login(login_app):
+    client, TestSession = login_app
+    legacy = hashlib.sha256(b"secret").hexdigest()
+    add_user(TestSession, legacy)
+    assert hashing.needs_rehash(legacy)
+
+    assert login(client, "wrong").status_code == 401
+    assert stored_hash(TestSession) == legacy
+    assert login(client).status_code == 200
+    upgraded = stored_hash(TestSession)
+    assert upgraded.startswith("$2b$") and not hashing.needs_rehash(upgraded)
+    # The new hash is the one checked from now on
+    assert login(client).status_code == 200
+    assert login(client, "wrong").status_code == 401
+
+def test_cheaper_bcrypt_hash_is_upgraded_on_login(login_app):
+    client, TestSession = login_app
+    cheap = hashing.crypt_context().hash("secret", rounds=4)
+    add_user(TestSession, cheap)
+    assert login(client).status_code == 200
+    assert stored_hash(TestSession).startswith(f"$2b${hashing.PASSWORD_HASH_ROUNDS:02d}$")
+
+def test_busy_pool_does_not_fail_the_login(login_app, monkeypatch):
+    client, TestSession = login_app
+    legacy = hashlib.sha256(b"secret").hexdigest()
+    add_user(TestSession, legacy)
+
+    def busy(password):
+        raise HTTPException(status_code=503, detail="Authentication is busy, please retry")
+
+    monkeypatch.setattr(auth, "get_password_hash", busy)
+    assert login(client).status_code == 200
+    # Upgraded on a later login instead
+    assert stored_hash(TestSession) == legacy
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import database
+import jobs
+import migrations
+import models
+
+@pytest.fixture
+def queue(tmp_path):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    migrations.upgrade(engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    calls = []
+
+    @jobs.job_handler("test_flaky")
+    def flaky(db, payload):
+        calls.append(payload["n"])
+        if len(calls) <= payload["failures"]:
+            raise RuntimeError("provider unavailable")
+
+    queue = jobs.JobQueue(workers=0, poll_interval=0, lease=60)
+    with TestSession() as db:
+        yield queue, db, calls
+    del jobs.HANDLERS["test_flaky"]
+    engine.dispose()
+
+def test_job_commits_with_its_transaction(queue):
+    queue, db, calls = queue
+    jobs.enqueue(db, "test_flaky", {"n": 1, "failures": 0})
+    db.rollback()
+    assert not queue.work_batch(db)
+
+    jobs.enqueue(db, "test_flaky", {"n": 2, "failures": 0})
+    db.commit()
+    assert queue.work_batch(db)
+    assert calls == [2]
+    # Finished jobs leave the table
+    queue.refresh_depth(db, force=True)
+    assert queue.depth == {"queued": 0, "running": 0, "failed": 0}
+
+def test_failures_back_off_then_give_up(queue):
+    queue, db, calls = queue
+    job = jobs.enqueue(db, "test_flaky", {"n": 1, "failures": 10}, max_attempts=3)
+    db.commit()
+    now = datetime.utcnow()
+    delays = []
+    for attempt in range(1, 4):
+        assert queue.work_batch(db, now=now)
+        db.refresh(job)
+        assert job.attempts == attempt
+        if attempt < 3:
+            assert job.status == "queued"
+            delays.append((job.run_at - now).total_seconds())
+            # Not due again until the backoff has passed
+            assert not queue.work_batch(db, now=now)
+            now = job.run_at
+    assert job.status == "failed" and "provider unavailable" in job.last_error
+    assert delays[1] > delays[0] > 0
+    processed = {name: samples for name, kind, help_text, samples in queue.collect()}["jobs_processed_total"]
+    assert ('kind="test_flaky",outcome="failed"', 1) in processed
+
+def test_job_of_a_dead_worker_runs_again_after_its_lease(queue):
+    queue, db, calls = queue
+    jobs.enqueue(db, "test_flaky", {"n": 1, "failures": 0})
+    db.commit()
+    now = datetime.utcnow()
+    # A worker claims the job and dies before finishing it
+    assert queue._claim(db, now, "dead-worker", limit=10)
+    assert not queue.work_batch(db, now=now + timedelta(seconds=30))
+
+    assert queue.work_batch(db, now=now + timedelta(seconds=61))
+    assert calls == [1]
+    assert db.query(models.Job).count() == 0
+
+def test_a_burst_of_jobs_is_claimed_and_finished_together(queue):
+    queue, db, calls = queue
+    for n in range(5):
+        jobs.enqueue(db, "test_flaky", {"n": n, "failures": 1})
+    db.commit()
+    # The first job fails; the rest of the batch still runs and is deleted
+    assert queue.work_batch(db, limit=3) == 3
+    assert calls == [0, 1, 2]
+    assert queue.work_batch(db) == 2
+    queue.refresh_depth(db, force=True)
+    assert queue.depth == {"queued": 1, "running": 0, "failed": 0}
@@ -0,0 +1,81 @@
+import re
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import database
+import metrics
+import migrations
+import models
+import server
+
+PATIENT_ID = str(uuid.uuid4())
+SAMPLE = re.compile(r"^(\w+)(?:\{(.*)\})? (\S+)$")
+
+def scrape(client) -> dict:
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    samples = {}
+    for line in response.text.splitlines():
+        match = SAMPLE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            samples[(name, labels or "")] = float(value)
+    return samples
+
+@pytest.fixture
+def metered_app(tmp_path):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    migrations.upgrade(engine)
+    metrics.registry.instrument_pool("test", engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with TestSession() as db:
+        db.add(models.User(id=PATIENT_ID, email="patient@test", password_hash="-", name="Patient", role="patient"))
+        db.commit()
+
+    def test_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    server.app.dependency_overrides[database.get_db] = test_db
+    server.reset_caches()
+    # No `with`: the lifespan would migrate the app's own database
+    yield TestClient(server.app)
+    server.app.dependency_overrides.pop(database.get_db, None)
+    server.reset_caches()
+    metrics.registry.pools.pop("test")
+    metrics.registry.pool_hold.pop("test")
+    engine.dispose()
+
+def test_scrape_shows_requests_and_pool_checkouts(metered_app):
+    client = metered_app
+    before = scrape(client)
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': PATIENT_ID, 'role': 'patient'})}"}
+    assert client.get("/api/medical-records", headers=headers).status_code == 200
+    assert client.get("/api/medical-records").status_code == 403
+    after = scrape(client)
+
+    def moved(name, labels):
+        return after.get((name, labels), 0) - before.get((name, labels), 0)
+
+    # Labelled by route template, one series per status
+    route = 'method="GET",route="/api/medical-records"'
+    assert moved("http_responses_total", f'{route},status="200"') == 1
+    assert moved("http_responses_total", f'{route},status="403"') == 1
+    assert moved("http_request_duration_seconds_count", route) == 2
+    assert moved("http_request_duration_seconds_bucket", f'{route},le="+Inf"') == 2
+
+    # The migrated, seeded engine had connected already; the request checks
+    # out and returns a connection, and the hold time is observed on checkin
+    checkouts = moved("db_pool_events_total", 'pool="test",event="checkout"')
+    assert checkouts >= 1
+    assert moved("db_pool_events_total", 'pool="test",event="checkin"') == checkouts
+    assert moved("db_pool_checkout_held_seconds_count", 'pool="test"') == checkouts
+    assert after[("db_pool_checked_out", 'pool="test"')] == 0
+    assert after[("http_requests_in_flight", "")] == 1
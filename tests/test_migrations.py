@@ -0,0 +1,108 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+import migrations
+import models
+
+# The hot queries as the routes issue them, and the index each should use
+HOT_QUERIES = {
+    "ix_appointments_patient_date": (
+        "SELECT * FROM appointments WHERE patient_id = 'p' ORDER BY date DESC, id DESC LIMIT 100"
+    ),
+    "ix_appointments_doctor_date": (
+        "SELECT date, time FROM appointments WHERE doctor_id = 'd' AND date >= '2026-01-01' AND status != 'cancelled'"
+    ),
+    "ix_appointments_date": "SELECT * FROM appointments ORDER BY date DESC, id DESC LIMIT 100",
+    "ix_appointments_payment_fee": "SELECT sum(fee) FROM appointments WHERE payment_status = 'paid'",
+    "ix_medical_records_patient_created": (
+        "SELECT * FROM medical_records WHERE patient_id = 'p' ORDER BY created_at DESC, id DESC LIMIT 100"
+    ),
+    "ix_medical_records_doctor_created": (
+        "SELECT * FROM medical_records WHERE doctor_id = 'd' ORDER BY created_at DESC, id DESC LIMIT 100"
+    ),
+}
+
+def plan(engine, query: str) -> str:
+    with engine.connect() as connection:
+        return " / ".join(row[-1] for row in connection.execute(text("EXPLAIN QUERY PLAN " + query)))
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    """A database as it looked before versioned migrations existed."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        for name in HOT_QUERIES:
+            connection.execute(text(f"DROP INDEX {name}"))
+        for name in ("file_size", "checksum"):
+            connection.execute(text(f"ALTER TABLE medical_records DROP COLUMN {name}"))
+    yield engine
+    engine.dispose()
+
+def test_upgrade_moves_hot_queries_onto_indexes(legacy_engine):
+    before = {name: plan(legacy_engine, query) for name, query in HOT_QUERIES.items()}
+    for name, query_plan in before.items():
+        assert name not in query_plan
+        assert "SCAN" in query_plan or "TEMP B-TREE" in query_plan, query_plan
+
+    migrations.upgrade(legacy_engine)
+
+    for name, query in HOT_QUERIES.items():
+        query_plan = plan(legacy_engine, query)
+        assert f"INDEX {name}" in query_plan, f"{name}: {query_plan}"
+        assert "TEMP B-TREE" not in query_plan, f"{name} still sorts: {query_plan}"
+
+def test_upgrade_records_versions_and_is_idempotent(legacy_engine):
+    applied = migrations.upgrade(legacy_engine, target=1)
+    assert [step.version for step in applied] == [1]
+    columns = {column["name"] for column in inspect(legacy_engine).get_columns("medical_records")}
+    assert {"file_size", "checksum"} <= columns
+    assert migrations.applied_versions(legacy_engine) == {1}
+
+    migrations.upgrade(legacy_engine)
+    assert migrations.upgrade(legacy_engine) == []
+    assert migrations.applied_versions(legacy_engine) == {step.version for step in migrations.MIGRATIONS}
+
+def test_fresh_database_needs_no_schema_changes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    applied = migrations.upgrade(engine)
+    # create_all already built the current schema; the steps only get stamped
+    assert len(applied) == len(migrations.MIGRATIONS)
+    indexes = {index["name"] for index in inspect(engine).get_indexes("appointments")}
+    assert {"ix_appointments_patient_date", "ix_appointments_payment_fee"} <= indexes
+    engine.dispose()
+
+def test_backfills_fill_in_existing_rows(legacy_engine):
+    with legacy_engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_appointments_starts_at"))
+        for name in ("starts_at", "reminded_at"):
+            connection.execute(text(f"ALTER TABLE appointments DROP COLUMN {name}"))
+        connection.execute(text(
+            "INSERT INTO users (id, email, password_hash, name, role) VALUES "
+            "('p', 'p@test', '-', 'Patient', 'patient'), ('d', 'd@test', '-', 'Doctor', 'doctor')"
+        ))
+        connection.execute(text("INSERT INTO patients (id, user_id) VALUES ('pp', 'p')"))
+        connection.execute(text(
+            "INSERT INTO appointments (id, patient_id, doctor_id, date, time, type, status, payment_status, fee, created_at) "
+            "VALUES (:id, 'p', 'd', '2026-03-02', :time, 'video', :status, :paid, 500, :created)"
+        ), [
+            {"id": "first", "time": "2:30 PM", "status": "confirmed", "paid": "paid", "created": "2026-01-01 09:00:00"},
+            # Booked the same slot later: stays, but unreserved
+            {"id": "second", "time": "14:30", "status": "pending", "paid": "paid", "created": "2026-01-02 09:00:00"},
+            {"id": "cancelled", "time": "10:00", "status": "cancelled", "paid": "pending", "created": "2026-01-03 09:00:00"},
+            {"id": "garbled", "time": "soon", "status": "pending", "paid": "pending", "created": "2026-01-04 09:00:00"},
+        ])
+
+    migrations.upgrade(legacy_engine)
+
+    with legacy_engine.connect() as connection:
+        assert connection.execute(text("SELECT doctor_id, date, slot, appointment_id FROM slot_reservations")).all() == [
+            ("d", "2026-03-02", 58, "first")
+        ]
+        assert dict(connection.execute(text("SELECT id, starts_at FROM appointments")).all()) == {
+            "first": "2026-03-02 14:30:00.000000", "second": "2026-03-02 14:30:00.000000",
+            "cancelled": "2026-03-02 10:00:00.000000", "garbled": None,
+        }
+        assert dict(connection.execute(text("SELECT name, value FROM stat_counters")).all()) == {
+            "total_patients": 1, "total_doctors": 0, "total_appointments": 4, "revenue": 1000,
+        }
@@ -0,0 +1,152 @@
+from datetime import date, datetime, timedelta
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import database
+import migrations
+import models
+import server
+from pagination import decode_cursor, encode_cursor, optional
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(date(2026, 1, 5), "a1", None, datetime(2026, 1, 5, 9, 30))
+    assert "=" not in cursor
+    assert decode_cursor(cursor, date.fromisoformat, str, optional(str), datetime.fromisoformat) == (
+        date(2026, 1, 5), "a1", None, datetime(2026, 1, 5, 9, 30)
+    )
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    encode_cursor("a1"),                  # one key where two are expected
+    encode_cursor("yesterday", "a1"),     # not a date
+    encode_cursor(None, "a1"),            # NULL where the key cannot be
+])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor, date.fromisoformat, str)
+    assert raised.value.status_code == 400
+
+APPOINTMENTS = 130
+
+@pytest.fixture
+def records_app(tmp_path):
+    """The app on a scratch database with one patient's records and appointments."""
+    url = f"sqlite:///{tmp_path / 'records.db'}"
+    engine = database.make_engine(url)
+    migrations.upgrade(engine)
+    async_engine = database.make_async_engine(url)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncTestSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    with TestSession() as db:
+        db.add(models.User(id="patient", email="patient@test", password_hash="-", name="Patient", role="patient"))
+        db.add(models.User(id="doctor", email="doctor@test", password_hash="-", name="Doctor", role="doctor"))
+        db.add_all(models.Appointment(id=str(uuid.uuid4()), patient_id="patient", doctor_id="doctor",
+                                      date=date(2026, 1, 1) + timedelta(days=i % 40), time="10:00", type="video")
+                   for i in range(APPOINTMENTS))
+        db.commit()
+    start = datetime(2026, 1, 5, 9, 0)
+    with engine.begin() as connection:
+        # Every third record predates the created_at default; an explicit
+        # None is stored as NULL
+        connection.execute(models.MedicalRecord.__table__.insert(), [
+            {"id": str(uuid.uuid4()), "patient_id": "patient", "type": "report", "title": f"Record {i}",
+             "created_at": None if i % 3 == 0 else start + timedelta(minutes=i // 2)}
+            for i in range(7)
+        ])
+
+    def test_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def async_test_db():
+        async with AsyncTestSession() as db:
+            yield db
+
+    server.app.dependency_overrides.update({
+        database.get_db: test_db,
+        database.get_async_db: async_test_db,
+        database.get_async_read_db: async_test_db,
+    })
+    server.reset_caches()
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'patient', 'role': 'patient'})}"}
+    # No `with`: the lifespan would migrate the app's own database
+    yield TestClient(server.app), headers, engine
+    server.app.dependency_overrides.clear()
+    server.reset_caches()
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+def test_records_without_created_at_page_last(records_app):
+    client, headers, engine = records_app
+    seen, cursor = [], None
+    while True:
+        page = client.get("/api/medical-records", headers=headers,
+                          params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert page.status_code == 200, page.text
+        seen.extend(page.json()["records"])
+        cursor = page.json()["next_cursor"]
+        if cursor is None:
+            break
+
+    # Every record once, newest first, and those without a time at the end
+    with engine.connect() as connection:
+        expected = connection.execute(text(
+            "SELECT id FROM medical_records ORDER BY created_at IS NULL, created_at DESC, id DESC"
+        )).scalars().all()
+    assert [record["id"] for record in seen] == expected
+    assert [record["created_at"] for record in seen[-3:]] == [None, None, None]
+
+    invalid = client.get("/api/medical-records", headers=headers, params={"cursor": "garbage"})
+    assert (invalid.status_code, invalid.json()["detail"]) == (400, "Invalid cursor")
+
+def test_appointments_are_paged_only_on_request(records_app):
+    client, headers, engine = records_app
+    # Past the default page size: clients that never page still get everything
+    everything = client.get("/api/appointments", headers=headers)
+    assert len(everything.json()) == APPOINTMENTS
+    assert "x-next-cursor" not in everything.headers
+
+    seen, params = [], {"limit": 50}
+    while True:
+        page = client.get("/api/appointments", headers=headers, params=params)
+        seen.extend(appointment["id"] for appointment in page.json())
+        if "x-next-cursor" not in page.headers:
+            break
+        params = {"limit": 50, "cursor": page.headers["x-next-cursor"]}
+    assert seen == [appointment["id"] for appointment in everything.json()]
+
+def test_appointments_are_scoped_to_the_caller(records_app):
+    client, headers, engine = records_app
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, email, password_hash, name, role) VALUES "
+            "('other', 'other@test', '-', 'Other', 'patient'), ('locum', 'locum@test', '-', 'Locum', 'doctor')"
+        ))
+        connection.execute(text(
+            "INSERT INTO appointments (id, patient_id, doctor_id, date, time, type, status) VALUES "
+            "('theirs', 'other', 'locum', '2026-02-01', '10:00', 'video', 'confirmed')"
+        ))
+
+    def appointment_ids(user_id, role, **params):
+        token = auth.create_access_token({"sub": user_id, "role": role})
+        response = client.get("/api/appointments", headers={"Authorization": f"Bearer {token}"}, params=params)
+        assert response.status_code == 200, response.text
+        return {appointment["id"] for appointment in response.json()}
+
+    mine = appointment_ids("patient", "patient")
+    assert len(mine) == APPOINTMENTS and "theirs" not in mine
+    assert appointment_ids("doctor", "doctor") == mine
+    assert appointment_ids("other", "patient") == appointment_ids("locum", "doctor") == {"theirs"}
+    assert appointment_ids("locum", "doctor", status="confirmed") == {"theirs"}
+    assert appointment_ids("locum", "doctor", status="cancelled") == set()
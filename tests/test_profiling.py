@@ -0,0 +1,66 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import auth
+import profiling
+import server
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'profiling.db'}")
+    profiling.instrument_engine(engine)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE doctors (id INTEGER PRIMARY KEY, name TEXT)"))
+        connection.execute(text("INSERT INTO doctors (id, name) VALUES (1, 'a'), (2, 'b'), (3, 'c')"))
+    yield engine
+    engine.dispose()
+
+def test_repeated_statement_is_flagged_as_n_plus_one(engine):
+    profile = profiling.QueryProfile("GET /api/doctors")
+    token = profiling.current_profile.set(profile)
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT id FROM doctors WHERE id IN (1, 2, 3)")).all()
+            # One lookup per row: same statement, different values
+            for doctor_id in (1, 2, 3):
+                connection.execute(text("SELECT name FROM doctors WHERE id = :id"), {"id": doctor_id}).all()
+    finally:
+        profiling.current_profile.reset(token)
+
+    report = profile.report()
+    assert report["statements"] == 4
+    assert report["n_plus_one"] == [{"statement": "SELECT name FROM doctors WHERE id = ?", "count": 3}]
+
+def profiled_app(engine, **options) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/doctors")
+    def doctors():
+        with engine.connect() as connection:
+            return [row.name for row in connection.execute(text("SELECT name FROM doctors"))]
+
+    app.add_middleware(profiling.QueryProfilerMiddleware, **options)
+    return TestClient(app)
+
+def test_profile_header_needs_authorization(engine):
+    asked = {profiling.PROFILE_HEADER: "1"}
+    assert "x-query-count" not in profiled_app(engine, always=False).get("/doctors", headers=asked).headers
+
+    client = profiled_app(engine, always=False, authorize=lambda headers: b"authorization" in headers)
+    assert "x-query-count" not in client.get("/doctors", headers=asked).headers
+    response = client.get("/doctors", headers={**asked, "Authorization": "Bearer x"})
+    assert response.headers["x-query-count"] == "1"
+
+    assert profiled_app(engine, always=True).get("/doctors").headers["x-query-count"] == "1"
+
+def test_only_admin_tokens_may_profile():
+    def headers(role):
+        token = auth.create_access_token({"sub": f"{role}-id", "role": role})
+        return {b"authorization": f"Bearer {token}".encode()}
+
+    assert server._admin_request(headers("admin"))
+    assert not server._admin_request(headers("patient"))
+    assert not server._admin_request({b"authorization": b"Bearer not-a-token"})
+    assert not server._admin_request({})
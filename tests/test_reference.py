@@ -0,0 +1,108 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+import database
+import migrations
+import models
+import reference
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'reference.db'}")
+    migrations.upgrade(engine)
+    clock = Clock()
+    monkeypatch.setattr(reference.time, "monotonic", clock)
+    store = reference.ReferenceStore(check_interval=5)
+    # Commits mark this store stale instead of the app's
+    monkeypatch.setattr(reference, "reference_store", store)
+    reloads = []
+    store.add_listener(lambda: reloads.append(store._data.version))
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with TestSession() as db:
+        db.add(models.Specialty(name="Cardiology"))
+        db.commit()
+        yield store, db, engine, clock, reloads
+    engine.dispose()
+
+def names(data) -> list:
+    return [specialty.name for specialty in data.specialties]
+
+def test_another_workers_bump_is_picked_up_after_the_check_interval(store):
+    store, db, engine, clock, reloads = store
+    assert names(store.current(db)) == ["Cardiology"]
+
+    # Another worker: no session hook here sees it, only the stamp moves
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE specialties SET name = 'Cardiac Surgery'"))
+        connection.execute(text("UPDATE stat_counters SET value = value + 1 WHERE name = :name"),
+                           {"name": reference.VERSION_COUNTER})
+    db.rollback()
+
+    clock.now += 4
+    assert names(store.current(db)) == ["Cardiology"]
+    assert store.peek() is not None
+    clock.now += 1
+    assert store.peek() is None
+    assert names(store.current(db)) == ["Cardiac Surgery"]
+    assert len(reloads) == 2
+
+    # Checked again later with the stamp unchanged: no reload
+    clock.now += 5
+    store.current(db)
+    assert len(reloads) == 2
+
+def test_a_local_change_reloads_and_notifies_once(store):
+    store, db, engine, clock, reloads = store
+    store.current(db)
+    db.add(models.Specialty(name="Dermatology"))
+    db.commit()
+    assert store.peek() is None
+
+    # Several reads after the commit, then the periodic check: one reload,
+    # since the reload already read the bumped stamp
+    for _ in range(3):
+        assert names(store.current(db)) == ["Cardiology", "Dermatology"]
+    clock.now += 5
+    store.current(db)
+    assert reloads == [reloads[0], reloads[0] + 1]
+
+    # A rolled-back change leaves the snapshot alone
+    db.add(models.Specialty(name="Neurology"))
+    db.flush()
+    db.rollback()
+    assert store.peek() is not None
+    assert len(reloads) == 2
+
+def test_remote_only_listeners_skip_this_workers_own_changes(store):
+    store, db, engine, clock, reloads = store
+    remote = []
+    store.add_listener(lambda: remote.append(store._data.version), remote_only=True)
+    first = store.current(db).version
+    assert remote == [first]
+
+    # Two flushes, two bumps, one commit: all accounted for locally
+    db.add(models.Specialty(name="Dermatology"))
+    db.flush()
+    db.add(models.Specialty(name="Neurology"))
+    db.commit()
+    assert store.current(db).version == first + 2
+    assert remote == [first]
+
+    # Another worker's bump alongside one of ours: the reload has to count
+    # as remote, since this worker cannot tell which doctors it touched
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE stat_counters SET value = value + 1 WHERE name = :name"),
+                           {"name": reference.VERSION_COUNTER})
+    db.add(models.Specialty(name="Oncology"))
+    db.commit()
+    assert store.current(db).version == first + 4
+    assert remote == [first, first + 4]
+    assert len(reloads) == 3
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+import database
+import migrations
+import models
+import reminders
+
+@pytest.fixture
+def clinic(tmp_path, monkeypatch):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'reminders.db'}")
+    migrations.upgrade(engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    sent = []
+    scheduler = reminders.ReminderScheduler((1440, 60), window_hours=6,
+                                            sink=lambda db, reminder: sent.append(reminder))
+    # Commits feed this scheduler instead of the app's
+    monkeypatch.setattr(reminders, "reminder_scheduler", scheduler)
+    with TestSession() as db:
+        db.add(models.User(id="doctor", email="doctor@test", password_hash="-", name="Doctor", role="doctor"))
+        db.add(models.User(id="patient", email="patient@test", password_hash="-", name="Patient", role="patient"))
+        db.commit()
+        yield scheduler, db, sent
+    engine.dispose()
+
+def book(db, starts_at: datetime, status: str = "confirmed") -> models.Appointment:
+    appointment = models.Appointment(
+        id=str(uuid.uuid4()), patient_id="patient", doctor_id="doctor", date=starts_at.date(),
+        # Free-form, as clients send it
+        time=starts_at.strftime("%I:%M %p"), type="video", status=status
+    )
+    db.add(appointment)
+    db.commit()
+    return appointment
+
+def test_commits_update_the_heap(clinic):
+    scheduler, db, sent = clinic
+    now = datetime.now().replace(second=0, microsecond=0)
+    scheduler.load(db, now)
+    appointment = book(db, now + timedelta(hours=3))
+    assert appointment.starts_at == now + timedelta(hours=3)
+    # The day-before reminder is already past and skipped
+    assert scheduler.fire_due(db, now + timedelta(hours=1)) == 0
+    assert scheduler.fire_due(db, now + timedelta(hours=2)) == 1
+    assert [(r.appointment_id, r.minutes_before) for r in sent] == [(appointment.id, 60)]
+
+    # Rescheduled: the old time's reminder is dropped, the new one goes out
+    moved = book(db, now + timedelta(hours=4))
+    moved.time = (now + timedelta(hours=5)).strftime("%H:%M")
+    db.commit()
+    assert moved.starts_at == now + timedelta(hours=5)
+    assert scheduler.fire_due(db, now + timedelta(hours=3, minutes=30)) == 0
+    assert scheduler.fire_due(db, now + timedelta(hours=4)) == 1
+    assert sent[-1].starts_at == moved.starts_at
+
+    cancelled = book(db, now + timedelta(hours=3))
+    cancelled.status = "cancelled"
+    db.commit()
+    assert scheduler.fire_due(db, now + timedelta(hours=3)) == 0
+    assert len(sent) == 2
+
+def test_window_loads_from_the_start_index(clinic):
+    scheduler, db, sent = clinic
+    now = datetime.now().replace(second=0, microsecond=0)
+    # Booked before this worker started, one inside the window and one past it
+    soon = book(db, now + timedelta(hours=26))
+    later = book(db, now + timedelta(days=3))
+    assert scheduler.load(db, now) == 1
+    assert scheduler.horizon == now + timedelta(hours=30)
+    assert scheduler.fire_due(db, now + timedelta(hours=2)) == 1
+    assert sent[-1] == reminders.Reminder(soon.id, "patient", "doctor", soon.starts_at, 1440)
+
+    # and its hour-before reminder
+    assert scheduler.fire_due(db, now + timedelta(hours=25)) == 1
+
+    # Moving the window picks up the later appointment
+    assert scheduler.load(db, now + timedelta(hours=45)) == 1
+    assert scheduler.fire_due(db, now + timedelta(hours=48)) == 1
+    assert sent[-1].appointment_id == later.id
+
+    plan = db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT id, starts_at FROM appointments "
+        "WHERE starts_at > :lower AND starts_at <= :upper AND status IN ('pending', 'confirmed')"
+    ), {"lower": now, "upper": now}).all()
+    assert "ix_appointments_starts_at" in " ".join(row[-1] for row in plan)
+
+def test_each_reminder_is_sent_by_one_worker(clinic):
+    scheduler, db, sent = clinic
+    now = datetime.now().replace(second=0, microsecond=0)
+    other_worker = reminders.ReminderScheduler((1440, 60), window_hours=6,
+                                               sink=lambda db, reminder: sent.append(reminder))
+    appointment = book(db, now + timedelta(hours=3))
+    for worker in (scheduler, other_worker):
+        worker.load(db, now)
+    assert scheduler.fire_due(db, now + timedelta(hours=2)) == 1
+    assert other_worker.fire_due(db, now + timedelta(hours=2)) == 0
+    assert len(sent) == 1
+
+    # Existing rows get their start time from the migration
+    db.execute(text("UPDATE appointments SET starts_at = NULL"))
+    db.commit()
+    with db.bind.begin() as connection:
+        migrations._appointment_starts_at(connection)
+    db.refresh(appointment)
+    assert appointment.starts_at == now + timedelta(hours=3)
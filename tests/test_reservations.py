@@ -0,0 +1,215 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+import threading
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import database
+import migrations
+import models
+import reservations
+import server
+
+PATIENTS = 200
+
+@pytest.fixture
+def booking_app(tmp_path, monkeypatch):
+    """The app on a scratch database with one doctor and PATIENTS patients."""
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'bookings.db'}")
+    migrations.upgrade(engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    doctor_id = str(uuid.uuid4())
+    patient_ids = [str(uuid.uuid4()) for _ in range(PATIENTS)]
+    with TestSession() as db:
+        db.add(models.User(id=doctor_id, email="doctor@test", password_hash="-", name="Doctor", role="doctor"))
+        db.add(models.Doctor(user_id=doctor_id, fee=500, availability_days=["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]))
+        for i, patient_id in enumerate(patient_ids):
+            db.add(models.User(id=patient_id, email=f"p{i}@test", password_hash="-", name=f"P{i}", role="patient"))
+        db.commit()
+
+    def test_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # Every sweep runs, so a lapsed hold is released on the next booking
+    monkeypatch.setattr(reservations, "HOLD_SWEEP_SECONDS", 0)
+    server.app.dependency_overrides[database.get_db] = test_db
+    server.reset_caches()
+    tokens = [{"Authorization": f"Bearer {auth.create_access_token({'sub': patient_id, 'role': 'patient'})}"}
+              for patient_id in patient_ids]
+    # No `with`: the lifespan would migrate the app's own database
+    yield TestClient(server.app), TestSession, doctor_id, tokens
+    server.app.dependency_overrides.pop(database.get_db, None)
+    server.reset_caches()
+    engine.dispose()
+
+def booking(doctor_id: str, slot_time: str = "10:00") -> dict:
+    return {"doctor_id": doctor_id, "date": (date.today() + timedelta(days=3)).isoformat(),
+            "time": slot_time, "type": "video", "symptoms": "Fever"}
+
+def test_parallel_bookings_of_one_slot_confirm_exactly_one(booking_app):
+    client, TestSession, doctor_id, tokens = booking_app
+    # Only the reservation constraint stands between racing requests
+    start = threading.Barrier(50)
+
+    def book(headers):
+        try:
+            start.wait(timeout=10)
+        except threading.BrokenBarrierError:
+            pass
+        return client.post("/api/appointments", headers=headers, json=booking(doctor_id)).status_code
+
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        statuses = list(pool.map(book, tokens))
+
+    assert statuses.count(200) == 1
+    assert statuses.count(409) == PATIENTS - 1
+    with TestSession() as db:
+        active = db.scalar(select(func.count()).select_from(models.Appointment).where(
+            models.Appointment.doctor_id == doctor_id, models.Appointment.status != "cancelled"
+        ))
+    assert active == 1
+
+def test_hold_keeps_slot_until_paid_or_lapsed(booking_app):
+    client, TestSession, doctor_id, tokens = booking_app
+    order = client.post("/api/payments/create-order", headers=tokens[0], json=booking(doctor_id)).json()
+    assert client.post("/api/appointments", headers=tokens[1], json=booking(doctor_id)).status_code == 409
+
+    # Unpaid past its expiry: released, and the late payment is refused
+    with TestSession() as db:
+        assert reservations.release_expired_holds(db, now=datetime.utcnow() + timedelta(hours=1)) == 1
+    assert client.post("/api/payments/verify", headers=tokens[0],
+                       json={"appointment_id": order["appointment_id"]}).status_code == 409
+    assert client.post("/api/appointments", headers=tokens[1], json=booking(doctor_id)).status_code == 200
+
+    # Paid in time: the hold becomes a confirmed booking and never lapses
+    order = client.post("/api/payments/create-order", headers=tokens[2], json=booking(doctor_id, "11:00")).json()
+    assert client.post("/api/payments/verify", headers=tokens[2],
+                       json={"appointment_id": order["appointment_id"]}).status_code == 200
+    with TestSession() as db:
+        assert reservations.release_expired_holds(db, now=datetime.utcnow() + timedelta(hours=1)) == 0
+        appointment = db.get(models.Appointment, order["appointment_id"])
+        assert (appointment.status, appointment.payment_status) == ("confirmed", "paid")
+
+def test_bookings_must_fall_in_the_doctors_hours(booking_app):
+    client, TestSession, doctor_id, tokens = booking_app
+    outside = client.post("/api/appointments", headers=tokens[0], json=booking(doctor_id, "20:00"))
+    assert (outside.status_code, outside.json()["detail"]) == (409, "Doctor is not available at that time")
+    assert client.post("/api/appointments", headers=tokens[0], json=booking(doctor_id, "teatime")).status_code == 400
+
+    batch = client.post("/api/appointments/batch", headers=tokens[0], json={"appointments": [
+        booking(doctor_id, "20:00"), booking(doctor_id, "teatime"), booking(doctor_id, "09:30"),
+    ]}).json()
+    assert [result["status"] for result in batch["results"]] == [409, 400, 200]
+
+def test_slot_freed_in_another_worker_can_be_booked(booking_app):
+    client, TestSession, doctor_id, tokens = booking_app
+    first = client.post("/api/appointments", headers=tokens[0], json=booking(doctor_id)).json()
+    day = booking(doctor_id)["date"]
+    assert "10:00" not in client.get(f"/api/doctors/{doctor_id}/slots?start={day}&days=1").json()["days"][0]["slots"]
+
+    # Cancelled by another worker: this one's occupancy still has the slot
+    with TestSession() as db:
+        appointment = db.get(models.Appointment, first["id"])
+        appointment.status = "cancelled"
+        reservations.release_slot(db, appointment)
+        db.commit()
+    with TestSession() as db:
+        assert not server.slot_engine.is_free(db, doctor_id, date.fromisoformat(day), "10:00")
+    assert client.post("/api/appointments", headers=tokens[1], json=booking(doctor_id)).status_code == 200
+
+def batch(client, headers, *items):
+    response = client.post("/api/appointments/batch", headers=headers, json={"appointments": list(items)})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def statuses(result) -> list:
+    return [item["status"] for item in result["results"]]
+
+def test_batch_refuses_a_slot_taken_earlier_in_the_same_batch(booking_app):
+    client, TestSession, doctor_id, tokens = booking_app
+    result = batch(client, tokens[0], booking(doctor_id), booking(doctor_id), booking(doctor_id, "10:15"))
+    assert statuses(result) == [200, 409, 200]
+    assert result["results"][1]["detail"] == "Time slot already taken by item 0 of this batch"
+    assert (result["created"], result["failed"]) == (2, 1)
+
+def test_batch_keeps_the_items_that_succeed(booking_app):
+    client, TestSession, doctor_id, tokens = booking_app
+    assert client.post("/api/appointments", headers=tokens[1], json=booking(doctor_id)).status_code == 200
+
+    result = batch(client, tokens[0], booking(doctor_id), booking(str(uuid.uuid4())), booking(doctor_id, "11:00"))
+    assert statuses(result) == [409, 404, 200]
+    assert (result["created"], result["failed"]) == (1, 2)
+    created = result["results"][2]["appointment"]
+    with TestSession() as db:
+        mine = db.scalars(select(models.Appointment.id).where(models.Appointment.patient_id == created["patient_id"])).all()
+    assert mine == [created["id"]]
+
+def test_batch_checks_each_doctors_own_hours(booking_app):
+    client, TestSession, doctor_id, tokens = booking_app
+    # Mornings on the booking's weekday only, from availability rows
+    day = date.today() + timedelta(days=3)
+    part_timer = str(uuid.uuid4())
+    with TestSession() as db:
+        db.add(models.User(id=part_timer, email="part@test", password_hash="-", name="Part", role="doctor"))
+        db.add(models.Doctor(user_id=part_timer, fee=300, availability_days=[]))
+        db.add(models.DoctorAvailability(doctor_id=part_timer, day_of_week=day.weekday(),
+                                         start_time=time(9, 0), end_time=time(12, 0)))
+        db.commit()
+
+    result = batch(client, tokens[0], booking(part_timer, "09:00"), booking(part_timer, "14:00"),
+                   booking(doctor_id, "14:00"), booking(doctor_id, "18:00"))
+    assert statuses(result) == [200, 409, 200, 409]
+    assert result["results"][1]["detail"] == "Doctor is not available at that time"
+    assert result["results"][0]["appointment"]["fee"] == "300.00"
+
+def test_admin_batch_books_for_the_given_patients(booking_app):
+    client, TestSession, doctor_id, tokens = booking_app
+    admin_id = str(uuid.uuid4())
+    with TestSession() as db:
+        db.add(models.User(id=admin_id, email="admin@test", password_hash="-", name="Admin", role="admin"))
+        patient_id = db.scalar(select(models.User.id).where(models.User.email == "p5@test"))
+        db.commit()
+    admin = {"Authorization": f"Bearer {auth.create_access_token({'sub': admin_id, 'role': 'admin'})}"}
+
+    result = batch(client, admin, {**booking(doctor_id), "patient_id": patient_id}, booking(doctor_id, "11:00"),
+                   {**booking(doctor_id, "12:00"), "patient_id": str(uuid.uuid4())})
+    assert statuses(result) == [200, 400, 404]
+    assert result["results"][0]["appointment"]["patient_id"] == patient_id
+
+    # Patients only book for themselves
+    other = batch(client, tokens[0], {**booking(doctor_id, "13:00"), "patient_id": patient_id})
+    assert statuses(other) == [403]
+
+def test_batch_lookups_do_not_grow_with_its_doctors(booking_app):
+    client, TestSession, doctor_id, tokens = booking_app
+    doctor_ids = [str(uuid.uuid4()) for _ in range(5)]
+    with TestSession() as db:
+        for i, other_id in enumerate(doctor_ids):
+            db.add(models.User(id=other_id, email=f"d{i}@test", password_hash="-", name=f"D{i}", role="doctor"))
+            db.add(models.Doctor(user_id=other_id, fee=500, availability_days=["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]))
+        db.commit()
+
+    engine = TestSession.kw["bind"]
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        batch(client, tokens[0], *[booking(doctor_id, f"{hour}:00") for hour in range(10, 15)])
+        one_doctor = len(statements)
+        statements.clear()
+        batch(client, tokens[1], *[booking(other_id) for other_id in doctor_ids])
+        assert len(statements) == one_doctor
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
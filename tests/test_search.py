@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import database
+import migrations
+import models
+from search import DoctorSearchIndex
+import search
+
+@pytest.fixture
+def clinic(tmp_path, monkeypatch):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    migrations.upgrade(engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    index = DoctorSearchIndex()
+    # Commits feed this index instead of the app's
+    monkeypatch.setattr(search, "doctor_search_index", index)
+    with TestSession() as db:
+        cardiology = models.Specialty(name="Cardiology")
+        dermatology = models.Specialty(name="Dermatology")
+        db.add_all([cardiology, dermatology])
+        db.flush()
+        doctors = [
+            ("sharma", "Dr. Priya Sharma", cardiology, "City Hospital"),
+            ("sharman", "Dr. Arun Sharman", dermatology, "Cardiology Clinic"),
+            ("mehta", "Dr. Rahul Mehta", cardiology, "Sharma Memorial"),
+            ("unlisted", "Dr. Kiran Sharma", None, "City Hospital"),
+        ]
+        for user_id, name, specialty, hospital in doctors:
+            db.add(models.User(id=user_id, email=f"{user_id}@test", password_hash="-", name=name, role="doctor"))
+            db.add(models.Doctor(user_id=user_id, specialty_id=specialty.id if specialty else None, hospital=hospital))
+        db.commit()
+        yield index, db
+    engine.dispose()
+
+def ids(matches) -> list:
+    return [doctor_id for doctor_id, _ in matches]
+
+def test_prefix_and_typos_match(clinic):
+    index, db = clinic
+    assert ids(index.search(db, "Priy")) == ["sharma"]
+    # One letter off still finds the doctor
+    assert ids(index.search(db, "Mehra")) == ["mehta"]
+    assert ids(index.search(db, "cardio sharma")) == ["sharma", "sharman", "mehta"]
+    assert index.search(db, "zzzz") == []
+
+def test_ranking_weights_fields_and_exact_matches(clinic):
+    index, db = clinic
+    matches = index.search(db, "sharma")
+    # Exact name, then prefix of a name, then the hospital; never a doctor
+    # without a specialty, whom the listing leaves out
+    assert ids(matches) == ["sharma", "sharman", "mehta"]
+    assert matches[0][1] > matches[1][1] > matches[2][1]
+    assert ids(index.search(db, "sharma", "Cardiology")) == ["sharma", "mehta"]
+
+def test_commits_reindex_only_changed_doctors(clinic):
+    index, db = clinic
+    assert ids(index.search(db, "Asclepius")) == []
+
+    db.get(models.User, "mehta").name = "Dr. Asclepius Mehta"
+    db.commit()
+    assert index.search_cached("Asclepius") is None
+    assert ids(index.search(db, "Asclepius")) == ["mehta"]
+    assert ids(index.search_cached("Rahul")) == []
@@ -0,0 +1,115 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import List, Optional
+import asyncio
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import database
+import migrations
+import models
+import serializers
+import server
+
+class Visit(BaseModel):
+    id: uuid.UUID
+    starts_at: datetime
+    day: date
+    fee: Decimal
+    rating: float
+    tags: List[str]
+    note: Optional[str] = None
+    refund: Optional[Decimal] = None
+    ended_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+ROWS = [
+    SimpleNamespace(id=uuid.UUID(int=1), starts_at=datetime(2026, 3, 2, 14, 30, tzinfo=timezone.utc),
+                    day=date(2026, 3, 2), fee=Decimal("500.00"), rating=4.5, tags=["Müller", "video"],
+                    note="Fever \"since\" Monday", refund=Decimal("0.10"),
+                    ended_at=datetime(2026, 3, 2, 15, 0, 0, 123456, tzinfo=timezone.utc)),
+    # Naive, as SQLite hands them back, and every optional field empty
+    SimpleNamespace(id=uuid.UUID(int=2), starts_at=datetime(2026, 3, 3, 9, 0), day=date(2026, 3, 3),
+                    fee=Decimal("0"), rating=0.0, tags=[], note=None, refund=None, ended_at=None),
+]
+
+def response_model_bytes(schema, rows) -> bytes:
+    # What FastAPI writes for a List[schema] response_model
+    content = [schema.model_validate(row).model_dump(mode="json") for row in rows]
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+@pytest.mark.parametrize("fast_encoder", ["orjson", "stdlib"])
+def test_compiled_encoder_writes_the_response_model_bytes(fast_encoder, monkeypatch):
+    if fast_encoder == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(serializers, "orjson", None)
+    encode = serializers.compile_encoder(Visit)
+    body = serializers.dumps([encode(row) for row in ROWS])
+    assert body == response_model_bytes(Visit, ROWS)
+    assert b'"starts_at":"2026-03-02T14:30:00Z"' in body
+    assert b'"fee":"500.00"' in body and b'"refund":null' in body
+
+def test_stdlib_fallback_refuses_unknown_types(monkeypatch):
+    monkeypatch.setattr(serializers, "orjson", None)
+    with pytest.raises(TypeError):
+        serializers.dumps([{"value": object()}])
+
+PATIENT_ID = str(uuid.uuid4())
+DOCTOR_ID = str(uuid.uuid4())
+
+@pytest.fixture
+def appointments_app(tmp_path):
+    url = f"sqlite:///{tmp_path / 'appointments.db'}"
+    engine = database.make_engine(url)
+    migrations.upgrade(engine)
+    async_engine = database.make_async_engine(url)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncTestSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    with TestSession() as db:
+        db.add(models.User(id=PATIENT_ID, email="patient@test", password_hash="-", name="Patient", role="patient"))
+        db.add(models.User(id=DOCTOR_ID, email="doctor@test", password_hash="-", name="Doctor", role="doctor"))
+        db.add_all(models.Appointment(id=str(uuid.uuid4()), patient_id=PATIENT_ID, doctor_id=DOCTOR_ID,
+                                      date=date(2026, 3, day), time="10:30 AM", type="video",
+                                      symptoms="Toux sèche, \"fièvre\"", fee=Decimal(fee),
+                                      created_at=datetime(2026, 2, day, 8, 15, 30, 250000))
+                   for day, fee in ((2, "500.00"), (3, "0"), (4, "1250.5")))
+        db.commit()
+
+    async def async_test_db():
+        async with AsyncTestSession() as db:
+            yield db
+
+    server.app.dependency_overrides.update({
+        database.get_async_db: async_test_db,
+        database.get_async_read_db: async_test_db,
+    })
+    server.reset_caches()
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': PATIENT_ID, 'role': 'patient'})}"}
+    # No `with`: the lifespan would migrate the app's own database
+    yield TestClient(server.app), headers
+    server.app.dependency_overrides.clear()
+    server.reset_caches()
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+def test_appointment_list_is_the_same_either_way(appointments_app, monkeypatch):
+    client, headers = appointments_app
+    bodies = {}
+    for fast in (True, False):
+        monkeypatch.setattr(server, "FAST_JSON_RESPONSES", fast)
+        response = client.get("/api/appointments", headers=headers, params={"limit": 2})
+        assert response.status_code == 200, response.text
+        bodies[fast] = (response.content, response.headers["x-next-cursor"])
+    assert bodies[True] == bodies[False]
+    assert b'"fee":"1250.50"' in bodies[True][0]
@@ -0,0 +1,87 @@
+from datetime import date, datetime, time, timedelta
+import uuid
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import database
+import migrations
+import models
+from reservations import claim_slot
+from slots import SlotEngine
+
+# A Monday far enough ahead that no slot of the week has started yet
+MONDAY = date.today() + timedelta(days=7 - date.today().weekday() + 7)
+
+@pytest.fixture
+def clinic(tmp_path):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'slots.db'}")
+    migrations.upgrade(engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with TestSession() as db:
+        # Mondays 09:00-12:00 from availability rows; the other doctor falls
+        # back to the default hours on their listed days
+        db.add(models.User(id="morning", email="morning@test", password_hash="-", name="Morning", role="doctor"))
+        db.add(models.Doctor(user_id="morning", availability_days=["Mon", "Tue"]))
+        db.add(models.DoctorAvailability(id=str(uuid.uuid4()), doctor_id="morning", day_of_week=0,
+                                         start_time=time(9, 0), end_time=time(12, 0), is_available=True))
+        db.add(models.User(id="weekdays", email="weekdays@test", password_hash="-", name="Weekdays", role="doctor"))
+        db.add(models.Doctor(user_id="weekdays", availability_days=["Mon", "Wed"]))
+        db.commit()
+        yield SlotEngine(), db
+    engine.dispose()
+
+def test_free_slots_follow_the_weekly_template(clinic):
+    engine, db = clinic
+    week = engine.free_slots(db, "morning", MONDAY, 7)
+    assert [day["date"] for day in week] == [MONDAY + timedelta(days=i) for i in range(7)]
+    assert week[0]["slots"] == [f"{hour:02d}:{minute:02d}" for hour in (9, 10, 11) for minute in (0, 15, 30, 45)]
+    # Availability rows replace availability_days, so no Tuesday hours
+    assert all(day["slots"] == [] for day in week[1:])
+
+    fallback = engine.free_slots(db, "weekdays", MONDAY, 3)
+    assert [len(day["slots"]) for day in fallback] == [32, 0, 32]
+    assert engine.free_slots(db, "nobody", MONDAY, 1) is None
+
+def test_occupy_and_release_count_overlapping_bookings(clinic):
+    engine, db = clinic
+    assert engine.is_free(db, "morning", MONDAY, "10:00 AM")
+    engine.occupy("morning", MONDAY, "10:00")
+    engine.occupy("morning", MONDAY, "10:00 AM")
+    assert not engine.is_free(db, "morning", MONDAY, "10:00")
+    assert "10:00" not in engine.free_slots(db, "morning", MONDAY, 1)[0]["slots"]
+
+    # One of two bookings of the slot released: still taken
+    engine.release("morning", MONDAY, "10:00")
+    assert not engine.is_free(db, "morning", MONDAY, "10:00")
+    engine.release("morning", MONDAY, "10:00")
+    assert engine.is_free(db, "morning", MONDAY, "10:00")
+
+def test_slots_outside_hours_are_never_free(clinic):
+    engine, db = clinic
+    assert engine.in_hours(db, "morning", MONDAY, "11:45")
+    assert not engine.is_free(db, "morning", MONDAY, "12:00")
+    assert not engine.is_free(db, "morning", MONDAY + timedelta(days=1), "10:00")
+    assert not engine.is_free(db, "morning", MONDAY, "half past ten")
+    assert not engine.is_free(db, "nobody", MONDAY, "10:00")
+
+def test_reload_picks_up_other_workers_reservations(clinic):
+    engine, db = clinic
+    engine.refresh_seconds = 0
+    yesterday = date.today() - timedelta(days=1)
+    engine.occupy("morning", yesterday, "10:00")
+    engine.occupy("morning", MONDAY, "09:00")
+
+    # Reserved in another worker; a lapsed hold does not count
+    for slot_time, expires_at in (("10:00", None), ("10:15", datetime.utcnow() - timedelta(minutes=1))):
+        appointment = models.Appointment(id=str(uuid.uuid4()), patient_id="weekdays", doctor_id="morning",
+                                         date=MONDAY, time=slot_time, type="video")
+        db.add(appointment)
+        claim_slot(db, appointment, expires_at=expires_at)
+    db.commit()
+
+    assert not engine.is_free(db, "morning", MONDAY, "10:00")
+    assert engine.is_free(db, "morning", MONDAY, "10:15")
+    # This worker's unrecorded booking and its past days are gone after the reload
+    assert engine.is_free(db, "morning", MONDAY, "09:00")
+    assert set(engine._occupancy["morning"]) == {MONDAY}
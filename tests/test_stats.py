@@ -0,0 +1,62 @@
+from datetime import date
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import sessionmaker
+
+import database
+import migrations
+import models
+import stats
+
+@pytest.fixture
+def db(tmp_path):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+    migrations.upgrade(engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with TestSession() as db:
+        db.add(models.User(id="doctor", email="doctor@test", password_hash="-", name="Doctor", role="doctor"))
+        db.add(models.User(id="patient", email="patient@test", password_hash="-", name="Patient", role="patient"))
+        db.add(models.Patient(user_id="patient"))
+        db.commit()
+        yield db
+    engine.dispose()
+
+def counters(db) -> dict:
+    rows = db.execute(text("SELECT name, value FROM stat_counters"))
+    return {name: int(value) for name, value in rows if name in stats.COUNTER_NAMES}
+
+def book(db, fee: int):
+    db.add(models.Appointment(id=str(uuid.uuid4()), patient_id="patient", doctor_id="doctor", date=date(2026, 1, 5),
+                              time="10:00", type="video", fee=fee, payment_status="paid"))
+    db.commit()
+
+def test_migration_seeds_the_counters(db):
+    # Seeded empty, so the first patient was counted by its flush
+    assert counters(db) == {"total_patients": 1, "total_doctors": 0, "total_appointments": 0, "revenue": 0}
+    book(db, 500)
+    assert counters(db)["revenue"] == 500
+
+def test_missing_counter_is_rebuilt_not_lost(db):
+    book(db, 500)
+    db.execute(text("DELETE FROM stat_counters WHERE name IN ('total_appointments', 'revenue')"))
+    db.commit()
+
+    # The first delta after the loss counts the rows already there as well
+    book(db, 300)
+    assert counters(db) == {"total_patients": 1, "total_doctors": 0, "total_appointments": 2, "revenue": 800}
+    assert stats.reconcile(db)["revenue"] == 800
+    assert stats.reconcile(db)["total_appointments"] == 2
+
+def test_upserts_are_spelled_per_backend():
+    rows = [{"name": "revenue", "value": 0, "updated_at": None}]
+    for name, dialect, clause in (("sqlite", sqlite, "ON CONFLICT (name) DO"),
+                                  ("postgresql", postgresql, "ON CONFLICT (name) DO"),
+                                  ("mysql", mysql, "ON DUPLICATE KEY UPDATE")):
+        for update in (False, True):
+            sql = str(stats.upsert_statement(name, rows, update).compile(dialect=dialect.dialect()))
+            assert clause in sql, sql
+    with pytest.raises(NotImplementedError, match="mssql"):
+        stats.upsert_statement("mssql", rows, update=True)
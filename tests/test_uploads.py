@@ -0,0 +1,112 @@
+import hashlib
+import uuid
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import database
+import migrations
+import models
+import server
+import uploads
+
+PDF = b"%PDF-1.4\n" + bytes(range(256)) * 64
+PATIENT_ID = str(uuid.uuid4())
+
+@pytest.fixture
+def upload_app(tmp_path, monkeypatch):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'uploads.db'}")
+    migrations.upgrade(engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with TestSession() as db:
+        db.add(models.User(id=PATIENT_ID, email="patient@test", password_hash="-", name="Patient", role="patient"))
+        db.commit()
+
+    def test_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path / "uploads")
+    server.app.dependency_overrides[database.get_db] = test_db
+    server.reset_caches()
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': PATIENT_ID, 'role': 'patient'})}"}
+    # No `with`: the lifespan would migrate the app's own database
+    yield TestClient(server.app), TestSession, headers, tmp_path / "uploads"
+    server.app.dependency_overrides.pop(database.get_db, None)
+    server.reset_caches()
+    engine.dispose()
+
+def upload(client, headers, content: bytes, content_type: str = "application/pdf"):
+    return client.post("/api/medical-records", headers=headers, params={"title": "Scan"},
+                       files={"file": ("scan.pdf", content, content_type)})
+
+def test_upload_stores_size_and_checksum(upload_app):
+    client, TestSession, headers, upload_dir = upload_app
+    response = upload(client, headers, PDF)
+    assert response.status_code == 200, response.text
+
+    with TestSession() as db:
+        record = db.get(models.MedicalRecord, response.json()["record"]["id"])
+        assert (record.file_size, record.checksum) == (len(PDF), hashlib.sha256(PDF).hexdigest())
+        with open(record.file_url, "rb") as stored:
+            assert stored.read() == PDF
+
+def test_contents_must_match_the_declared_type(upload_app):
+    client, TestSession, headers, upload_dir = upload_app
+    mismatch = upload(client, headers, b"MZ\x90\x00 not a pdf")
+    assert (mismatch.status_code, mismatch.json()["detail"]) == (415, "File contents do not match its declared type")
+    assert upload(client, headers, PDF, "application/x-msdownload").status_code == 415
+    assert upload(client, headers, b"\x89PNG\r\n\x1a\n" + PDF, "image/png").status_code == 200
+
+    with TestSession() as db:
+        assert db.query(models.MedicalRecord).count() == 1
+    assert len(list(upload_dir.iterdir())) == 1
+
+def test_file_over_the_limit_is_removed(upload_app, monkeypatch):
+    client, TestSession, headers, upload_dir = upload_app
+    # Under the middleware's allowance, over the file limit itself
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", len(PDF) - 1)
+    assert upload(client, headers, PDF).status_code == 413
+    assert list(upload_dir.iterdir()) == []
+
+@pytest.fixture
+def limited_client(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path / "uploads")
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def receive_upload(file: UploadFile = File(...)):
+        return {"size": (await uploads.save_upload(file))["size"]}
+
+    app.add_middleware(uploads.UploadSizeLimitMiddleware, path="/upload", max_bytes=1024)
+    return TestClient(app)
+
+def multipart(content: bytes):
+    boundary = "upload-test-boundary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"scan.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+def test_middleware_rejects_oversized_bodies(limited_client):
+    # The allowance is the limit plus 64 KiB for the multipart framing
+    small, headers = multipart(PDF[:1024])
+    assert limited_client.post("/upload", content=small, headers=headers).json() == {"size": 1024}
+
+    big, headers = multipart(PDF * 5)
+    declared = limited_client.post("/upload", content=big, headers=headers)
+    assert declared.status_code == 413
+    assert declared.json()["detail"] == uploads._too_large().detail
+
+    def chunks():
+        for start in range(0, len(big), 8192):
+            yield big[start:start + 8192]
+
+    # Chunked: no Content-Length to check up front, so the count decides
+    streamed = limited_client.post("/upload", content=chunks(), headers=headers)
+    assert streamed.status_code == 413